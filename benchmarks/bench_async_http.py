@@ -0,0 +1,91 @@
+"""
+Mede N chamadas concorrentes a um upstream lento (servidor local que
+responde em DELAY segundos) de duas formas: pelo cliente síncrono do
+http_client num pool de threads do tamanho típico de um worker WSGI, e
+pelo cliente async (httpx) com asyncio.gather num único event loop, como
+fazem as views ASGI.
+
+Uso: python benchmarks/bench_async_http.py
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from user_wallet.services import http_client
+
+CONCURRENCY = (50, 200, 500)
+DELAY = 0.5
+WORKER_THREADS = 10
+
+
+async def handle(reader, writer):
+    # Upstream lento com keep-alive: responde cada requisição após DELAY segundos
+    body = b'{"ok": true}'
+    try:
+        while True:
+            request = await reader.readuntil(b'\r\n\r\n')
+            if not request:
+                break
+            await asyncio.sleep(DELAY)
+            writer.write(
+                b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def start_server():
+    """Servidor asyncio numa thread própria (não limita a concorrência medida)"""
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', 0, backlog=1024))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return server.sockets[0].getsockname()[1]
+
+
+def run_threads(url, count):
+    with ThreadPoolExecutor(max_workers=WORKER_THREADS) as executor:
+        list(executor.map(lambda _: http_client.get(url).json(), range(count)))
+
+
+async def run_async(url, count):
+    responses = await asyncio.gather(*(http_client.aget(url) for _ in range(count)))
+    return [response.json() for response in responses]
+
+
+def main():
+    url = f"http://127.0.0.1:{start_server()}/slow"
+
+    settings.HTTP_POOL_MAXSIZE = WORKER_THREADS
+    settings.HTTP_ASYNC_POOL_MAXSIZE = max(CONCURRENCY)
+
+    print(f"upstream com {DELAY}s de latência; {WORKER_THREADS} threads no modo síncrono")
+    print(f"{'chamadas':>8} {'threads (s)':>12} {'async (s)':>10}")
+    for count in CONCURRENCY:
+        start = time.perf_counter()
+        run_threads(url, count)
+        threads_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(run_async(url, count))
+        async_time = time.perf_counter() - start
+
+        print(f"{count:>8} {threads_time:>12.2f} {async_time:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Leituras e syncs concorrentes no banco da bitcoinlib (services.bitcoinlib_db
+e services.wallet_pool), em SQLites num diretório temporário:
+
+- antes: modo padrão (rollback journal, timeout de 5s) e saldo pelo
+  Wallet.balance() da bitcoinlib, que grava a cada leitura
+- journal: modo padrão com o saldo só lendo (bitcoinlib_db.balance)
+- wal: SQLite em WAL
+- wal + shards: WAL com as carteiras em 4 arquivos
+
+Leitores pedem saldo e transações de carteiras aleatórias pelo pool; os
+syncs (com sessões próprias, como o processo do sync_wallets) atualizam as
+chaves de uma carteira e seguram a transação aberta enquanto "esperam o
+provedor", como o transactions_update da bitcoinlib. "só leituras" é a
+referência sem syncs.
+
+Uso: python benchmarks/bench_bitcoinlib_db.py
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+django.setup()
+
+from bitcoinlib.db import DbKey
+from bitcoinlib.keys import HDKey
+from bitcoinlib.wallets import Wallet as BitcoinlibWallet
+from django.conf import settings
+from user_wallet.services import bitcoinlib_db, wallet_pool
+
+WALLETS = 16
+READERS = 8
+SYNCS = 4
+DURATION = 5
+PROVIDER_WAIT = 0.02  # Segundos com a transação de escrita aberta por consulta ao provedor
+SCENARIOS = [
+    ("só leituras", {"BITCOINLIB_SQLITE_WAL": True, "BITCOINLIB_SQLITE_BUSY_TIMEOUT": 30, "BITCOINLIB_DATABASE_SHARDS": 1,
+                     "syncs": 0}),
+    ("antes", {"BITCOINLIB_SQLITE_WAL": False, "BITCOINLIB_SQLITE_BUSY_TIMEOUT": 5, "BITCOINLIB_DATABASE_SHARDS": 1,
+               "lib_balance": True}),
+    ("journal", {"BITCOINLIB_SQLITE_WAL": False, "BITCOINLIB_SQLITE_BUSY_TIMEOUT": 5, "BITCOINLIB_DATABASE_SHARDS": 1}),
+    ("wal", {"BITCOINLIB_SQLITE_WAL": True, "BITCOINLIB_SQLITE_BUSY_TIMEOUT": 30, "BITCOINLIB_DATABASE_SHARDS": 1}),
+    ("wal + 4 shards", {"BITCOINLIB_SQLITE_WAL": True, "BITCOINLIB_SQLITE_BUSY_TIMEOUT": 30, "BITCOINLIB_DATABASE_SHARDS": 4}),
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+def create_wallets(names):
+    for name in names:
+        key = HDKey(witness_type='segwit').public_master(witness_type='segwit').wif()
+        with BitcoinlibWallet.create(name, keys=key, network='bitcoin', witness_type='segwit',
+                                     db_uri=bitcoinlib_db.database_uri(name)) as wallet:
+            wallet.get_keys(number_of_keys=10)
+
+
+def run(names, sync_threads=SYNCS, lib_balance=False):
+    pool = wallet_pool.WalletPool(maxsize=len(names))
+    stop = time.monotonic() + DURATION
+    reads, syncs, errors = [], [], []
+
+    def reader():
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                with pool.checkout(random.choice(names)) as wallet:
+                    if lib_balance:
+                        wallet.balance()
+                    else:
+                        bitcoinlib_db.balance(wallet)
+                    wallet.transactions()
+                reads.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors.append(str(e))
+
+    def sync():
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                # O sync roda em outro processo (sync_wallets): sessão própria, fora do pool
+                name = random.choice(names)
+                with BitcoinlibWallet(name, db_uri=bitcoinlib_db.database_uri(name),
+                                      session=bitcoinlib_db.session(name)) as wallet:
+                    for _ in range(3):
+                        wallet.session.query(DbKey).filter_by(wallet_id=wallet.wallet_id).update(
+                            {DbKey.balance: random.randint(0, 10 ** 8)}
+                        )
+                        time.sleep(PROVIDER_WAIT)
+                    wallet.session.commit()
+                syncs.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors.append(str(e))
+
+    threads = [threading.Thread(target=reader) for _ in range(READERS)]
+    threads += [threading.Thread(target=sync) for _ in range(sync_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.clear()
+    return reads, syncs, errors
+
+
+def main():
+    random.seed(7)
+    print(f"{'cenário':<16} {'leituras/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'syncs/s':>8} {'sync p99':>9} {'erros':>6}")
+
+    for label, options in SCENARIOS:
+        directory = tempfile.mkdtemp(prefix='bench-bitcoinlib-')
+        options = dict(options)
+        sync_threads = options.pop('syncs', SYNCS)
+        lib_balance = options.pop('lib_balance', False)
+        for name, value in options.items():
+            setattr(settings, name, value)
+        settings.BITCOINLIB_DATABASE_URI = f"sqlite:///{directory}/bitcoinlib_{{shard}}.sqlite"
+
+        names = [f"watch_only_{wallet_id}" for wallet_id in range(1, WALLETS + 1)]
+        create_wallets(names)
+        reads, syncs, errors = run(names, sync_threads, lib_balance)
+
+        print(f"{label:<16} {len(reads) / DURATION:>10.1f} {percentile(reads, 0.5):>9.1f} "
+              f"{percentile(reads, 0.99):>9.1f} {len(syncs) / DURATION:>8.1f} "
+              f"{percentile(syncs, 0.99):>9.1f} {len(errors):>6}")
+        if errors:
+            print(f"  ex: {errors[0][:100]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Mede o tempo da seleção de moedas (user_wallet.services.coin_selection) em
+carteiras com 1k, 10k e 50k UTXOs, para pagamentos pequenos, médios e
+grandes, mostrando o algoritmo que resolveu cada caso.
+
+Uso: python benchmarks/bench_coin_selection.py
+"""
+import sys
+import random
+import statistics
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from user_wallet.services import coin_selection
+
+SIZES = (1_000, 10_000, 50_000)
+AMOUNTS = (50_000, 1_000_000, 100_000_000)
+FEE_RATE = 10
+ROUNDS = 5
+
+
+def make_utxos(count):
+    # Mistura de troco miúdo, pagamentos médios e alguns depósitos grandes
+    values = []
+    for _ in range(count):
+        kind = random.random()
+        if kind < 0.6:
+            values.append(random.randint(1_000, 100_000))
+        elif kind < 0.95:
+            values.append(random.randint(100_000, 5_000_000))
+        else:
+            values.append(random.randint(5_000_000, 50_000_000))
+    return values
+
+
+def main():
+    random.seed(42)
+    sizes = coin_selection.tx_sizes('segwit', 22)
+
+    print(f"{'utxos':>7} {'valor (sat)':>12} {'algoritmo':<14} {'entradas':>8} {'taxa':>7} {'mediana (ms)':>13}")
+    for count in SIZES:
+        values = make_utxos(count)
+        for amount in AMOUNTS:
+            timings = []
+            for _ in range(ROUNDS):
+                start = time.perf_counter()
+                selection = coin_selection.select_coins(values, amount, FEE_RATE, sizes)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            print(f"{count:>7} {amount:>12} {selection.algorithm:<14} {len(selection.indices):>8} "
+                  f"{selection.fee:>7} {statistics.median(timings):>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
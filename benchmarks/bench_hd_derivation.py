@@ -0,0 +1,93 @@
+"""
+Mede endereços/segundo na derivação para xpub (BIP44), ypub (BIP49) e zpub
+(BIP84), comparando:
+
+- bitcoinlib: BitcoinlibWallet.get_keys, o caminho anterior (banco temporário)
+- sem cache: decodifica a xpub e deriva conta -> cadeia -> índice a cada endereço
+- hd_derivation: nós de conta/cadeia no LRU, uma derivação por endereço
+
+Uso: python benchmarks/bench_hd_derivation.py [quantidade]
+"""
+import os
+import sys
+import time
+import tempfile
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+django.setup()
+
+from bitcoinlib.keys import HDKey
+from bitcoinlib.wallets import Wallet as BitcoinlibWallet
+from user_wallet.services import hd_derivation
+
+logging.disable(logging.WARNING)
+
+ACCOUNTS = (
+    ('xpub', 44, 'legacy'),
+    ('ypub', 49, 'p2sh-segwit'),
+    ('zpub', 84, 'segwit'),
+)
+
+
+def make_xpub(purpose, witness_type):
+    master = HDKey(network='bitcoin', witness_type=witness_type)
+    return master.subkey_for_path(f"m/{purpose}'/0'/0'").public().wif_public()
+
+
+def bench_bitcoinlib(xpub, purpose, witness_type, count, db_uri):
+    wallet = BitcoinlibWallet.create(
+        f"bench_{purpose}", keys=xpub, network='bitcoin', purpose=purpose,
+        witness_type=witness_type, scheme='bip32', db_uri=db_uri
+    )
+    start = time.perf_counter()
+    keys = wallet.get_keys(account_id=0, change=0, number_of_keys=count)
+    addresses = [key.address for key in keys]
+    return time.perf_counter() - start, addresses
+
+
+def bench_uncached(xpub, count):
+    start = time.perf_counter()
+    addresses = [
+        HDKey(xpub, network='bitcoin').child_public(0).child_public(index).address()
+        for index in range(count)
+    ]
+    return time.perf_counter() - start, addresses
+
+
+def bench_cached(xpub, count):
+    hd_derivation.clear_cache()
+    start = time.perf_counter()
+    addresses = [hd_derivation.derive_address(xpub, 0, index) for index in range(count)]
+    return time.perf_counter() - start, addresses
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_uri = f"sqlite:///{tmp}/bench.sqlite"
+
+        print(f"{'tipo':>6} {'método':<14} {'endereços/s':>12}")
+        for prefix, purpose, witness_type in ACCOUNTS:
+            xpub = make_xpub(purpose, witness_type)
+            assert xpub.startswith(prefix)
+
+            results = [
+                ('bitcoinlib', bench_bitcoinlib(xpub, purpose, witness_type, count, db_uri)),
+                ('sem cache', bench_uncached(xpub, count)),
+                ('hd_derivation', bench_cached(xpub, count)),
+            ]
+
+            expected = results[-1][1][1]
+            for name, (elapsed, addresses) in results:
+                assert addresses == expected, f"{name} derivou endereços diferentes"
+                print(f"{prefix:>6} {name:<14} {count / elapsed:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
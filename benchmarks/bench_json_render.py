@@ -0,0 +1,115 @@
+"""
+Tempo de serialização das respostas grandes: JSONRenderer do DRF contra o
+FastJSONRenderer (orjson, user_wallet.renderers), e o custo do gzip do
+LargeResponseGZipMiddleware (nível 1) comparado ao nível 6 do GZipMiddleware.
+Payloads no formato das respostas reais:
+
+- all-transactions: 10k transações (o histórico inteiro numa única lista)
+- all-balances: 500 carteiras
+- price-history: 1 ano de pontos horários (8760)
+
+Confere também que os dois renderers geram exatamente os mesmos bytes.
+
+Uso: python benchmarks/bench_json_render.py
+"""
+import os
+import sys
+import gzip
+import time
+import random
+import statistics
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+django.setup()
+
+from rest_framework.renderers import JSONRenderer
+from user_wallet.renderers import FastJSONRenderer
+
+ROUNDS = 20
+
+
+def transactions_payload(count=10_000):
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "network": "bitcoin",
+            "confirmations": random.randint(0, 50_000),
+            "status": random.choice(["confirmed", "unconfirmed"]),
+            "date": (start + timedelta(minutes=37 * position)).strftime('%Y-%m-%d %H:%M:%S'),
+            "value": random.randint(546, 10 ** 8),
+            "transaction_type": random.choice(["received", "sent"]),
+            "txid": random.randbytes(32).hex(),
+        }
+        for position in range(count)
+    ]
+
+
+def balances_payload(count=500):
+    return [
+        {
+            "id": wallet_id,
+            "name": f"Carteira {wallet_id}",
+            "error": None,
+            "balanceSatoshi": random.randint(0, 10 ** 9),
+            "btcValue": f"{random.random() * 10:.8f}",
+            "fiatValue": f"{random.random() * 10 ** 6:.2f}",
+            "address": "bc1q" + random.randbytes(20).hex(),
+            "transactions": random.randint(0, 5000),
+            "color": '#F7931A',
+            "change": 3.12,
+        }
+        for wallet_id in range(count)
+    ]
+
+
+def chart_payload(points=8760):
+    start = datetime(2024, 1, 1)
+    return {
+        "labels": [(start + timedelta(hours=hour)).strftime('%d/%m %H:%M') for hour in range(points)],
+        "datasets": [{
+            "label": "Preço BTC (R$)",
+            "data": [round(300_000 + random.gauss(0, 5_000), 2) for _ in range(points)],
+            "borderColor": "#F7931A",
+            "backgroundColor": "rgba(247, 147, 26, 0.1)",
+        }],
+    }
+
+
+def timed(function, *args):
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    random.seed(7)
+    drf, fast = JSONRenderer(), FastJSONRenderer()
+    print(f"{'payload':<18} {'tamanho':>9} {'DRF (ms)':>9} {'orjson (ms)':>12} {'ganho':>6} "
+          f"{'gzip 6 (ms)':>12} {'gzip 1 (ms)':>12} {'gzip 1':>8}  iguais")
+
+    for label, payload in (
+        ("all-transactions", transactions_payload()),
+        ("all-balances", balances_payload()),
+        ("price-history", chart_payload()),
+    ):
+        drf_ms, drf_bytes = timed(drf.render, payload)
+        fast_ms, fast_bytes = timed(fast.render, payload)
+        # Nível 6 é o do GZipMiddleware do Django; 1 é o padrão de RESPONSE_COMPRESSION_LEVEL
+        default_gzip_ms, _ = timed(gzip.compress, fast_bytes, 6)
+        gzip_ms, compressed = timed(gzip.compress, fast_bytes, 1)
+
+        print(f"{label:<18} {len(fast_bytes) / 1024:>7.0f}KB {drf_ms:>9.2f} {fast_ms:>12.2f} "
+              f"{drf_ms / fast_ms:>5.1f}x {default_gzip_ms:>12.2f} {gzip_ms:>12.2f} "
+              f"{len(compressed) / 1024:>6.0f}KB  {drf_bytes == fast_bytes}")
+
+
+if __name__ == '__main__':
+    main()
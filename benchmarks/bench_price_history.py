@@ -0,0 +1,104 @@
+"""
+Compara a montagem do gráfico do price-history ponto a ponto (loop original
+com datetime.fromtimestamp/strftime/round) com o pipeline NumPy de
+user_wallet.services.price_series, para 1k, 10k e 100k pontos. Os dois lados
+produzem o mesmo resultado (rótulos em UTC, reamostragem OHLC), conferido
+antes de medir.
+
+Uso: python benchmarks/bench_price_history.py
+"""
+import sys
+import time
+import timeit
+import random
+import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from user_wallet.services import price_series
+
+SIZES = (1_000, 10_000, 100_000)
+FORMATS = ('%H:%M', '%d/%m', '%b/%Y')
+
+
+def make_points(count, step_ms=3_600_000):
+    start = int(time.time() * 1000) - count * step_ms
+    price = 300_000.0
+    points = []
+    for i in range(count):
+        price *= 1 + random.uniform(-0.01, 0.01)
+        points.append([start + i * step_ms, price])
+    return points
+
+
+def loop_chart(points, label_format):
+    labels = []
+    values = []
+    for timestamp, price in points:
+        # UTC, como o price_series (TIME_ZONE do projeto)
+        dt = datetime.datetime.fromtimestamp(timestamp / 1000, tz=datetime.timezone.utc)
+        labels.append(dt.strftime(label_format))
+        values.append(round(price, 2))
+    return labels, values
+
+
+def numpy_chart(points, label_format):
+    timestamps, prices = price_series.to_arrays(points)
+    return price_series.format_labels(timestamps, label_format), price_series.round_prices(prices)
+
+
+def loop_resample(points, bucket_seconds):
+    """(timestamp do último ponto, open, high, low, close) por balde, pontos em ordem"""
+    buckets = {}
+    for timestamp, price in points:
+        epoch = timestamp // 1000
+        key = epoch - epoch % bucket_seconds
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [timestamp, price, price, price, price]
+        else:
+            bucket[0] = timestamp
+            bucket[2] = max(bucket[2], price)
+            bucket[3] = min(bucket[3], price)
+            bucket[4] = price
+    return [tuple(bucket) for bucket in buckets.values()]
+
+
+def numpy_resample(points, bucket_seconds):
+    timestamps, prices = price_series.to_arrays(points)
+    return price_series.resample_ohlc(timestamps, prices, bucket_seconds)
+
+
+def resample_rows(result):
+    """Colunas do resample_ohlc como as tuplas do loop_resample"""
+    return list(zip(*(column.tolist() for column in result)))
+
+
+def best_of(func, *args, repeat=5):
+    timer = timeit.Timer(lambda: func(*args))
+    number = max(1, 200_000 // len(args[0]))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000
+
+
+def main():
+    random.seed(42)
+    print(f"{'pontos':>8} {'etapa':<22} {'loop (ms)':>10} {'numpy (ms)':>11} {'ganho':>7}")
+
+    for size in SIZES:
+        points = make_points(size)
+
+        for label_format in FORMATS:
+            assert loop_chart(points, label_format) == numpy_chart(points, label_format), label_format
+            loop_ms = best_of(loop_chart, points, label_format)
+            numpy_ms = best_of(numpy_chart, points, label_format)
+            print(f"{size:>8} {'rótulos ' + label_format:<22} {loop_ms:>10.2f} {numpy_ms:>11.2f} {loop_ms / numpy_ms:>6.1f}x")
+
+        assert loop_resample(points, 86400) == resample_rows(numpy_resample(points, 86400))
+        loop_ms = best_of(loop_resample, points, 86400)
+        numpy_ms = best_of(numpy_resample, points, 86400)
+        print(f"{size:>8} {'reamostragem diária':<22} {loop_ms:>10.2f} {numpy_ms:>11.2f} {loop_ms / numpy_ms:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compara a latência das consultas (p50/p95/p99) a um único provedor com
+cauda longa e ao ProviderRouter (services.provider_router) com três
+FakeProviders locais: um rápido mas instável na latência, um estável e
+um que falha metade das vezes.
+
+Uso: python benchmarks/bench_provider_router.py
+"""
+import os
+import sys
+import time
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+django.setup()
+
+from user_wallet.services import provider_router
+from user_wallet.services.blockchain_providers import FakeProvider
+
+QUERIES = 200
+PROVIDERS = {
+    'cauda-longa': {"latency": 0.02, "jitter": 0.4},
+    'estavel': {"latency": 0.06, "jitter": 0.02},
+    'instavel': {"latency": 0.01, "error_rate": 0.5},
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def measure(provider):
+    timings = []
+    failures = 0
+    for _ in range(QUERIES):
+        start = time.perf_counter()
+        try:
+            provider.blockcount()
+        except Exception:
+            failures += 1
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, failures
+
+
+def main():
+    random.seed(7)
+    print(f"{'cenário':<28} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'falhas':>7}")
+
+    single = FakeProvider(blockcount=850000, name='cauda-longa', **PROVIDERS['cauda-longa'])
+    scenarios = [('só cauda-longa', single)]
+    for hedge_delay in (0.1, 0.2):
+        scenarios.append((
+            f"roteador (hedge {int(hedge_delay * 1000)} ms)",
+            provider_router.ProviderRouter([
+                (name, lambda name=name, options=options: FakeProvider(blockcount=850000, name=name, **options))
+                for name, options in PROVIDERS.items()
+            ], hedge_delay=hedge_delay)
+        ))
+
+    for label, provider in scenarios:
+        provider_router.reset_health()
+        timings, failures = measure(provider)
+        print(f"{label:<28} {percentile(timings, 0.5):>9.1f} {percentile(timings, 0.95):>9.1f} "
+              f"{percentile(timings, 0.99):>9.1f} {failures:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Perfil de banco de produção: DJANGO_SETTINGS_MODULE=config.settings_production
+
+- Conexões persistentes (CONN_MAX_AGE) verificadas antes de cada requisição
+  (CONN_HEALTH_CHECKS), em vez de uma conexão nova por requisição.
+- Réplica de leitura no alias 'replica': os endpoints só de leitura
+  (all-balances, all-transactions e a listagem de carteiras) consultam a
+  réplica pelo user_wallet.db_router.ReadReplicaRouter; escritas e o
+  restante ficam no primário.
+- Atraso da réplica: depois de uma escrita (requisição POST/PUT/PATCH/DELETE
+  ou sync feito durante a leitura) o usuário lê do primário por
+  DATABASE_REPLICA_PIN_SECONDS, que deve ser maior que o atraso máximo da
+  replicação. As marcações ficam em CACHES: com mais de um processo use um
+  cache compartilhado (ex: Redis), não o LocMemCache.
+- SQLite em WAL (DATABASE_SQLITE_WAL).
+
+Localmente dois arquivos SQLite fazem o papel de primário e réplica; a cópia
+é atualizada com `python manage.py refresh_sqlite_replica`, que precisa rodar
+(ex: cron) em intervalos menores que DATABASE_REPLICA_PIN_SECONDS. Com um servidor
+(ex: PostgreSQL com replicação) basta trocar ENGINE/NAME/HOST de cada alias:
+
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': 'wallet', 'HOST': 'db-primary', 'USER': ..., 'PASSWORD': ...,
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASE_CONN_MAX_AGE = 600
+DATABASE_SQLITE_WAL = True
+# Segundos em que um usuário lê do primário depois de gravar algo
+DATABASE_REPLICA_PIN_SECONDS = 30
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # Segundos esperando o lock de escrita (o busy timeout é aplicado por db_router.configure_sqlite)
+        'OPTIONS': {'timeout': DATABASE_SQLITE_BUSY_TIMEOUT},
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': DATABASE_SQLITE_BUSY_TIMEOUT},
+        # Nos testes a réplica é o próprio banco de teste do primário
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['user_wallet.db_router.ReadReplicaRouter']
+
+# Fixa no primário as leituras de quem acabou de gravar (o router depende dele)
+MIDDLEWARE = MIDDLEWARE + ['user_wallet.middleware.PrimaryAfterWriteMiddleware']
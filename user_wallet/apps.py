@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class UserWalletConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_wallet'
+
+    def ready(self):
+        # Provedores da bitcoinlib passam a usar os pools HTTP compartilhados
+        from .services import http_client, bitcoinlib_db
+        http_client.install_bitcoinlib()
+        # Conexões SQLite da bitcoinlib em WAL e com busy timeout
+        bitcoinlib_db.install_sqlite_pragmas()
+
+        # Conexões SQLite do Django em WAL e com busy timeout (com DATABASE_SQLITE_WAL)
+        from django.db.backends.signals import connection_created
+        from .db_router import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='user_wallet.configure_sqlite')
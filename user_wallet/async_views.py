@@ -0,0 +1,173 @@
+"""
+Versões async (ASGI) dos endpoints de leitura mais acessados, com as mesmas
+URLs e respostas das actions do WalletViewSet. O DRF 3.14 não executa views
+async, então autenticação, checagem de método e JSON são feitos aqui com as
+mesmas classes e mensagens do DRF. Habilitadas por WALLET_ASYNC_VIEWS, só
+para servidores ASGI.
+"""
+import json
+import logging
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.http import http_date
+from rest_framework.exceptions import AuthenticationFailed, MethodNotAllowed, NotAuthenticated
+from rest_framework.settings import api_settings
+from .models import Wallet
+from .serializers import TransactionPageSerializer
+from .services.wallet_service import WalletService
+from .services.price_history_service import PriceHistoryService
+from .views import not_modified
+from .db_router import read_replica
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def _json(data, status=200, headers=None):
+    # Mesmo formato do JSONRenderer do DRF (compacto e com UTF-8), pelo orjson quando disponível
+    return HttpResponse(dumps(data), status=status, headers=headers, content_type='application/json')
+
+
+def _authenticate(request):
+    """Usuário pelos autenticadores do DEFAULT_AUTHENTICATION_CLASSES, ou None sem credenciais"""
+    for authenticator_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authenticator_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def _unauthorized(detail, request):
+    # Mesmo corpo do exception handler do DRF: detalhes estruturados saem como estão
+    data = detail if isinstance(detail, (list, dict)) else {"detail": str(detail)}
+    headers = {}
+    authenticators = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    if authenticators:
+        headers['WWW-Authenticate'] = authenticators[0]().authenticate_header(request)
+    return _json(data, status=401, headers=headers)
+
+
+def api_view(*methods):
+    """Exige usuário autenticado e um dos métodos informados, como o IsAuthenticated do DRF"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                return _json({"detail": str(MethodNotAllowed(request.method).detail)}, status=405)
+
+            try:
+                user = await sync_to_async(_authenticate)(request)
+            except AuthenticationFailed as e:
+                return _unauthorized(e.detail, request)
+            if user is None:
+                return _unauthorized(NotAuthenticated.default_detail, request)
+
+            request.user = user
+            return await view(request, *args, **kwargs)
+
+        # Autenticação por token (como as APIViews do DRF): sem CSRF
+        wrapped.csrf_exempt = True
+        return wrapped
+    return decorator
+
+
+def _params(request):
+    """Parâmetros da query string (GET) ou do corpo JSON/form (POST)"""
+    if request.method != 'POST':
+        return request.GET
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+## MARK: Endpoints
+
+@api_view('GET')
+@read_replica
+async def all_balances(request):
+    wallet_service = WalletService()
+
+    try:
+        currency = wallet_service.normalize_currency(request.GET.get('currency'))
+    except ValueError as e:
+        return _json({"error": str(e)}, status=400)
+
+    wallets = Wallet.objects.filter(user=request.user)
+    result = await wallet_service.aget_all_wallets(wallets=wallets, currency=currency)
+    return _json(result)
+
+
+@api_view('GET')
+@read_replica
+async def all_transactions(request):
+    wallet_service = WalletService()
+
+    # Histórico gravado pelo sync em Transaction, paginado por cursor nos dois modos
+    serializer = TransactionPageSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return _json(serializer.errors, status=400)
+
+    try:
+        page = await wallet_service.aget_transactions_page(request.user, **serializer.validated_data)
+    except ValueError as e:
+        return _json({"error": str(e)}, status=400)
+    return _json(page)
+
+
+@api_view('GET')
+async def bitcoin_price(request):
+    wallet_service = WalletService()
+
+    try:
+        quote = await wallet_service.aget_btc_quote(request.GET.get('currency'))
+    except ValueError as e:
+        return _json({"error": str(e)}, status=400)
+
+    return _json({
+        "currentPrice": quote["price"],
+        "change24h": quote["change24h"],
+        "low24h": quote["low24h"],
+        "high24h": quote["high24h"]
+    })
+
+
+@api_view('GET', 'POST')
+async def price_history(request):
+    """
+    Gráfico de preços do BTC servido do histórico local. Em GET responde
+    com ETag/Last-Modified e 304 quando o cliente já tem a versão atual.
+    """
+    params = _params(request)
+    period = params.get('period', '1m')  # '24h', '7d', '1m', '6m', '1y'
+
+    history_service = PriceHistoryService()
+    wallet_service = WalletService()
+
+    try:
+        period = history_service.normalize_period(period)
+        currency = wallet_service.normalize_currency(params.get('currency'))
+    except ValueError as e:
+        return _json({"error": str(e)}, status=400)
+
+    try:
+        ohlc = str(params.get('ohlc', '')).lower() in ('1', 'true')
+        chart_data, updated_at, etag = await history_service.aget_chart(period, currency, ohlc=ohlc)
+    except Exception as e:
+        logger.error(f"Erro ao buscar histórico de preço: {str(e)}")
+        return _json({"error": "Falha ao obter dados de preço do Bitcoin"}, status=500)
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(updated_at.timestamp()),
+        "Cache-Control": "private, no-cache",
+    }
+
+    if request.method == 'GET' and not_modified(request, etag, updated_at):
+        return HttpResponse(status=304, headers=headers)
+
+    return _json(chart_data, headers=headers)
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Alias do banco réplica em DATABASES (ver config/settings_production.py)
+REPLICA = 'replica'
+
+# Leituras desta requisição/tarefa podem ir para a réplica. Um ContextVar é
+# copiado pelo sync_to_async, então vale também nas views async
+_use_replica = ContextVar('use_replica', default=False)
+# Leitura pela réplica em andamento ({'user_id', 'wrote'}): o dict é compartilhado
+# com os contextos copiados (threads, sync_to_async), então uma escrita em
+# qualquer um deles manda o resto da requisição para o primário
+_replica_read = ContextVar('replica_read', default=None)
+
+
+def _pin_key(user_id):
+    return f"db_router:primary:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """
+    Leituras do usuário vão para o primário pelos próximos
+    DATABASE_REPLICA_PIN_SECONDS segundos, para que ele veja o que acabou de
+    gravar mesmo com a réplica atrasada. O prazo deve cobrir o atraso máximo
+    da replicação; com mais de um processo, CACHES precisa ser compartilhado.
+    """
+    if REPLICA in connections.databases:
+        cache.set(_pin_key(user_id), True, getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 30))
+
+
+def pinned_to_primary(user_id):
+    return cache.get(_pin_key(user_id)) is not None
+
+
+class ReadReplicaRouter:
+    """
+    Manda as leituras dos endpoints marcados com read_replica para a réplica
+    (alias 'replica'); todo o resto, inclusive qualquer escrita, vai para o
+    primário. Sem réplica configurada tudo fica no 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _replica_read.get()
+        if _use_replica.get() and state is not None and not state['wrote'] and REPLICA in connections.databases:
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # Escrita no meio de uma leitura pela réplica (ex: sync no modo 'request'):
+        # a réplica ficou para trás, então o resto da requisição e as próximas
+        # do usuário leem do primário
+        state = _replica_read.get()
+        if state is not None and not state['wrote']:
+            state['wrote'] = True
+            if state['user_id'] is not None:
+                pin_to_primary(state['user_id'])
+        # Explícito: objetos lidos da réplica também são gravados no primário
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e primário têm os mesmos dados
+        return True
+
+
+@contextmanager
+def replica(user_id=None):
+    """
+    Leituras do bloco vão para a réplica, se houver, a menos que o usuário
+    tenha gravado algo há pouco (pin_to_primary)
+    """
+    if REPLICA not in connections.databases or (user_id is not None and pinned_to_primary(user_id)):
+        yield
+        return
+
+    token = _use_replica.set(True)
+    state_token = _replica_read.set({'user_id': user_id, 'wrote': False})
+    try:
+        yield
+    finally:
+        _replica_read.reset(state_token)
+        _use_replica.reset(token)
+
+
+@contextmanager
+def primary():
+    """Leituras do bloco vão para o primário (ex: sync que lê e grava os mesmos dados)"""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _request_user_id(args):
+    """Usuário autenticado da requisição (HttpRequest ou Request do DRF) entre os argumentos da view"""
+    for arg in args:
+        if hasattr(arg, 'method') and hasattr(arg, 'user'):
+            return arg.user.pk if arg.user.is_authenticated else None
+    return None
+
+
+def read_replica(view):
+    """
+    Decora views (síncronas ou async) que só leem: as consultas vão para a
+    réplica, exceto para usuários fixados no primário após uma escrita
+    """
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapped_async(*args, **kwargs):
+            with replica(_request_user_id(args)):
+                return await view(*args, **kwargs)
+        return wrapped_async
+
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        with replica(_request_user_id(args)):
+            return view(*args, **kwargs)
+    return wrapped
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Conexões SQLite do Django em WAL (leituras não esperam escritas) com
+    synchronous=NORMAL e busy timeout de DATABASE_SQLITE_BUSY_TIMEOUT segundos.
+    Ligado ao sinal connection_created no ready() do app; só age com
+    DATABASE_SQLITE_WAL ligado (perfil de produção), já que o WAL altera o
+    arquivo do banco e deixa os arquivos -wal/-shm ao lado dele.
+    """
+    if connection.vendor != 'sqlite' or not getattr(settings, 'DATABASE_SQLITE_WAL', False):
+        return
+
+    busy_timeout = getattr(settings, 'DATABASE_SQLITE_BUSY_TIMEOUT', 20)
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+        # Banco em memória (testes) não aceita WAL e continua como está
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
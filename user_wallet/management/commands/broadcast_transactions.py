@@ -0,0 +1,39 @@
+import time
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from user_wallet.services.broadcast_service import BroadcastService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Transmite as transações da fila de broadcast, com novas tentativas e backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int,
+            help="Intervalo entre leituras da fila (segundos, padrão BROADCAST_POLL_INTERVAL)"
+        )
+        parser.add_argument('--once', action='store_true', help="Processa a fila uma única vez e sai")
+
+    def handle(self, *args, **options):
+        broadcast_service = BroadcastService()
+        interval = options['interval'] or getattr(settings, 'BROADCAST_POLL_INTERVAL', 5)
+
+        while True:
+            try:
+                processed = broadcast_service.process_due()
+                if processed:
+                    self.stdout.write(f"{processed} transações processadas")
+            except Exception as e:
+                logger.error(f"Erro ao processar a fila de transmissão: {str(e)}")
+
+            if options['once']:
+                return
+
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                self.stdout.write("Transmissão interrompida")
+                return
@@ -0,0 +1,39 @@
+import time
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from user_wallet.services.price_history_service import PriceHistoryService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Atualiza o histórico local de preços do BTC e as séries do price-history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int,
+            help="Intervalo entre atualizações (segundos, padrão PRICE_HISTORY_REFRESH_INTERVAL)"
+        )
+        parser.add_argument('--once', action='store_true', help="Executa uma única atualização e sai")
+
+    def handle(self, *args, **options):
+        history_service = PriceHistoryService()
+        interval = options['interval'] or getattr(settings, 'PRICE_HISTORY_REFRESH_INTERVAL', 900)
+
+        while True:
+            for currency in history_service.currencies:
+                try:
+                    history_service.refresh(currency)
+                    self.stdout.write(f"Histórico de preços atualizado ({currency})")
+                except Exception as e:
+                    logger.error(f"Erro ao atualizar histórico de preços ({currency}): {str(e)}")
+
+            if options['once']:
+                return
+
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                self.stdout.write("Atualização interrompida")
+                return
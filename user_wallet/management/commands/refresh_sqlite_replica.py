@@ -0,0 +1,33 @@
+import sqlite3
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from user_wallet.db_router import REPLICA
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia o banco SQLite primário para a réplica local (alias 'replica'), "
+        "simulando a replicação para testes do perfil de produção"
+    )
+
+    def handle(self, *args, **options):
+        if REPLICA not in connections.databases:
+            raise CommandError("Nenhum banco 'replica' em DATABASES (use config.settings_production)")
+
+        primary, replica = connections.databases['default'], connections.databases[REPLICA]
+        if 'sqlite3' not in primary['ENGINE'] or 'sqlite3' not in replica['ENGINE']:
+            raise CommandError("Só se aplica a primário e réplica em SQLite; servidores replicam sozinhos")
+
+        # Fecha as conexões do Django com a réplica antes de sobrescrever o arquivo
+        connections[REPLICA].close()
+
+        # API de backup do SQLite: cópia consistente mesmo com escritas em andamento
+        source = sqlite3.connect(str(primary['NAME']))
+        target = sqlite3.connect(str(replica['NAME']))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+        self.stdout.write(f"Réplica atualizada: {replica['NAME']}")
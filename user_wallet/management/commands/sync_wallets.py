@@ -0,0 +1,41 @@
+import logging
+from django.core.management.base import BaseCommand
+from user_wallet.services.blockchain_providers import get_blockchain_service
+from user_wallet.services.sync_service import WalletSyncService, WalletSyncScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Mantém os snapshots das carteiras atualizados sincronizando-as periodicamente com os provedores"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help="Número de sincronizações simultâneas")
+        parser.add_argument('--interval', type=int, help="Intervalo base entre syncs de uma carteira (segundos)")
+        parser.add_argument('--max-interval', type=int, help="Intervalo máximo para carteiras ociosas (segundos)")
+        parser.add_argument(
+            '--provider', choices=['bitcoinlib', 'stub'],
+            help="Provedor de dados da blockchain ('stub' roda offline com BLOCKCHAIN_STUB_FIXTURE)"
+        )
+        parser.add_argument('--once', action='store_true', help="Executa uma única rodada e sai")
+
+    def handle(self, *args, **options):
+        scheduler = WalletSyncScheduler(
+            sync_service=WalletSyncService(provider=get_blockchain_service(options['provider'])),
+            concurrency=options['concurrency'],
+            interval=options['interval'],
+            max_interval=options['max_interval'],
+        )
+
+        if options['once']:
+            synced, failed = scheduler.run_once()
+            self.stdout.write(f"{synced} carteiras sincronizadas, {failed} com erro")
+            return
+
+        self.stdout.write(
+            f"Sincronizando carteiras (concorrência={scheduler.concurrency}, intervalo={scheduler.interval}s)"
+        )
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Sync interrompido")
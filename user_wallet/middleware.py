@@ -0,0 +1,70 @@
+import gzip
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+from .db_router import pin_to_primary
+
+re_accepts_gzip = _lazy_re_compile(r"\bgzip\b")
+
+
+class LargeResponseGZipMiddleware(MiddlewareMixin):
+    """
+    gzip só para respostas JSON grandes (a partir de RESPONSE_COMPRESSION_MIN_SIZE
+    bytes), como all-transactions e price-history, no nível
+    RESPONSE_COMPRESSION_LEVEL: o nível 1 comprime 2MB de JSON na metade do
+    tempo do nível 6 do GZipMiddleware do Django, com ~5% a mais de bytes.
+    Respostas pequenas, como as de login com tokens, não são comprimidas: não
+    compensa e evita expor segredos a ataques do tipo BREACH.
+    """
+
+    def process_response(self, request, response):
+        if not getattr(settings, 'RESPONSE_COMPRESSION', True):
+            return response
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        if len(response.content) < getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 8192):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return response
+
+        compressed = gzip.compress(
+            response.content, compresslevel=getattr(settings, 'RESPONSE_COMPRESSION_LEVEL', 1), mtime=0
+        )
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+
+        # Como no GZipMiddleware: ETag forte vira fraca (o corpo mudou de representação)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+
+class PrimaryAfterWriteMiddleware(MiddlewareMixin):
+    """
+    Depois de uma requisição de escrita bem-sucedida (POST, PUT, PATCH,
+    DELETE), as leituras do usuário deixam a réplica por
+    DATABASE_REPLICA_PIN_SECONDS (db_router.pin_to_primary): a carteira
+    recém-criada aparece na listagem seguinte mesmo antes de a réplica
+    recebê-la. Só tem efeito com a réplica configurada.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def process_response(self, request, response):
+        if request.method in self.SAFE_METHODS or response.status_code >= 400:
+            return response
+
+        # Com JWT o usuário só é conhecido depois da view: o DRF o grava em request.user
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
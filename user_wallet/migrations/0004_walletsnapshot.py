@@ -0,0 +1,26 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0003_bitcoinpricecache_change24h_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.BigIntegerField(default=0)),
+                ('tx_count', models.IntegerField(default=0)),
+                ('address', models.CharField(blank=True, default='', max_length=100)),
+                ('tip_height', models.IntegerField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('wallet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='user_wallet.wallet')),
+            ],
+        ),
+    ]
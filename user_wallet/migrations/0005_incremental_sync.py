@@ -0,0 +1,37 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0004_walletsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='last_txid',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='address',
+            name='synced_height',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='block_height',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='transaction',
+            unique_together={('wallet', 'txid')},
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:54
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def fill_missing_dates(apps, schema_editor):
+    # A paginação por (date, txid) não admite datas nulas
+    Transaction = apps.get_model('user_wallet', 'Transaction')
+    Transaction.objects.filter(date__isnull=True).update(date=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0005_incremental_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_missing_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='transaction',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', '-date', '-txid'], name='tx_wallet_date_txid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['-date', '-txid'], name='tx_date_txid_idx'),
+        ),
+    ]
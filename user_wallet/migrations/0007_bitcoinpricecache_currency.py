@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0006_transaction_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bitcoinpricecache',
+            name='currency',
+            field=models.CharField(default='brl', max_length=10, unique=True),
+        ),
+    ]
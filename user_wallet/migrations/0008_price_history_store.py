@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-16 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0007_bitcoinpricecache_currency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistorySeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=10)),
+                ('period', models.CharField(max_length=10)),
+                ('points', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'unique_together': {('currency', 'period')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BitcoinPricePoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=10)),
+                ('timestamp', models.DateTimeField()),
+                ('price', models.FloatField()),
+            ],
+            options={
+                'unique_together': {('currency', 'timestamp')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0008_price_history_store'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='address',
+            name='address',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-16 23:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def reset_sync_marks(apps, schema_editor):
+    # Refaz o sync desde o início para preencher as UTXOs das transações já sincronizadas
+    Address = apps.get_model('user_wallet', 'Address')
+    Address.objects.update(last_txid='', synced_height=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0009_address_lookup_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Utxo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('txid', models.CharField(max_length=100)),
+                ('output_n', models.IntegerField()),
+                ('value', models.BigIntegerField()),
+                ('block_height', models.IntegerField(blank=True, null=True)),
+                ('spent_txid', models.CharField(blank=True, default='', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('address', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utxos', to='user_wallet.address')),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utxos', to='user_wallet.wallet')),
+            ],
+            options={
+                'unique_together': {('wallet', 'txid', 'output_n')},
+            },
+        ),
+        migrations.RunPython(reset_sync_marks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.1.7 on 2026-10-16 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0010_utxo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='utxo',
+            name='is_coinbase',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='walletsnapshot',
+            name='confirmed_balance',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='walletsnapshot',
+            name='immature_balance',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='walletsnapshot',
+            name='unconfirmed_balance',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='utxo',
+            index=models.Index(fields=['wallet', 'spent_txid', 'block_height'], name='utxo_wallet_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='utxo',
+            index=models.Index(fields=['wallet', 'address'], name='utxo_wallet_address_idx'),
+        ),
+    ]
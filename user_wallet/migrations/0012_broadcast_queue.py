@@ -0,0 +1,42 @@
+# Generated by Django 4.1.7 on 2026-10-16 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0011_utxo_balances'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='broadcast_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='broadcast_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='broadcast_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='next_broadcast_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='raw_hex',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['next_broadcast_at'], name='tx_broadcast_queue_idx'),
+        ),
+    ]
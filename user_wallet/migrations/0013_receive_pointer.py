@@ -0,0 +1,37 @@
+# Generated by Django 4.1.7 on 2026-10-16 23:15
+
+from django.db import migrations, models
+from django.db.models import Max, Q
+
+
+def init_receive_pointer(apps, schema_editor):
+    # Começa depois do último endereço de recebimento com transações
+    Wallet = apps.get_model('user_wallet', 'Wallet')
+    Address = apps.get_model('user_wallet', 'Address')
+    used = (
+        Address.objects.filter(is_change=False)
+        .filter(~Q(last_txid='') | Q(utxos__isnull=False))
+        .values('wallet_id').annotate(last_index=Max('index'))
+    )
+    for row in used:
+        Wallet.objects.filter(id=row['wallet_id']).update(next_receive_index=row['last_index'] + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0012_broadcast_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='next_receive_index',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['wallet', 'is_change', 'index'], name='address_wallet_chain_idx'),
+        ),
+        migrations.RunPython(init_receive_pointer, migrations.RunPython.noop),
+    ]
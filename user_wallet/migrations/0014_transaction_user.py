@@ -0,0 +1,57 @@
+# Generated by Django 4.1.7 on 2026-10-17 10:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_transaction_users(apps, schema_editor):
+    # Dono de cada transação vem da carteira
+    Transaction = apps.get_model('user_wallet', 'Transaction')
+    Wallet = apps.get_model('user_wallet', 'Wallet')
+    for wallet_id, user_id in Wallet.objects.values_list('id', 'user_id'):
+        Transaction.objects.filter(wallet_id=wallet_id).update(user_id=user_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('user_wallet', '0013_receive_pointer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.CASCADE,
+                related_name='transactions', to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.RunPython(fill_transaction_users, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='transactions', to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='tx_wallet_date_txid_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='tx_date_txid_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', '-txid', '-id'], name='tx_user_date_txid_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', '-date', '-txid', '-id'], name='tx_wallet_date_txid_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_wallet', '0014_transaction_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='master_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=8),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q, Sum
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -14,7 +15,12 @@ class Wallet(models.Model) :
     name = models.CharField(max_length=100)
     wallet_type = models.CharField(max_length=20, choices=WALLET_TYPES)
     xpub = models.CharField(max_length=200, blank=True, null=True)
+    # Fingerprint (hex) da chave mestra de onde saiu a xpub, para os signatários
+    # externos acharem as chaves da PSBT; vazio = desconhecido
+    master_fingerprint = models.CharField(max_length=8, blank=True, default='')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='wallets')
+    # Próximo índice de recebimento ainda não entregue nem usado (generate_receive_address)
+    next_receive_index = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -26,14 +32,21 @@ class Address(models.Model):
     Modelo para armazenar endereços Bitcoin derivados
     """
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='addresses')
-    address = models.CharField(max_length=100)
+    address = models.CharField(max_length=100, db_index=True)  # Índice para achar a carteira dona do endereço
     path = models.CharField(max_length=50)  # Caminho de derivação (ex: m/0/0)
     is_change = models.BooleanField(default=False)  # True para endereço de troco, False para recebimento
     index = models.IntegerField()  # Índice do endereço
     created_at = models.DateTimeField(auto_now_add=True)
+    # Marca d'água do sync incremental: última transação confirmada vista e sua altura
+    last_txid = models.CharField(max_length=100, blank=True, default='')
+    synced_height = models.IntegerField(null=True, blank=True)
     
     class Meta:
         unique_together = ('wallet', 'path')
+        indexes = [
+            # Último índice derivado por cadeia (Max) sem varrer os endereços da carteira
+            models.Index(fields=['wallet', 'is_change', 'index'], name='address_wallet_chain_idx'),
+        ]
     
     def __str__(self):
         return f"{self.address} ({self.path})"
@@ -49,17 +62,106 @@ class Transaction(models.Model):
     )
     
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='transactions')
+    # Dono da carteira, repetido aqui para a listagem do usuário usar um único índice
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     txid = models.CharField(max_length=100)
     amount = models.BigIntegerField()  # Valor em satoshis
     fee = models.BigIntegerField()  # Taxa em satoshis
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    block_height = models.IntegerField(null=True, blank=True)  # None enquanto não confirmada
+    date = models.DateTimeField(default=timezone.now)  # Data do bloco ou de quando foi vista na mempool
+    # Fila de transmissão: transações assinadas enviadas pelo broadcast
+    raw_hex = models.TextField(blank=True, default='')
+    broadcast_attempts = models.IntegerField(default=0)
+    next_broadcast_at = models.DateTimeField(null=True, blank=True)  # None = nada a transmitir
+    broadcast_at = models.DateTimeField(null=True, blank=True)  # Aceita por algum provedor
+    broadcast_error = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        unique_together = ('wallet', 'txid')
+        indexes = [
+            # Paginação por cursor (date, txid, id) das transações do usuário e de uma carteira
+            models.Index(fields=['user', '-date', '-txid', '-id'], name='tx_user_date_txid_id_idx'),
+            models.Index(fields=['wallet', '-date', '-txid', '-id'], name='tx_wallet_date_txid_id_idx'),
+            models.Index(fields=['next_broadcast_at'], name='tx_broadcast_queue_idx'),
+        ]
+
+    def confirmations(self, tip_height):
+        """Confirmações calculadas a partir da altura atual, sem consultar provedores"""
+        if self.block_height is None or tip_height is None:
+            return 0
+        return max(tip_height - self.block_height + 1, 0)
+
     def __str__(self):
         return f"{self.txid} ({self.status})"
 
+class Utxo(models.Model):
+    """
+    Saída não gasta de um endereço da carteira, mantida pelo sync e usada na
+    seleção de moedas do create_transaction
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='utxos')
+    address = models.ForeignKey(Address, on_delete=models.CASCADE, related_name='utxos')
+    txid = models.CharField(max_length=100)
+    output_n = models.IntegerField()
+    value = models.BigIntegerField()  # Valor em satoshis
+    block_height = models.IntegerField(null=True, blank=True)  # None enquanto não confirmada
+    spent_txid = models.CharField(max_length=100, blank=True, default='')  # Gasta por transação ainda na mempool
+    is_coinbase = models.BooleanField(default=False)  # Só pode ser gasta após COINBASE_MATURITY confirmações
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    COINBASE_MATURITY = 100
+
+    class Meta:
+        unique_together = ('wallet', 'txid', 'output_n')
+        indexes = [
+            # Saldos e seleção de moedas: não gastas e confirmadas/não confirmadas por carteira
+            models.Index(fields=['wallet', 'spent_txid', 'block_height'], name='utxo_wallet_status_idx'),
+            models.Index(fields=['wallet', 'address'], name='utxo_wallet_address_idx'),
+        ]
+
+    @classmethod
+    def _immature(cls, tip_height):
+        # Sem a altura atual, toda coinbase conta como imatura
+        if tip_height is None:
+            return Q(is_coinbase=True)
+        return Q(is_coinbase=True, block_height__gt=tip_height - cls.COINBASE_MATURITY + 1)
+
+    @classmethod
+    def balances(cls, wallet_id, tip_height=None):
+        """
+        Saldos da carteira em satoshis numa única consulta: confirmado, não
+        confirmado, imaturo (coinbase recente) e o total. Saídas já gastas por
+        transações na mempool não entram.
+        """
+        immature = cls._immature(tip_height)
+        confirmed = Q(block_height__isnull=False)
+        totals = cls.objects.filter(wallet_id=wallet_id, spent_txid='').aggregate(
+            confirmed=Sum('value', filter=confirmed & ~immature),
+            unconfirmed=Sum('value', filter=~confirmed),
+            immature=Sum('value', filter=confirmed & immature),
+        )
+        totals = {key: value or 0 for key, value in totals.items()}
+        totals['total'] = totals['confirmed'] + totals['unconfirmed'] + totals['immature']
+        return totals
+
+    @classmethod
+    def spendable(cls, wallet_id, tip_height=None):
+        """UTXOs que podem entrar numa nova transação: confirmadas, maduras e não gastas"""
+        return cls.objects.filter(wallet_id=wallet_id, spent_txid='', block_height__isnull=False).exclude(
+            cls._immature(tip_height)
+        )
+
+    def __str__(self):
+        return f"{self.txid}:{self.output_n} ({self.value})"
+
 class BitcoinPriceCache(models.Model):
+    """
+    Última cotação conhecida do BTC, uma linha por moeda fiduciária
+    """
+    currency = models.CharField(max_length=10, unique=True, default='brl')
     price = models.FloatField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
     change24h = models.FloatField(default=0)
@@ -67,13 +169,69 @@ class BitcoinPriceCache(models.Model):
     high24h = models.FloatField(default=0)
 
     @classmethod
-    def get_cached_price(cls):
+    def get_cached_price(cls, currency='brl'):
         instance, created = cls.objects.get_or_create(
-            id=1,
+            currency=currency,
             defaults={'price': 0}
         )
         return instance
 
     class Meta:
         verbose_name = "Bitcoin Price Cache"
-        verbose_name_plural = "Bitcoin Price Caches"
\ No newline at end of file
+        verbose_name_plural = "Bitcoin Price Caches"
+
+class BitcoinPricePoint(models.Model):
+    """
+    Série histórica local de preços do BTC (horária nos últimos 90 dias,
+    diária antes disso)
+    """
+    currency = models.CharField(max_length=10)
+    timestamp = models.DateTimeField()
+    price = models.FloatField()
+
+    class Meta:
+        unique_together = ('currency', 'timestamp')
+
+class PriceHistorySeries(models.Model):
+    """
+    Série já reduzida (downsampled) de um período do gráfico de preços,
+    pronta para ser servida pelo price-history
+    """
+    currency = models.CharField(max_length=10)
+    period = models.CharField(max_length=10)
+    points = models.JSONField(default=list)  # [[timestamp_ms, fechamento, abertura, máxima, mínima], ...]
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('currency', 'period')
+
+class WalletSnapshot(models.Model):
+    """
+    Último estado conhecido de uma carteira watch-only (saldo, transações,
+    endereço principal e altura do bloco), usado para responder sem consultar
+    a bitcoinlib/provedores a cada requisição
+    """
+    wallet = models.OneToOneField(Wallet, on_delete=models.CASCADE, related_name='snapshot')
+    balance = models.BigIntegerField(default=0)  # Saldo em satoshis
+    tx_count = models.IntegerField(default=0)
+    address = models.CharField(max_length=100, blank=True, default='')
+    tip_height = models.IntegerField(null=True, blank=True)  # Altura do bloco no momento da leitura
+    # Partes do saldo calculadas pelo Utxo.balances
+    confirmed_balance = models.BigIntegerField(default=0)
+    unconfirmed_balance = models.BigIntegerField(default=0)
+    immature_balance = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)  # None = invalidado
+
+    def age(self):
+        """Idade do snapshot em segundos (None se invalidado)"""
+        if self.refreshed_at is None:
+            return None
+        return (timezone.now() - self.refreshed_at).total_seconds()
+
+    @classmethod
+    def invalidate(cls, **filters):
+        """Marca os snapshots como inválidos, forçando recálculo na próxima leitura"""
+        return cls.objects.filter(**filters).update(refreshed_at=None)
+
+    def __str__(self):
+        return f"Snapshot {self.wallet_id} ({self.refreshed_at})"
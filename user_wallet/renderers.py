@@ -0,0 +1,52 @@
+from django.conf import settings
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Sem orjson as respostas saem pelo json da biblioteca padrão
+    orjson = None
+
+# Tipos que o orjson não serializa sozinho (Decimal, lazy strings...) e datas, que
+# passam pelo encoder do DRF para sair no mesmo formato do JSONRenderer
+_drf_encoder = encoders.JSONEncoder()
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+    if orjson else 0
+)
+
+
+def fast_json_enabled():
+    return orjson is not None and getattr(settings, 'JSON_FAST_RENDERER', True)
+
+
+def dumps(data):
+    """
+    JSON compacto em UTF-8 (bytes), igual ao do JSONRenderer do DRF, mas pelo
+    orjson quando disponível (JSON_FAST_RENDERER)
+    """
+    if not fast_json_enabled():
+        return JSONRenderer().render(data)
+
+    content = orjson.dumps(data, default=_drf_encoder.default, option=_ORJSON_OPTIONS)
+    # Como o DRF: U+2028/U+2029 escapados para o JSON continuar válido como JavaScript
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer pelo orjson para os endpoints com respostas grandes
+    (all-balances, all-transactions, price-history). Pedidos com indentação
+    (?format=api, Accept: application/json; indent=4) seguem pelo DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact or self.ensure_ascii or not fast_json_enabled():
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
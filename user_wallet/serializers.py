@@ -13,19 +13,43 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = ['id', 'txid', 'amount', 'fee', 'status', 'created_at', 'updated_at']
 
 class WalletSerializer(serializers.ModelSerializer):
-    addresses = AddressSerializer(many=True, read_only=True)
+    """
+    Representação compacta da carteira: em vez da lista de endereços (sub-recurso
+    paginado /wallets/{id}/addresses/), a contagem e o endereço de recebimento
+    atual. Na listagem os dois vêm anotados da consulta (WalletViewSet.get_queryset)
+    """
+    address_count = serializers.SerializerMethodField()
+    receive_address = serializers.SerializerMethodField()
     
     class Meta:
         model = Wallet
-        fields = ['id', 'name', 'wallet_type', 'xpub', 'created_at', 'updated_at', 'addresses']
+        fields = ['id', 'name', 'wallet_type', 'xpub', 'created_at', 'updated_at', 'address_count', 'receive_address']
         extra_kwargs = {
             'xpub': {'write_only': True}  # Não expõe o xpub nas respostas
         }
 
+    def get_address_count(self, wallet):
+        if hasattr(wallet, 'address_count'):
+            return wallet.address_count
+        return wallet.addresses.count()
+
+    def get_receive_address(self, wallet):
+        # Próximo endereço de recebimento ainda não entregue (o que generate_address devolveria)
+        if hasattr(wallet, 'receive_address'):
+            return wallet.receive_address
+        address = wallet.addresses.filter(is_change=False, index=wallet.next_receive_index).first()
+        return address.address if address else None
+
 class WalletCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Wallet
-        fields = ['name', 'wallet_type', 'xpub']
+        fields = ['name', 'wallet_type', 'xpub', 'master_fingerprint']
+
+    def validate_master_fingerprint(self, value):
+        value = value.lower()
+        if value and (len(value) != 8 or any(char not in '0123456789abcdef' for char in value)):
+            raise serializers.ValidationError("master_fingerprint deve ter 8 caracteres hexadecimais")
+        return value
         
     def validate(self, data):
         # Verifica se o tipo de carteira é válido
@@ -36,7 +60,19 @@ class WalletCreateSerializer(serializers.ModelSerializer):
 class TransactionCreateSerializer(serializers.Serializer):
     to_address = serializers.CharField(max_length=100)
     amount = serializers.IntegerField(min_value=546)  # 546 satoshis é o dust limit
-    fee_rate = serializers.IntegerField(required=False)
+    fee_rate = serializers.IntegerField(required=False, min_value=1)  # sat/vB
+
+class TransactionPageSerializer(serializers.Serializer):
+    """
+    Parâmetros de paginação por cursor e filtros do all-transactions
+    """
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=200, default=50)
+    wallet = serializers.IntegerField(required=False)
+    direction = serializers.ChoiceField(choices=['sent', 'received'], required=False)
+    status = serializers.ChoiceField(choices=Transaction.STATUS_CHOICES, required=False)
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False)
 
 class BroadcastTransactionSerializer(serializers.Serializer):
     tx_hex = serializers.CharField()
@@ -0,0 +1,28 @@
+# Mapa endereço -> carteira dos endereços já carregados pelo sync, usado para
+# classificar entradas/saídas das transações (valor líquido) sem uma consulta
+# por transação. As listagens leem o valor já gravado em Transaction.amount.
+
+
+class AddressIndex:
+    """Mapa endereço -> wallet_id"""
+
+    def __init__(self, owners):
+        self.owners = owners
+
+    @classmethod
+    def for_addresses(cls, addresses, wallet_id):
+        """Índice de uma carteira a partir dos endereços já carregados (ex: sync)"""
+        return cls({address: wallet_id for address in addresses})
+
+    def owns(self, address, wallet_id):
+        return address is not None and self.owners.get(address) == wallet_id
+
+    def net_amount(self, tx, wallet_id):
+        """Recebido nos endereços da carteira menos o que saiu deles, em satoshis"""
+        received = sum(output.value for output in tx.outputs if self.owns(output.address, wallet_id))
+        sent = sum(input_tx.value or 0 for input_tx in tx.inputs if self.owns(input_tx.address, wallet_id))
+        return received - sent
+
+
+def transaction_type(amount):
+    return "sent" if amount < 0 else "received" if amount > 0 else "unknown"
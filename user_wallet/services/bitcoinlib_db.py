@@ -0,0 +1,129 @@
+import sqlite3
+import logging
+import threading
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from bitcoinlib.config import config as bitcoinlib_config
+from bitcoinlib.db import Db, DbTransaction, DbTransactionOutput
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Uma fábrica de sessões por banco ({uri: sessionmaker}), todas sobre o mesmo engine
+_factories = {}
+_factories_lock = threading.Lock()
+_pragmas_installed = False
+
+
+def shard_of(wallet_name):
+    """
+    Shard da carteira watch_only_<id>: id % BITCOINLIB_DATABASE_SHARDS. Nomes
+    sem id numérico ficam no shard 0.
+    """
+    shards = max(getattr(settings, 'BITCOINLIB_DATABASE_SHARDS', 1), 1)
+    wallet_id = (wallet_name or '').rsplit('_', 1)[-1]
+    if shards == 1 or not wallet_id.isdigit():
+        return 0
+    return int(wallet_id) % shards
+
+
+def database_uri(wallet_name=None):
+    """
+    URI do banco da bitcoinlib onde fica a carteira: BITCOINLIB_DATABASE_URI
+    (com {shard} trocado pelo shard da carteira) ou o SQLite padrão da bitcoinlib
+    """
+    uri = getattr(settings, 'BITCOINLIB_DATABASE_URI', None) or bitcoinlib_config.DEFAULT_DATABASE
+    return uri.replace('{shard}', str(shard_of(wallet_name)))
+
+
+def cache_uri():
+    """Banco de cache do Service da bitcoinlib (None = padrão, '' = sem cache)"""
+    return getattr(settings, 'BITCOINLIB_CACHE_URI', None)
+
+
+def session(wallet_name=None):
+    """Nova sessão SQLAlchemy no banco da carteira, sobre o pool de conexões compartilhado"""
+    uri = database_uri(wallet_name)
+    factory = _factories.get(uri)
+    if factory is None:
+        with _factories_lock:
+            factory = _factories.get(uri)
+            if factory is None:
+                factory = _factories[uri] = _create_session_factory(uri)
+    return factory()
+
+
+def _create_session_factory(uri):
+    # O Db da bitcoinlib cria as tabelas, grava a configuração e atualiza a
+    # versão do banco; depois disso só fica o engine com o pool ajustado
+    db = Db(db_uri=uri)
+    db.session.close()
+    db.engine.dispose()
+
+    options = {
+        "isolation_level": 'READ UNCOMMITTED',
+        "pool_size": getattr(settings, 'BITCOINLIB_DATABASE_POOL_SIZE', 10),
+        "max_overflow": getattr(settings, 'BITCOINLIB_DATABASE_MAX_OVERFLOW', 20),
+    }
+    if not db.db_uri.startswith('sqlite'):
+        # Servidor de banco: descarta conexões derrubadas pelo servidor ou pela rede
+        options.update(pool_pre_ping=True, pool_recycle=3600)
+
+    engine = create_engine(db.db_uri, **options)
+    logger.info(f"Banco da bitcoinlib: {engine.url.render_as_string(hide_password=True)}")
+    return sessionmaker(bind=engine, expire_on_commit=True)
+
+
+def balance(wallet):
+    """
+    Saldo da carteira (conta e rede padrão) como Wallet.balance(), só lendo o
+    banco. O balance() da bitcoinlib grava o saldo de cada chave e da carteira
+    a cada chamada, então toda leitura de saldo disputaria o lock de escrita
+    com os syncs.
+    """
+    network, account_id, _ = wallet._get_account_defaults()
+    query = (
+        wallet.session.query(func.sum(DbTransactionOutput.value))
+        .join(DbTransaction)
+        .filter(
+            DbTransactionOutput.spent.is_(False),
+            DbTransactionOutput.key_id.isnot(None),
+            DbTransaction.wallet_id == wallet.wallet_id,
+            DbTransaction.account_id == account_id,
+            DbTransaction.network_name == network,
+        )
+    )
+    if wallet.ignore_dust:
+        query = query.filter(DbTransactionOutput.value >= wallet.network.dust_amount)
+    return round(query.scalar() or 0)
+
+
+def install_sqlite_pragmas():
+    """
+    Configura toda conexão SQLite aberta pela bitcoinlib (carteiras e cache do
+    Service). Com BITCOINLIB_SQLITE_WAL leituras não esperam escritas e vice-versa;
+    BITCOINLIB_SQLITE_BUSY_TIMEOUT é quanto uma escrita espera a outra antes de
+    "database is locked". Chamado no ready() do app.
+    """
+    global _pragmas_installed
+    if _pragmas_installed:
+        return
+    _pragmas_installed = True
+    event.listen(Engine, 'connect', _sqlite_pragmas)
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    busy_timeout = getattr(settings, 'BITCOINLIB_SQLITE_BUSY_TIMEOUT', 30)
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+        if getattr(settings, 'BITCOINLIB_SQLITE_WAL', True):
+            cursor.execute("PRAGMA journal_mode = WAL")
+            # Em WAL, NORMAL só perde as últimas transações numa queda do sistema, sem corromper
+            cursor.execute("PRAGMA synchronous = NORMAL")
+    finally:
+        cursor.close()
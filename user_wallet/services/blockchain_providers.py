@@ -0,0 +1,247 @@
+import json
+import time
+import random
+import logging
+import threading
+from datetime import datetime
+from bitcoinlib.services.services import Service
+from django.conf import settings
+from .provider_router import ProviderRouter
+from . import bitcoinlib_db
+
+logger = logging.getLogger(__name__)
+
+# Roteadores do modo 'bitcoinlib' por (provedores, cache da bitcoinlib, atraso do hedge)
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_blockchain_service(provider=None):
+    """
+    Retorna o provedor de dados da blockchain usado pelo serviço e pelo sync.
+
+    'bitcoinlib' (padrão) distribui as consultas entre os provedores de
+    BLOCKCHAIN_PROVIDERS com o ProviderRouter (um Service da bitcoinlib por
+    provedor); 'stub' usa o StubProvider local, sem rede; 'fake' roteia entre
+    os FakeProviders de BLOCKCHAIN_FAKE_PROVIDERS, para testar o roteamento
+    sem rede.
+    """
+    provider = provider or getattr(settings, 'BLOCKCHAIN_PROVIDER', 'bitcoinlib')
+
+    if provider == 'stub':
+        return StubProvider.from_fixture(getattr(settings, 'BLOCKCHAIN_STUB_FIXTURE', None))
+    if provider == 'bitcoinlib':
+        return _bitcoinlib_router(tuple(getattr(settings, 'BLOCKCHAIN_PROVIDERS', ['blockstream', 'blockcypher'])))
+    if provider == 'fake':
+        fixture = getattr(settings, 'BLOCKCHAIN_STUB_FIXTURE', None)
+        return ProviderRouter([
+            (name, lambda name=name, options=options: FakeProvider.from_fixture(fixture, name=name, **options))
+            for name, options in getattr(settings, 'BLOCKCHAIN_FAKE_PROVIDERS', {}).items()
+        ])
+    raise ValueError(f"Provedor de blockchain desconhecido: {provider}")
+
+
+def _bitcoinlib_router(providers):
+    """
+    Roteador compartilhado pelo processo para esta lista de provedores: os
+    Services da bitcoinlib de cada thread são reaproveitados entre requisições
+    """
+    cache_uri = bitcoinlib_db.cache_uri()
+    hedge_delay = getattr(settings, 'PROVIDER_HEDGE_DELAY', 0.75)
+    key = (providers, cache_uri, hedge_delay)
+    router = _routers.get(key)
+    if router is None:
+        with _routers_lock:
+            router = _routers.get(key)
+            if router is None:
+                router = _routers[key] = ProviderRouter([
+                    (name, lambda name=name: Service(network='bitcoin', providers=[name], cache_uri=cache_uri))
+                    for name in providers
+                ], hedge_delay=hedge_delay)
+    return router
+
+
+def get_broadcast_services():
+    """
+    Provedores usados para transmitir transações, como (nome, fábrica): um
+    por item de BLOCKCHAIN_PROVIDERS, para enviar a todos em paralelo. A
+    fábrica é chamada na thread de envio porque o Service já consulta o
+    provedor no construtor.
+    """
+    provider = getattr(settings, 'BLOCKCHAIN_PROVIDER', 'bitcoinlib')
+
+    if provider in ('stub', 'fake'):
+        return [(provider, lambda: get_blockchain_service('stub'))]
+    if provider == 'bitcoinlib':
+        return [
+            (name, lambda name=name: Service(network='bitcoin', providers=[name], cache_uri=bitcoinlib_db.cache_uri()))
+            for name in getattr(settings, 'BLOCKCHAIN_PROVIDERS', ['blockstream', 'blockcypher'])
+        ]
+    raise ValueError(f"Provedor de blockchain desconhecido: {provider}")
+
+
+class StubTxIO:
+    """
+    Entrada/saída de transação do StubProvider (mesmos atributos usados da bitcoinlib)
+    """
+
+    def __init__(self, address, value, prev_txid=None, output_n=None):
+        self.address = address
+        self.value = value
+        self.prev_txid = prev_txid
+        self.output_n = output_n
+
+
+class StubTransaction:
+    """
+    Transação do StubProvider com a mesma interface de leitura da
+    bitcoinlib.transactions.Transaction usada pelo projeto
+    """
+
+    def __init__(self, txid, inputs, outputs, block_height=None, date=None, fee=0, tip_height=None, coinbase=False):
+        self.txid = txid
+        self.coinbase = coinbase
+        self.inputs = inputs
+        self.outputs = outputs
+        self.block_height = block_height
+        self.date = date
+        self.fee = fee
+        self.network = 'bitcoin'
+
+        if block_height and tip_height:
+            self.confirmations = tip_height - block_height + 1
+            self.status = 'confirmed'
+        else:
+            self.confirmations = 0
+            self.status = 'unconfirmed'
+
+    def __repr__(self):
+        return f"<StubTransaction({self.txid}, {self.status})>"
+
+
+class StubProvider:
+    """
+    Provedor local para rodar o sync offline (desenvolvimento e testes).
+
+    Os dados vêm de um arquivo JSON no formato:
+
+        {
+            "blockcount": 850000,
+            "transactions": [
+                {
+                    "txid": "...", "block_height": 849990, "date": "2024-05-01T12:00:00", "fee": 150,
+                    "raw_hex": "...", "coinbase": false,
+                    "inputs": [{"address": "...", "value": 1000, "prev_txid": "...", "output_n": 0}],
+                    "outputs": [{"address": "...", "value": 850}]
+                }
+            ]
+        }
+    """
+
+    def __init__(self, blockcount=0, transactions=None):
+        self._blockcount = blockcount
+        self._transactions = transactions or []
+
+    @classmethod
+    def from_fixture(cls, path=None):
+        if not path:
+            return cls()
+
+        with open(path) as fixture:
+            data = json.load(fixture)
+
+        return cls(blockcount=data.get('blockcount', 0), transactions=data.get('transactions', []))
+
+    def blockcount(self):
+        return self._blockcount
+
+    def _build_transaction(self, data):
+        date = data.get('date')
+        if date:
+            date = datetime.fromisoformat(date)
+
+        return StubTransaction(
+            txid=data['txid'],
+            inputs=[StubTxIO(**item) for item in data.get('inputs', [])],
+            outputs=[StubTxIO(**item) for item in data.get('outputs', [])],
+            block_height=data.get('block_height'),
+            date=date,
+            fee=data.get('fee', 0),
+            tip_height=self._blockcount,
+            coinbase=data.get('coinbase', False)
+        )
+
+    def gettransactions(self, address, after_txid='', limit=None):
+        """
+        Transações que envolvem o endereço, da mais antiga para a mais nova
+        (mesma ordem e semântica de after_txid do Service da bitcoinlib)
+        """
+        related = [
+            tx for tx in self._transactions
+            if any(item.get('address') == address for item in tx.get('inputs', []) + tx.get('outputs', []))
+        ]
+        # Transações sem bloco (mempool) ficam por último
+        related.sort(key=lambda tx: tx.get('block_height') or float('inf'))
+
+        if after_txid:
+            txids = [tx['txid'] for tx in related]
+            if after_txid in txids:
+                related = related[txids.index(after_txid) + 1:]
+
+        if limit:
+            related = related[:limit]
+
+        return [self._build_transaction(tx) for tx in related]
+
+    def sendrawtransaction(self, rawtx):
+        """Aceita qualquer transação (nada é enviado para a rede)"""
+        logger.info(f"StubProvider: transação recebida para transmissão ({len(rawtx) // 2} bytes)")
+        return {"txid": None, "response_dict": {"stub": True}}
+
+    def getrawtransaction(self, txid):
+        """Transação serializada em hex (campo opcional raw_hex do arquivo)"""
+        for tx in self._transactions:
+            if tx['txid'] == txid and tx.get('raw_hex'):
+                return tx['raw_hex']
+        return False
+
+
+class FakeProvider(StubProvider):
+    """
+    StubProvider com latência e falhas simuladas, para exercitar o
+    ProviderRouter localmente (settings BLOCKCHAIN_FAKE_PROVIDERS):
+
+        {"rapido": {"latency": 0.05}, "instavel": {"latency": 0.2, "jitter": 1.0, "error_rate": 0.3}}
+
+    Cada chamada espera latency + random()*jitter segundos e falha com
+    probabilidade error_rate.
+    """
+
+    def __init__(self, blockcount=0, transactions=None, name='fake', latency=0.0, jitter=0.0, error_rate=0.0):
+        super().__init__(blockcount, transactions)
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    @classmethod
+    def from_fixture(cls, path=None, **options):
+        stub = StubProvider.from_fixture(path)
+        return cls(stub._blockcount, stub._transactions, **options)
+
+    def _simulate(self):
+        time.sleep(self.latency + random.random() * self.jitter)
+        if random.random() < self.error_rate:
+            raise ConnectionError(f"Falha simulada no provedor {self.name}")
+
+    def blockcount(self):
+        self._simulate()
+        return super().blockcount()
+
+    def gettransactions(self, address, after_txid='', limit=None):
+        self._simulate()
+        return super().gettransactions(address, after_txid=after_txid, limit=limit)
+
+    def getrawtransaction(self, txid):
+        self._simulate()
+        return super().getrawtransaction(txid)
@@ -0,0 +1,275 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from bitcoinlib.transactions import Transaction as BitcoinlibTransaction
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+from ..models import Address, Transaction, Utxo, WalletSnapshot
+from .blockchain_providers import get_broadcast_services
+
+logger = logging.getLogger(__name__)
+
+# Primeiras tentativas de transmissão do modo 'request' (compartilhadas pelo processo)
+_submit_executor = None
+_submit_lock = threading.Lock()
+
+# Respostas de provedores que indicam que a transação já está na rede
+ALREADY_KNOWN_ERRORS = (
+    'already in block chain',
+    'already known',
+    'txn-already-in-mempool',
+    'txn-already-known',
+    'transaction already exists',
+)
+
+
+class BroadcastService:
+    """
+    Fila durável de transmissão de transações assinadas.
+
+    O broadcast só valida a transação (assinaturas incluídas), calcula o txid
+    localmente e grava um Transaction pendente com o hex (raw_hex) e
+    next_broadcast_at; a resposta não espera nenhum provedor. O envio acontece
+    depois, para todos os provedores em paralelo: no modo 'request' a primeira
+    tentativa sai num pool de threads e as demais, como no modo 'worker', ficam
+    com o comando broadcast_transactions. Uma aceitação basta; sem nenhuma, a
+    transação volta para a fila com backoff exponencial e, após BROADCAST_MAX_ATTEMPTS,
+    fica como 'failed' e suas UTXOs são liberadas. A passagem de pendente para
+    confirmada é feita pelo sync quando a transação aparece num bloco.
+    """
+
+    def __init__(self):
+        self.max_attempts = getattr(settings, 'BROADCAST_MAX_ATTEMPTS', 10)
+        self.retry_base = getattr(settings, 'BROADCAST_RETRY_BASE', 15)
+        self.retry_max = getattr(settings, 'BROADCAST_RETRY_MAX', 900)
+
+    ## MARK: Fila
+
+    def enqueue(self, tx_hex, user):
+        """
+        Grava a transação para transmissão e retorna o txid. Levanta
+        ValueError se o hex for inválido, se alguma entrada estiver sem
+        assinatura (ou com assinatura inválida para a UTXO local que gasta) ou
+        se não envolver carteiras do usuário; nesses casos nada é gravado.
+        """
+        try:
+            tx = BitcoinlibTransaction.parse_hex(tx_hex, network='bitcoin')
+        except Exception as e:
+            raise ValueError(f"Transação inválida: {str(e)}")
+
+        txid = tx.txid
+        outpoints = {(tx_input.prev_txid.hex(), tx_input.output_n_int) for tx_input in tx.inputs}
+
+        # UTXOs das carteiras do usuário gastas pela transação
+        spent = [
+            utxo for utxo in Utxo.objects.filter(
+                wallet__user=user, txid__in={prev_txid for prev_txid, _ in outpoints}
+            ).values_list('id', 'wallet_id', 'txid', 'output_n', 'value', named=True)
+            if (utxo.txid, utxo.output_n) in outpoints
+        ]
+        self._verify_signatures(tx, {(utxo.txid, utxo.output_n): utxo.value for utxo in spent})
+
+        # Saídas para endereços do usuário (troco ou transferência entre carteiras)
+        own_addresses = {
+            address.address: address for address in Address.objects.filter(
+                wallet__user=user, address__in=[output.address for output in tx.outputs if output.address]
+            )
+        }
+
+        amounts = defaultdict(int)
+        for utxo in spent:
+            amounts[utxo.wallet_id] -= utxo.value
+        new_utxos = []
+        for position, output in enumerate(tx.outputs):
+            address = own_addresses.get(output.address)
+            if address is None:
+                continue
+            amounts[address.wallet_id] += output.value
+            new_utxos.append(Utxo(
+                wallet_id=address.wallet_id, address=address, txid=txid, output_n=position, value=output.value
+            ))
+
+        if not amounts:
+            raise ValueError("A transação não envolve endereços das carteiras do usuário")
+
+        # Taxa só é conhecida quando todas as entradas são UTXOs locais
+        fee = 0
+        if len(spent) == len(outpoints):
+            fee = sum(utxo.value for utxo in spent) - sum(output.value for output in tx.outputs)
+
+        # A linha da carteira que gasta carrega o hex e é a que entra na fila
+        sender_id = spent[0].wallet_id if spent else next(iter(amounts))
+        now = timezone.now()
+
+        with db_transaction.atomic():
+            existing = {
+                row.wallet_id: row for row in Transaction.objects.filter(wallet_id__in=list(amounts), txid=txid)
+            }
+            for wallet_id, amount in amounts.items():
+                queue_fields = {}
+                if wallet_id == sender_id:
+                    queue_fields = {"raw_hex": tx_hex, "next_broadcast_at": now, "broadcast_attempts": 0}
+
+                current = existing.get(wallet_id)
+                if current is None:
+                    Transaction.objects.create(
+                        wallet_id=wallet_id, user=user, txid=txid, amount=amount,
+                        fee=fee if wallet_id == sender_id else 0, status='pending', date=now, **queue_fields
+                    )
+                elif current.status == 'failed':
+                    # Reenvio de uma transação que tinha falhado: volta para a fila
+                    Transaction.objects.filter(pk=current.pk).update(
+                        status='pending', broadcast_error='', **queue_fields
+                    )
+
+            Utxo.objects.filter(id__in=[utxo.id for utxo in spent]).update(spent_txid=txid)
+            Utxo.objects.bulk_create(new_utxos, ignore_conflicts=True)
+
+        logger.info(f"Transação {txid} na fila de transmissão")
+        return txid
+
+    def _verify_signatures(self, tx, values):
+        """
+        Toda entrada precisa estar assinada (scriptSig ou witness). As que
+        gastam UTXOs locais, cujo valor é conhecido, têm a assinatura conferida;
+        as de terceiros (ex: coinjoin) só passam pela checagem de presença.
+        """
+        for tx_input in tx.inputs:
+            if not tx_input.unlocking_script and not tx_input.witnesses:
+                raise ValueError(f"Transação não assinada: entrada {tx_input.index_n} sem assinatura")
+
+            value = values.get((tx_input.prev_txid.hex(), tx_input.output_n_int))
+            if value is None:
+                continue
+            # O hash assinado das entradas segwit (BIP143) inclui o valor gasto
+            tx_input.value = value
+            try:
+                signature_hash = tx.signature_hash(tx_input.index_n, tx_input.hash_type, tx_input.witness_type)
+                valid = bool(signature_hash) and tx_input.verify(signature_hash)
+            except Exception:
+                valid = False
+            if not valid:
+                raise ValueError(f"Assinatura inválida na entrada {tx_input.index_n}")
+
+    def submit_in_background(self, txid):
+        """
+        Primeira tentativa de transmissão num pool de threads do processo
+        (BROADCAST_SUBMIT_WORKERS), sem segurar a requisição nem uma thread
+        durante o backoff. As novas tentativas ficam com process_due (comando
+        broadcast_transactions).
+        """
+        global _submit_executor
+
+        with _submit_lock:
+            if _submit_executor is None:
+                _submit_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BROADCAST_SUBMIT_WORKERS', 4),
+                    thread_name_prefix='tx-broadcast-submit'
+                )
+
+        def run():
+            try:
+                row = Transaction.objects.filter(txid=txid, next_broadcast_at__isnull=False).first()
+                if row is not None:
+                    self.submit(row)
+            except Exception as e:
+                logger.error(f"Erro ao transmitir transação {txid}: {str(e)}")
+            finally:
+                connection.close()
+
+        _submit_executor.submit(run)
+
+    def process_due(self, limit=50):
+        """Transmite as transações da fila com tentativa vencida. Retorna quantas foram processadas."""
+        due = list(
+            Transaction.objects.filter(next_broadcast_at__lte=timezone.now())
+            .order_by('next_broadcast_at')[:limit]
+        )
+        for row in due:
+            try:
+                self.submit(row)
+            except Exception as e:
+                logger.error(f"Erro ao transmitir transação {row.txid}: {str(e)}")
+        return len(due)
+
+    ## MARK: Envio
+
+    def submit(self, row):
+        """
+        Uma tentativa de transmissão. Retorna True se algum provedor aceitou,
+        False se falhou e None se outro processo já pegou a mesma tentativa.
+        """
+        now = timezone.now()
+        # Reserva a tentativa (lease) para não transmitir em dois processos ao mesmo tempo
+        claimed = Transaction.objects.filter(pk=row.pk, next_broadcast_at=row.next_broadcast_at).update(
+            next_broadcast_at=now + timedelta(seconds=self.retry_max)
+        )
+        if not claimed:
+            return None
+
+        accepted, errors = self._send_to_providers(row.raw_hex)
+        attempts = row.broadcast_attempts + 1
+
+        if accepted:
+            Transaction.objects.filter(pk=row.pk).update(
+                broadcast_at=timezone.now(), next_broadcast_at=None, broadcast_attempts=attempts, broadcast_error=''
+            )
+            logger.info(f"Transação {row.txid} transmitida ({', '.join(accepted)})")
+            return True
+
+        error = "; ".join(f"{name}: {message}" for name, message in errors.items())
+        if attempts >= self.max_attempts:
+            self._mark_failed(row, attempts, error)
+            return False
+
+        delay = min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+        Transaction.objects.filter(pk=row.pk).update(
+            next_broadcast_at=timezone.now() + timedelta(seconds=delay),
+            broadcast_attempts=attempts,
+            broadcast_error=error,
+        )
+        logger.warning(f"Transmissão de {row.txid} falhou (tentativa {attempts}), nova tentativa em {delay}s: {error}")
+        return False
+
+    def _send_to_providers(self, raw_hex):
+        """Envia para todos os provedores em paralelo. Retorna (aceitos, {provedor: erro})."""
+        services = get_broadcast_services()
+        accepted = []
+        errors = {}
+
+        def send(name, factory):
+            try:
+                service = factory()
+                result = service.sendrawtransaction(raw_hex)
+                if result:
+                    return True, ''
+                return False, str(getattr(service, 'errors', '') or 'sem resposta')
+            except Exception as e:
+                return False, str(e)
+
+        with ThreadPoolExecutor(max_workers=len(services), thread_name_prefix='tx-broadcast') as executor:
+            futures = {name: executor.submit(send, name, factory) for name, factory in services}
+            for name, future in futures.items():
+                ok, message = future.result()
+                if ok or any(known in message.lower() for known in ALREADY_KNOWN_ERRORS):
+                    accepted.append(name)
+                else:
+                    errors[name] = message
+
+        return accepted, errors
+
+    def _mark_failed(self, row, attempts, error):
+        """Desiste da transmissão: marca como 'failed' e devolve as UTXOs ao saldo"""
+        user_id = row.user_id
+        with db_transaction.atomic():
+            Transaction.objects.filter(pk=row.pk).update(
+                status='failed', next_broadcast_at=None, broadcast_attempts=attempts, broadcast_error=error
+            )
+            Transaction.objects.filter(txid=row.txid, user_id=user_id, status='pending').update(status='failed')
+            Utxo.objects.filter(wallet__user_id=user_id, spent_txid=row.txid).update(spent_txid='')
+            Utxo.objects.filter(wallet__user_id=user_id, txid=row.txid, block_height__isnull=True).delete()
+        WalletSnapshot.invalidate(wallet__user_id=user_id)
+        logger.error(f"Transação {row.txid} marcada como falha após {attempts} tentativas: {error}")
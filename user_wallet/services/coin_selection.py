@@ -0,0 +1,184 @@
+# Seleção de moedas (UTXOs) para montar transações. Primeiro tenta o
+# branch-and-bound do Bitcoin Core, que procura uma combinação sem troco; se
+# não houver, usa a menor UTXO que cobre o valor sozinha (lowest larger) ou,
+# em último caso, as maiores primeiro (largest-first).
+#
+# Tudo trabalha com o valor efetivo de cada UTXO (valor menos a taxa para
+# gastá-la), então as combinações já incluem a taxa das próprias entradas.
+from bisect import bisect_right
+from collections import namedtuple
+import numpy as np
+
+# Tentativas do branch-and-bound (o Bitcoin Core usa 100.000, mas em Python
+# isso passaria de 50 ms; a melhor combinação achada até o limite é usada)
+BNB_MAX_TRIES = 10_000
+
+# indices: posições das UTXOs escolhidas na lista de valores recebida
+# fee/change: taxa e troco em satoshis (change == 0: transação sem troco)
+Selection = namedtuple('Selection', ['indices', 'fee', 'change', 'algorithm'])
+
+
+class InsufficientFunds(ValueError):
+    """
+    Saldo gastável (descontada a taxa de cada entrada) não cobre valor + taxa
+    """
+    pass
+
+
+def select_coins(values, amount, fee_rate, sizes, dust_limit=546, max_tries=BNB_MAX_TRIES):
+    """
+    Escolhe as UTXOs para pagar `amount` satoshis a `fee_rate` sat/vB.
+
+    values: valores das UTXOs em satoshis (lista ou array)
+    sizes: TxSizes com os tamanhos (vbytes) da transação da carteira
+    """
+    input_fee = fee_rate * sizes.input
+    values = np.asarray(values, dtype=np.int64)
+
+    # Só UTXOs que pagam a própria entrada, da maior para a menor (valor efetivo)
+    order = np.flatnonzero(values > input_fee)
+    order = order[np.argsort(-values[order])]
+    effective = (values[order] - input_fee).tolist()
+    order = order.tolist()
+    available = sum(effective)
+
+    # Sem troco: entradas precisam cobrir valor + taxa da parte fixa da transação
+    target = amount + fee_rate * (sizes.base + sizes.recipient)
+    # Excesso aceitável sem troco: o que custaria criar e depois gastar o troco
+    cost_of_change = fee_rate * (sizes.change + sizes.change_spend)
+
+    if available < target:
+        raise InsufficientFunds(
+            f"Saldo insuficiente: disponível {available} sat após taxas, necessário {target} sat"
+        )
+
+    chosen = _branch_and_bound(effective, target, cost_of_change, max_tries)
+    if chosen is not None:
+        selected = [order[index] for index in chosen]
+        total = int(values[selected].sum())
+        return Selection(selected, total - amount, 0, 'bnb')
+
+    # Com troco: valor + taxa (incluindo a saída de troco) + troco mínimo
+    target_with_change = amount + fee_rate * (sizes.base + sizes.recipient + sizes.change) + dust_limit
+
+    chosen = _lowest_larger(effective, target_with_change)
+    algorithm = 'lowest-larger'
+    if chosen is None:
+        chosen = _largest_first(effective, target_with_change)
+        algorithm = 'largest-first'
+    if chosen is None:
+        raise InsufficientFunds(
+            f"Saldo insuficiente: disponível {available} sat após taxas, "
+            f"necessário {target_with_change} sat com troco"
+        )
+
+    selected = [order[index] for index in chosen]
+    total = int(values[selected].sum())
+    fee = fee_rate * (sizes.base + sizes.recipient + sizes.change + sizes.input * len(selected))
+    return Selection(selected, fee, total - amount - fee, algorithm)
+
+
+def _branch_and_bound(values, target, tolerance, max_tries):
+    """
+    Busca em profundidade (maiores primeiro) por um subconjunto com soma em
+    [target, target + tolerance], ficando com o de menor excesso. `values`
+    em ordem decrescente. Retorna os índices ou None.
+    """
+    upper = target + tolerance
+    # UTXOs maiores que o limite nunca entram: a busca começa depois delas
+    start = bisect_right(_NegatedView(values), -upper - 1)
+    selection = []  # índices incluídos no ramo atual
+    current = 0
+    remaining = sum(values[start:])  # soma dos valores ainda não decididos
+    best = None
+    best_excess = None
+    index = start
+
+    for _ in range(max_tries):
+        backtrack = False
+        if current + remaining < target or current > upper:
+            backtrack = True
+        elif current >= target:
+            excess = current - target
+            if best is None or excess < best_excess:
+                best, best_excess = list(selection), excess
+                if excess == 0:
+                    break
+            backtrack = True
+
+        if backtrack:
+            if not selection:
+                break
+            # Devolve à soma restante os valores pulados depois do último incluído
+            index -= 1
+            last = selection[-1]
+            while index > last:
+                remaining += values[index]
+                index -= 1
+            # Explora o ramo que exclui o último incluído
+            current -= values[last]
+            selection.pop()
+        else:
+            value = values[index]
+            remaining -= value
+            # Pular igual ao anterior excluído repetiria um ramo já visto
+            if not selection or selection[-1] == index - 1 or index == start or value != values[index - 1]:
+                selection.append(index)
+                current += value
+        index += 1
+
+    return best
+
+
+def _lowest_larger(values, target):
+    """Menor UTXO que cobre o alvo sozinha (`values` em ordem decrescente)"""
+    if not values or values[0] < target:
+        return None
+    # bisect precisa de ordem crescente: busca pelos valores negados
+    return [bisect_right(_NegatedView(values), -target) - 1]
+
+
+def _largest_first(values, target):
+    total = 0
+    for index, value in enumerate(values):
+        total += value
+        if total >= target:
+            return list(range(index + 1))
+    return None
+
+
+class _NegatedView:
+    """Visão crescente (valores negados) de uma lista decrescente, para o bisect"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return -self.values[index]
+
+
+TxSizes = namedtuple('TxSizes', ['base', 'input', 'recipient', 'change', 'change_spend'])
+
+# Tamanhos em vbytes (arredondados para cima) por tipo de script da carteira:
+# parte fixa da transação, entrada e saída
+SCRIPT_SIZES = {
+    'legacy': {'base': 10, 'input': 148, 'output': 34},
+    'p2sh-segwit': {'base': 11, 'input': 91, 'output': 32},
+    'segwit': {'base': 11, 'input': 68, 'output': 31},
+}
+
+
+def tx_sizes(witness_type, recipient_script_length):
+    """Tamanhos da transação de uma carteira para um destinatário com o script dado"""
+    sizes = SCRIPT_SIZES[witness_type]
+    return TxSizes(
+        base=sizes['base'],
+        input=sizes['input'],
+        # valor (8) + tamanho do script (1) + script
+        recipient=9 + recipient_script_length,
+        change=sizes['output'],
+        change_spend=sizes['input'],
+    )
@@ -0,0 +1,41 @@
+import csv
+import json
+
+# Colunas da exportação, na ordem do CSV
+EXPORT_FIELDS = ['txid', 'date', 'transaction_type', 'value', 'status', 'confirmations', 'network']
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    """Buffer que só devolve o que recebe, para o csv.writer gerar linhas sob demanda"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps({field: row.get(field) for field in EXPORT_FIELDS}) + '\n'
+
+
+def export_lines(rows, export_format):
+    """
+    Converte um gerador de transações em linhas do formato pedido, uma a uma,
+    para o StreamingHttpResponse (memória constante independente do histórico)
+    """
+    if export_format == 'csv':
+        return csv_lines(rows)
+    if export_format == 'ndjson':
+        return ndjson_lines(rows)
+    raise ValueError(f"Formato de exportação inválido: {export_format}")
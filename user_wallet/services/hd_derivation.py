@@ -0,0 +1,65 @@
+# Derivação de endereços direto pela HDKey da bitcoinlib, sem passar pelo banco
+# de carteiras dela. Os nós públicos da conta (xpub/ypub/zpub) e das cadeias
+# /0 (recebimento) e /1 (troco) ficam num LRU por xpub, então derivar o
+# endereço i custa uma única derivação filha.
+from functools import lru_cache
+from django.conf import settings
+from bitcoinlib.keys import HDKey
+
+CACHE_SIZE = getattr(settings, 'WALLET_DERIVATION_CACHE_SIZE', 256)
+
+# Purpose (BIP44/49/84) de cada tipo de xpub e bit dos índices hardened
+PURPOSES = {'legacy': 44, 'p2sh-segwit': 49, 'segwit': 84}
+HARDENED = 0x80000000
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def account_key(xpub):
+    """Nó público da conta (a própria xpub, já decodificada)"""
+    return HDKey(xpub, network='bitcoin')
+
+
+@lru_cache(maxsize=CACHE_SIZE * 2)
+def chain_key(xpub, change):
+    """Nó público da cadeia de recebimento (change=0) ou de troco (change=1)"""
+    return account_key(xpub).child_public(int(change))
+
+
+def derive_address(xpub, change, index):
+    return chain_key(xpub, change).child_public(index).address()
+
+
+def derive_public_key(xpub, change, index):
+    """Chave pública comprimida (bytes) do endereço change/index"""
+    return chain_key(xpub, change).child_public(index).public_byte
+
+
+def witness_type(xpub):
+    """'legacy' (xpub), 'p2sh-segwit' (ypub) ou 'segwit' (zpub)"""
+    return account_key(xpub).witness_type
+
+
+def key_origin(xpub, master_fingerprint, change, index):
+    """
+    (fingerprint, caminho) da chave change/index para a PSBT (BIP174). Com o
+    fingerprint mestre e uma xpub de conta (profundidade 3) o caminho é o
+    completo, m/purpose'/0'/conta'/change/index; sem ele a origem é a própria
+    xpub (fingerprint dela e caminho relativo change/index).
+    """
+    account = account_key(xpub)
+    if master_fingerprint and account.depth == 3:
+        purpose = PURPOSES[account.witness_type] | HARDENED
+        return bytes.fromhex(master_fingerprint), [purpose, HARDENED, account.child_index, int(change), index]
+    return account.fingerprint, [int(change), index]
+
+
+def derive_addresses(xpub, change, start, count):
+    """Gera (índice, endereço) para os índices [start, start + count) da cadeia"""
+    chain = chain_key(xpub, change)
+    for index in range(start, start + count):
+        yield index, chain.child_public(index).address()
+
+
+def clear_cache():
+    account_key.cache_clear()
+    chain_key.cache_clear()
@@ -0,0 +1,288 @@
+import time
+import asyncio
+import logging
+import itertools
+import threading
+import weakref
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+try:
+    import httpx
+except ImportError:  # Só as views async precisam do httpx
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# Uma sessão por host (scheme://host:porta), criada na primeira chamada
+_sessions = {}
+_sessions_lock = threading.Lock()
+_http2_checked = False
+_http2_enabled = False
+
+
+class HostSession:
+    """
+    Sessão HTTP de um host com pool de conexões keep-alive e métricas.
+
+    As conexões ficam abertas entre chamadas (sem novo TCP+TLS por requisição)
+    até HTTP_POOL_MAXSIZE por host; com HTTP_POOL_BLOCK as threads excedentes
+    esperam uma conexão livre em vez de abrir conexões descartáveis.
+
+    As chamadas async (views ASGI) usam clientes httpx por event loop, com
+    até HTTP_ASYNC_POOL_MAXSIZE conexões no total, e somam nas mesmas métricas.
+    """
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.pool_maxsize = getattr(settings, 'HTTP_POOL_MAXSIZE', 10)
+        self.pool_block = getattr(settings, 'HTTP_POOL_BLOCK', True)
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, pool_block=self.pool_block)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        # {event loop: _AsyncPool}; clientes httpx não podem ser usados fora do loop em que foram criados
+        self.async_pool_maxsize = getattr(settings, 'HTTP_ASYNC_POOL_MAXSIZE', 100)
+        self._async_pools = weakref.WeakKeyDictionary()
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def request(self, method, url, **kwargs):
+        self._started()
+        start = time.perf_counter()
+        error = timed_out = False
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.Timeout:
+            error = timed_out = True
+            raise
+        except requests.RequestException:
+            error = True
+            raise
+        finally:
+            self._finished(time.perf_counter() - start, error, timed_out)
+
+    async def arequest(self, method, url, timeout=None, **kwargs):
+        pool = await self._async_pool()
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+
+        self._started()
+        start = time.perf_counter()
+        error = timed_out = False
+        try:
+            async with pool.slots:
+                return await next(pool.clients).request(
+                    method, url, timeout=httpx.Timeout(read, connect=connect), **kwargs
+                )
+        except httpx.TimeoutException:
+            error = timed_out = True
+            raise
+        except httpx.HTTPError:
+            error = True
+            raise
+        finally:
+            self._finished(time.perf_counter() - start, error, timed_out)
+
+    async def _async_pool(self):
+        if httpx is None:
+            raise RuntimeError("Chamadas HTTP async exigem o pacote httpx")
+
+        loop = asyncio.get_running_loop()
+        pool = self._async_pools.get(loop)
+        if pool is None:
+            pool = self._async_pools[loop] = _AsyncPool(self.async_pool_maxsize)
+            # O pool referencia o loop (semáforo): sai do dicionário ao fechar, senão o loop nunca é liberado
+            await pool.close_with_loop(lambda: self._async_pools.pop(loop, None))
+        return pool
+
+    def _started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _finished(self, elapsed, error, timed_out):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.errors += error
+            self.timeouts += timed_out
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+
+    def stats(self):
+        # Conexões abertas pelo urllib3 e quantas estão ociosas no pool agora
+        connections = idle = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            if pool.pool is not None:
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "avg_ms": round(self.total_time / self.requests * 1000, 1) if self.requests else 0.0,
+                "max_ms": round(self.max_time * 1000, 1),
+                "connections_opened": connections,
+                "idle_connections": idle,
+                "pool_maxsize": self.pool_maxsize,
+                "async_loops": len(self._async_pools),
+            }
+
+
+class _AsyncPool:
+    """
+    Conexões async de um host num event loop, divididas em clientes httpx de
+    até HTTP_ASYNC_SHARD_SIZE conexões usados em rodízio. O pool do httpcore
+    percorre todas as conexões e requisições em espera a cada evento (custo
+    quadrático com centenas de chamadas simultâneas); com clientes menores e
+    o excedente esperando no semáforo, 500 chamadas concorrentes caem de
+    ~12s para ~2s (benchmarks/bench_async_http.py).
+    """
+
+    def __init__(self, maxsize):
+        shard_size = max(getattr(settings, 'HTTP_ASYNC_SHARD_SIZE', 32), 1)
+        shards = max(-(-maxsize // shard_size), 1)
+        limits = httpx.Limits(max_connections=shard_size, max_keepalive_connections=shard_size)
+        self.slots = asyncio.Semaphore(maxsize)
+        self._clients = [httpx.AsyncClient(limits=limits, http2=_http2_enabled) for _ in range(shards)]
+        self.clients = itertools.cycle(self._clients)
+        self._closer = None
+
+    async def close_with_loop(self, on_close):
+        """
+        Fecha os clientes quando o event loop terminar e chama on_close. O
+        loop.shutdown_asyncgens() (chamado pelo asyncio.run, logo também pelo
+        async_to_sync de cada requisição sob WSGI, e pelo uvicorn ao parar)
+        encerra o gerador abaixo, que fecha as conexões em vez de deixá-las
+        abertas com o loop já morto.
+        """
+        self._closer = self._close_at_shutdown(on_close)
+        await self._closer.__anext__()
+
+    async def _close_at_shutdown(self, on_close):
+        try:
+            yield
+        finally:
+            for client in self._clients:
+                await client.aclose()
+            on_close()
+
+
+def default_timeout():
+    """(connect, read) em segundos, aplicado a toda chamada sem timeout explícito"""
+    return (getattr(settings, 'HTTP_CONNECT_TIMEOUT', 3.05), getattr(settings, 'HTTP_READ_TIMEOUT', 10))
+
+
+def get_session(url):
+    """Sessão compartilhada do host da URL"""
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+
+    session = _sessions.get(origin)
+    if session is None:
+        with _sessions_lock:
+            _enable_http2()
+            session = _sessions.get(origin)
+            if session is None:
+                session = _sessions[origin] = HostSession(origin)
+    return session
+
+
+def request(method, url, timeout=None, **kwargs):
+    """requests.request pelo pool do host, sempre com timeout"""
+    return get_session(url).request(method, url, timeout=timeout or default_timeout(), **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+async def arequest(method, url, timeout=None, **kwargs):
+    """Versão async de request (httpx), com o mesmo pool por host e timeouts"""
+    return await get_session(url).arequest(method, url, timeout=timeout or default_timeout(), **kwargs)
+
+
+async def aget(url, **kwargs):
+    return await arequest('GET', url, **kwargs)
+
+
+def stats():
+    """Métricas por host do processo atual, para dimensionar HTTP_POOL_MAXSIZE"""
+    return {origin: session.stats() for origin, session in list(_sessions.items())}
+
+
+def close_all():
+    """Fecha as conexões de todos os hosts (o próximo uso abre sessões novas)"""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.session.close()
+
+
+def _enable_http2():
+    """
+    HTTP/2 opcional (HTTP_HTTP2 = True): usa o suporte do urllib3 2.x, que
+    exige o pacote h2. Sem ele segue em HTTP/1.1 com keep-alive.
+    """
+    global _http2_checked, _http2_enabled
+    if _http2_checked:
+        return
+    _http2_checked = True
+
+    if not getattr(settings, 'HTTP_HTTP2', False):
+        return
+    try:
+        from urllib3.http2 import inject_into_urllib3
+        inject_into_urllib3()
+        _http2_enabled = True
+        logger.info("HTTP/2 habilitado para as chamadas externas")
+    except ImportError as e:
+        logger.warning(f"HTTP/2 indisponível ({str(e)}), usando HTTP/1.1 com keep-alive")
+
+
+class _BitcoinlibRequests:
+    """
+    Substitui o módulo requests usado pelo cliente base da bitcoinlib, para
+    que os provedores da blockchain usem os mesmos pools e métricas. get e
+    post vão pelo http_client; o resto (exceções etc.) vem do próprio requests.
+    """
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    def get(self, url, **kwargs):
+        return request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return request('POST', url, **kwargs)
+
+
+def install_bitcoinlib():
+    """Faz o Service da bitcoinlib passar pelo http_client (chamado no ready() do app)"""
+    from bitcoinlib.services import baseclient
+    if not isinstance(baseclient.requests, _BitcoinlibRequests):
+        baseclient.requests = _BitcoinlibRequests()
@@ -0,0 +1,288 @@
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import numpy as np
+from asgiref.sync import sync_to_async
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from ..models import BitcoinPricePoint, PriceHistorySeries
+from . import http_client, price_series
+
+logger = logging.getLogger(__name__)
+
+COINGECKO_MARKET_CHART_URL = "https://api.coingecko.com/api/v3/coins/bitcoin/market_chart"
+
+# período: (dias, tamanho do balde em segundos, formato do rótulo)
+PERIODS = {
+    '24h': (1, 3600, '%H:%M'),  # Hora
+    '7d': (7, 86400, '%d/%m'),  # Dia/Mês
+    '1m': (30, 86400, '%d/%m'),
+    '6m': (180, 86400, '%b/%Y'),  # Mês/Ano
+    '1a': (365, 86400, '%b/%Y'),
+}
+PERIOD_ALIASES = {'1y': '1a'}
+
+# Janelas buscadas na CoinGecko: até 90 dias ela devolve pontos horários, acima disso diários
+FETCH_WINDOWS = (90, 365)
+
+# Gráficos montados em memória por (moeda, período) e controle do refresh
+_charts = {}
+_charts_lock = threading.Lock()
+_refreshing = set()
+
+
+class PriceHistoryService:
+    """
+    Histórico de preços do BTC servido do banco/memória.
+
+    Os pontos ficam em BitcoinPricePoint e cada período do gráfico é
+    pré-agregado em PriceHistorySeries pelo comando refresh_price_history.
+    As requisições só leem essas séries; se estiverem mais velhas que
+    PRICE_HISTORY_MAX_AGE, uma atualização é disparada em segundo plano.
+    """
+
+    def __init__(self):
+        self.max_age = getattr(settings, 'PRICE_HISTORY_MAX_AGE', 3600)
+        self.memory_ttl = getattr(settings, 'PRICE_HISTORY_MEMORY_TTL', 60)
+        self.currencies = [currency.lower() for currency in getattr(settings, 'BTC_PRICE_CURRENCIES', ['brl'])]
+
+    def normalize_period(self, period):
+        period = PERIOD_ALIASES.get(period, period)
+        if period not in PERIODS:
+            raise ValueError("Período inválido. Use: 24h, 7d, 1m, 6m ou 1y")
+        return period
+
+    ## MARK: Leitura
+
+    def get_chart(self, period, currency, ohlc=False):
+        """
+        Retorna (payload do gráfico, updated_at, etag). Sem série gravada ainda,
+        busca uma vez na hora (primeira execução sem o comando de refresh).
+        Com ohlc=True o payload inclui abertura/máxima/mínima/fechamento de cada balde.
+        """
+        key = (currency, period, ohlc)
+        chart = self._memory_chart(key)
+        if chart is not None:
+            return chart
+        cached = _charts.get(key)
+
+        # Confere no banco se o job gravou uma série mais nova
+        updated_at = (
+            PriceHistorySeries.objects.filter(currency=currency, period=period)
+            .values_list('updated_at', flat=True).first()
+        )
+        if updated_at is None:
+            self.refresh(currency)
+            updated_at = (
+                PriceHistorySeries.objects.filter(currency=currency, period=period)
+                .values_list('updated_at', flat=True).first()
+            )
+            if updated_at is None:
+                raise LookupError(f"Histórico de preços indisponível para {currency}")
+
+        if cached is None or cached['updated_at'] != updated_at:
+            series = PriceHistorySeries.objects.get(currency=currency, period=period)
+            cached = {
+                "payload": self.build_chart(period, currency, series.points, ohlc),
+                "updated_at": series.updated_at,
+                "etag": self._etag(currency, period, series.updated_at, ohlc),
+            }
+        cached['checked_at'] = time.time()
+        with _charts_lock:
+            _charts[key] = cached
+
+        self._refresh_if_old(currency, cached['updated_at'])
+        return cached['payload'], cached['updated_at'], cached['etag']
+
+    async def aget_chart(self, period, currency, ohlc=False):
+        """
+        Versão async do get_chart: o gráfico em memória sai sem trocar de
+        thread e, sem série gravada, a primeira busca na CoinGecko usa o
+        cliente HTTP async em vez de prender uma thread
+        """
+        chart = self._memory_chart((currency, period, ohlc))
+        if chart is not None:
+            return chart
+
+        if not await PriceHistorySeries.objects.filter(currency=currency, period=period).aexists():
+            await self.arefresh(currency)
+        return await sync_to_async(self.get_chart)(period, currency, ohlc)
+
+    def _memory_chart(self, key):
+        """(payload, updated_at, etag) do gráfico em memória, se conferido há menos de PRICE_HISTORY_MEMORY_TTL"""
+        cached = _charts.get(key)
+        if cached is None or time.time() - cached['checked_at'] >= self.memory_ttl:
+            return None
+        self._refresh_if_old(key[0], cached['updated_at'])
+        return cached['payload'], cached['updated_at'], cached['etag']
+
+    def _etag(self, currency, period, updated_at, ohlc=False):
+        digest = hashlib.sha1(f"{currency}:{period}:{ohlc}:{updated_at.isoformat()}".encode()).hexdigest()
+        return f'"{digest[:16]}"'
+
+    def build_chart(self, period, currency, points, ohlc=False):
+        """
+        Monta o payload do gráfico a partir dos pontos [[timestamp_ms,
+        fechamento, abertura, máxima, mínima], ...] com operações em lote
+        """
+        _, _, label_format = PERIODS[period]
+
+        data = np.asarray(points, dtype=np.float64).reshape(-1, len(points[0]) if points else 2)
+        timestamps = data[:, 0].astype(np.int64)
+
+        chart_data = {
+            "labels": price_series.format_labels(timestamps, label_format),
+            "datasets": [
+                {
+                    "label": f"Preço BTC ({currency.upper()})" if currency != 'brl' else "Preço BTC (R$)",
+                    "data": price_series.round_prices(data[:, 1]),
+                    "borderColor": "#F7931A",
+                    "backgroundColor": "rgba(247, 147, 26, 0.1)",
+                    "tension": 0.4,
+                    "fill": True
+                }
+            ]
+        }
+
+        if ohlc and data.shape[1] >= 5:
+            chart_data["ohlc"] = {
+                "open": price_series.round_prices(data[:, 2]),
+                "high": price_series.round_prices(data[:, 3]),
+                "low": price_series.round_prices(data[:, 4]),
+                "close": price_series.round_prices(data[:, 1]),
+            }
+
+        return chart_data
+
+    def _refresh_if_old(self, currency, updated_at):
+        if (timezone.now() - updated_at).total_seconds() > self.max_age:
+            self.refresh_in_background(currency)
+
+    ## MARK: Atualização
+
+    def refresh_in_background(self, currency):
+        with _charts_lock:
+            if currency in _refreshing:
+                return False
+            _refreshing.add(currency)
+
+        def run():
+            try:
+                self.refresh(currency)
+            except Exception as e:
+                logger.error(f"Erro ao atualizar histórico de preços ({currency}): {str(e)}")
+            finally:
+                with _charts_lock:
+                    _refreshing.discard(currency)
+                connection.close()
+
+        threading.Thread(target=run, name='price-history-refresh', daemon=True).start()
+        return True
+
+    def refresh(self, currency):
+        """
+        Busca os pontos na CoinGecko, grava em BitcoinPricePoint e recalcula
+        as séries de todos os períodos. Um processo por vez por moeda.
+        """
+        lock_key = f'price_history:{currency}:refresh'
+        if not cache.add(lock_key, True, timeout=120):
+            logger.debug(f"Histórico de preços ({currency}) já está sendo atualizado")
+            return False
+
+        try:
+            responses = [
+                http_client.get(COINGECKO_MARKET_CHART_URL, params={"vs_currency": currency, "days": days})
+                for days in FETCH_WINDOWS
+            ]
+            return self._save_responses(currency, responses)
+        finally:
+            cache.delete(lock_key)
+
+    async def arefresh(self, currency):
+        """Versão async do refresh: as janelas são buscadas em paralelo com o cliente HTTP async"""
+        lock_key = f'price_history:{currency}:refresh'
+        if not await sync_to_async(cache.add)(lock_key, True, timeout=120):
+            logger.debug(f"Histórico de preços ({currency}) já está sendo atualizado")
+            return False
+
+        try:
+            responses = await asyncio.gather(*(
+                http_client.aget(COINGECKO_MARKET_CHART_URL, params={"vs_currency": currency, "days": days})
+                for days in FETCH_WINDOWS
+            ))
+            return await sync_to_async(self._save_responses)(currency, responses)
+        finally:
+            await sync_to_async(cache.delete)(lock_key)
+
+    def _save_responses(self, currency, responses):
+        points = {}
+        for response in responses:
+            response.raise_for_status()
+            for timestamp, price in response.json().get("prices", []):
+                points[int(timestamp)] = price
+
+        if not points:
+            logger.warning(f"CoinGecko não retornou histórico de preços para {currency}")
+            return False
+
+        self._store_points(currency, points)
+        self.rebuild_series(currency)
+        logger.info(f"Histórico de preços ({currency}) atualizado com {len(points)} pontos")
+        return True
+
+    def _store_points(self, currency, points):
+        rows = [
+            BitcoinPricePoint(
+                currency=currency,
+                timestamp=datetime.fromtimestamp(timestamp / 1000, tz=dt_timezone.utc),
+                price=price
+            )
+            for timestamp, price in points.items()
+        ]
+        oldest = timezone.now() - timedelta(days=max(FETCH_WINDOWS) + 1)
+
+        with transaction.atomic():
+            BitcoinPricePoint.objects.bulk_create(
+                rows, batch_size=500, update_conflicts=True,
+                unique_fields=['currency', 'timestamp'], update_fields=['price']
+            )
+            BitcoinPricePoint.objects.filter(currency=currency, timestamp__lt=oldest).delete()
+
+    def rebuild_series(self, currency):
+        """
+        Reduz os pontos de cada período a um por balde, guardando
+        [timestamp_ms, fechamento, abertura, máxima, mínima]
+        """
+        now = timezone.now()
+        updated_at = now
+
+        # Lê o ano inteiro uma vez e recorta cada período nos arrays
+        rows = (
+            BitcoinPricePoint.objects.filter(
+                currency=currency, timestamp__gte=now - timedelta(days=max(days for days, _, _ in PERIODS.values()))
+            )
+            .order_by('timestamp')
+            .values_list('timestamp', 'price')
+        )
+        timestamps = np.fromiter((int(timestamp.timestamp() * 1000) for timestamp, _ in rows), dtype=np.int64)
+        prices = np.fromiter((price for _, price in rows), dtype=np.float64)
+
+        for period, (days, bucket, _) in PERIODS.items():
+            since = int((now - timedelta(days=days)).timestamp() * 1000)
+            start = np.searchsorted(timestamps, since)
+
+            bucket_ts, opens, highs, lows, closes = price_series.resample_ohlc(
+                timestamps[start:], prices[start:], bucket
+            )
+            series_points = np.column_stack([bucket_ts, closes, opens, highs, lows]).tolist()
+            for point in series_points:
+                point[0] = int(point[0])
+
+            values = {"points": series_points, "updated_at": updated_at}
+            if not PriceHistorySeries.objects.filter(currency=currency, period=period).update(**values):
+                PriceHistorySeries.objects.create(currency=currency, period=period, **values)
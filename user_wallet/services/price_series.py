@@ -0,0 +1,79 @@
+# Operações em lote sobre séries de preço (timestamps em ms + preços) com NumPy,
+# usadas pelo price-history no lugar de loops ponto a ponto
+from datetime import datetime, timezone as dt_timezone
+import numpy as np
+
+# Resolução necessária para cada formato de rótulo: pontos que caem no mesmo
+# dia/mês têm o mesmo rótulo, então só os valores únicos são formatados
+LABEL_RESOLUTIONS = {
+    '%d/%m': 'D',
+    '%b/%Y': 'M',
+}
+
+
+def to_arrays(points):
+    """[[timestamp_ms, preço, ...], ...] -> (timestamps int64, preços float64)"""
+    if not len(points):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    data = np.asarray(points, dtype=np.float64)
+    return data[:, 0].astype(np.int64), data[:, 1]
+
+
+def format_labels(timestamps_ms, label_format):
+    """
+    Formata os rótulos (em UTC, o TIME_ZONE do projeto) chamando strftime só
+    uma vez por valor distinto na resolução do formato
+    """
+    if not len(timestamps_ms):
+        return []
+
+    if label_format == '%H:%M':
+        # Hora do dia: no máximo 1440 rótulos distintos, independente do período
+        minutes = (timestamps_ms // 60_000) % 1440
+        unique, inverse = np.unique(minutes, return_inverse=True)
+        unique_labels = np.array([f"{minute // 60:02d}:{minute % 60:02d}" for minute in unique.tolist()])
+        return unique_labels[inverse].tolist()
+
+    resolution = LABEL_RESOLUTIONS.get(label_format, 's')
+    truncated = timestamps_ms.astype('datetime64[ms]').astype(f'datetime64[{resolution}]')
+    unique, inverse = np.unique(truncated, return_inverse=True)
+
+    unique_seconds = unique.astype('datetime64[s]').astype(np.int64)
+    unique_labels = np.array([
+        datetime.fromtimestamp(int(seconds), tz=dt_timezone.utc).strftime(label_format)
+        for seconds in unique_seconds
+    ])
+    return unique_labels[inverse].tolist()
+
+
+def round_prices(prices, decimals=2):
+    return np.round(prices, decimals).tolist()
+
+
+def resample_ohlc(timestamps_ms, prices, bucket_seconds):
+    """
+    Agrupa a série (ordenada por tempo) em baldes de bucket_seconds e retorna
+    (timestamp_ms do último ponto, open, high, low, close) de cada balde
+    """
+    if not len(timestamps_ms):
+        empty = np.empty(0)
+        return timestamps_ms, empty, empty, empty, empty
+
+    order = np.argsort(timestamps_ms, kind='stable')
+    timestamps_ms = timestamps_ms[order]
+    prices = prices[order]
+
+    bucket_ms = bucket_seconds * 1000
+    buckets = timestamps_ms - timestamps_ms % bucket_ms
+
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:] - 1, len(prices) - 1]
+
+    return (
+        timestamps_ms[ends],
+        prices[starts],
+        np.maximum.reduceat(prices, starts),
+        np.minimum.reduceat(prices, starts),
+        prices[ends],
+    )
@@ -0,0 +1,211 @@
+import time
+import logging
+import threading
+from datetime import datetime, timezone as dt_timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from ..models import BitcoinPriceCache
+from . import http_client
+
+logger = logging.getLogger(__name__)
+
+# Um único endpoint traz preço, variação, mínima e máxima em 24h para todas as moedas
+COINGECKO_COIN_URL = "https://api.coingecko.com/api/v3/coins/bitcoin"
+
+PRICE_CACHE_KEY = 'btc_price:quotes'
+PRICE_LOCK_KEY = 'btc_price:refresh'
+
+# Cópia em memória do processo ({"fetched_at": ..., "quotes": {moeda: cotação}})
+# e controle do refresh em andamento
+_local_quotes = None
+_local_lock = threading.Lock()
+_refreshing = False
+
+
+class PriceService:
+    """
+    Cotações do BTC em várias moedas (BTC_PRICE_CURRENCIES) com cache em dois
+    níveis (memória do processo + cache do Django, compartilhado entre workers
+    quando configurado) e o BitcoinPriceCache como último recurso persistente.
+
+    - Todas as moedas vêm de uma única chamada à CoinGecko por atualização.
+    - Até BTC_PRICE_SOFT_TTL segundos as cotações são servidas direto.
+    - Depois disso continuam sendo servidas (stale-while-revalidate) enquanto
+      uma única atualização roda em segundo plano: um lock no processo e um
+      cache.add() entre processos garantem uma chamada à CoinGecko por vez.
+    - BTC_PRICE_HARD_TTL é o tempo de vida da entrada no cache do Django.
+
+    Leitores nunca esperam pela rede.
+    """
+
+    def __init__(self):
+        self.soft_ttl = getattr(settings, 'BTC_PRICE_SOFT_TTL', 3600)
+        self.hard_ttl = getattr(settings, 'BTC_PRICE_HARD_TTL', 6 * 3600)
+        self.currencies = [currency.lower() for currency in getattr(settings, 'BTC_PRICE_CURRENCIES', ['brl'])]
+        self.default_currency = getattr(settings, 'BTC_PRICE_DEFAULT_CURRENCY', 'brl')
+
+    def normalize_currency(self, currency=None):
+        """Valida a moeda pedida (padrão BTC_PRICE_DEFAULT_CURRENCY)"""
+        currency = (currency or self.default_currency).lower()
+        if currency not in self.currencies:
+            raise ValueError(f"Moeda não suportada: {currency}. Use: {', '.join(self.currencies)}")
+        return currency
+
+    def get_quote(self, currency=None):
+        """
+        Retorna {"price", "change24h", "low24h", "high24h", "fetched_at"} na
+        moeda pedida. price == 0 indica que ainda não há cotação.
+        """
+        global _local_quotes
+
+        currency = self.normalize_currency(currency)
+
+        snapshot = _local_quotes
+        if snapshot is None or self._age(snapshot) > self.soft_ttl:
+            # Outro worker pode já ter atualizado o cache compartilhado
+            shared = cache.get(PRICE_CACHE_KEY)
+            if shared is not None and (snapshot is None or shared['fetched_at'] > snapshot['fetched_at']):
+                snapshot = shared
+            if snapshot is None:
+                snapshot = self._load_from_db()
+            _local_quotes = snapshot
+
+        quote = snapshot['quotes'].get(currency)
+        if quote is None or quote['price'] == 0 or self._age(snapshot) > self.soft_ttl:
+            self.refresh_in_background()
+
+        if quote is None:
+            quote = {"price": 0, "change24h": 0, "low24h": 0, "high24h": 0}
+        return dict(quote, fetched_at=snapshot['fetched_at'])
+
+    async def aget_quote(self, currency=None):
+        """
+        Versão async do get_quote: com a cópia em memória ainda fresca responde
+        sem sair do event loop; senão lê cache/banco numa thread
+        """
+        snapshot = _local_quotes
+        currency = self.normalize_currency(currency)
+        if snapshot is not None and self._age(snapshot) <= self.soft_ttl:
+            quote = snapshot['quotes'].get(currency)
+            if quote is not None and quote['price'] != 0:
+                return dict(quote, fetched_at=snapshot['fetched_at'])
+        return await sync_to_async(self.get_quote)(currency)
+
+    def get_price(self, currency=None):
+        return self.get_quote(currency)['price']
+
+    def _age(self, snapshot):
+        return time.time() - snapshot['fetched_at']
+
+    def _load_from_db(self):
+        quotes = {}
+        fetched_at = []
+        for row in BitcoinPriceCache.objects.filter(currency__in=self.currencies, price__gt=0):
+            quotes[row.currency] = {
+                "price": row.price,
+                "change24h": row.change24h,
+                "low24h": row.low24h,
+                "high24h": row.high24h,
+            }
+            fetched_at.append(row.last_updated.timestamp())
+
+        # Moeda sem linha conta como expirada
+        complete = fetched_at and len(quotes) == len(self.currencies)
+        return {"fetched_at": min(fetched_at) if complete else 0, "quotes": quotes}
+
+    def refresh_in_background(self):
+        """Dispara a atualização numa thread, se nenhuma estiver em andamento"""
+        global _refreshing
+
+        with _local_lock:
+            if _refreshing:
+                return False
+            _refreshing = True
+
+        thread = threading.Thread(target=self._refresh_worker, name='btc-price-refresh', daemon=True)
+        thread.start()
+        return True
+
+    def _refresh_worker(self):
+        global _refreshing
+
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Erro ao atualizar preço do BTC: {str(e)}")
+        finally:
+            with _local_lock:
+                _refreshing = False
+            connection.close()
+
+    def refresh(self):
+        """
+        Busca as cotações de todas as moedas numa única chamada à CoinGecko e
+        grava nos três níveis. Retorna as novas cotações, ou None se outro
+        processo já estiver atualizando ou a API não retornar preços válidos.
+        """
+        global _local_quotes
+
+        # Single-flight entre processos: só quem cria a chave chama a API
+        if not cache.add(PRICE_LOCK_KEY, True, timeout=60):
+            logger.debug("Atualização do preço do BTC já em andamento em outro processo")
+            return None
+
+        try:
+            logger.info("Chamando API da CoinGecko para atualizar o preço do BTC")
+            result = http_client.get(
+                COINGECKO_COIN_URL,
+                params={
+                    "localization": "false",
+                    "tickers": "false",
+                    "community_data": "false",
+                    "developer_data": "false",
+                    "sparkline": "false",
+                },
+            )
+            result.raise_for_status()
+
+            market_data = result.json().get("market_data") or {}
+            current_price = market_data.get("current_price") or {}
+            change24h = market_data.get("price_change_percentage_24h_in_currency") or {}
+            low24h = market_data.get("low_24h") or {}
+            high24h = market_data.get("high_24h") or {}
+
+            quotes = {}
+            for currency in self.currencies:
+                # Só atualiza se o novo preço for válido e diferente de zero
+                if current_price.get(currency):
+                    quotes[currency] = {
+                        "price": current_price[currency],
+                        "change24h": change24h.get(currency) or 0.0,
+                        "low24h": low24h.get(currency) or 0.0,
+                        "high24h": high24h.get(currency) or 0.0,
+                    }
+                else:
+                    logger.warning(f"API não retornou preço válido em {currency}, mantendo o cache atual")
+
+            if not quotes:
+                logger.warning("A resposta da API não contém dados válidos para o Bitcoin.")
+                return None
+
+            # Mantém a última cotação conhecida das moedas que faltaram na resposta
+            previous = _local_quotes['quotes'] if _local_quotes else {}
+            snapshot = {"fetched_at": time.time(), "quotes": {**previous, **quotes}}
+
+            cache.set(PRICE_CACHE_KEY, snapshot, timeout=self.hard_ttl)
+            _local_quotes = snapshot
+            self._save_to_db(quotes, snapshot['fetched_at'])
+
+            logger.info(f"Preço do BTC atualizado com sucesso em {len(quotes)} moedas")
+            return snapshot
+        finally:
+            cache.delete(PRICE_LOCK_KEY)
+
+    def _save_to_db(self, quotes, fetched_at):
+        last_updated = datetime.fromtimestamp(fetched_at, tz=dt_timezone.utc)
+        for currency, quote in quotes.items():
+            # UPDATE direto: só quem tem o lock escreve, sem corrida nas linhas
+            if not BitcoinPriceCache.objects.filter(currency=currency).update(last_updated=last_updated, **quote):
+                BitcoinPriceCache.objects.create(currency=currency, **quote)
@@ -0,0 +1,246 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Saúde dos provedores compartilhada pelo processo ({nome: ProviderHealth})
+_health = {}
+_health_lock = threading.Lock()
+
+# Threads que executam as consultas (compartilhadas por todos os roteadores)
+_executor = None
+_executor_lock = threading.Lock()
+
+# Segundos somados ao score por taxa de erro 1.0
+ERROR_PENALTY = 1.0
+
+
+class ProviderUnavailable(Exception):
+    """Nenhum provedor respondeu à consulta"""
+
+
+class ProviderHealth:
+    """
+    Latência e taxa de erro (médias móveis exponenciais) de um provedor, com
+    circuit breaker: após PROVIDER_BREAKER_THRESHOLD falhas seguidas o
+    provedor sai da rotação por PROVIDER_BREAKER_COOLDOWN segundos e depois
+    recebe uma única consulta de teste (half-open) antes de voltar.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.alpha = getattr(settings, 'PROVIDER_EWMA_ALPHA', 0.3)
+        self.threshold = getattr(settings, 'PROVIDER_BREAKER_THRESHOLD', 5)
+        self.cooldown = getattr(settings, 'PROVIDER_BREAKER_COOLDOWN', 30)
+
+        self.latency = None  # Segundos; None até a primeira resposta
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0
+
+    def score(self):
+        # Menor é melhor; sem amostras o provedor é testado primeiro. Erros pesam
+        # como respostas lentas, senão um provedor que falha rápido passaria na frente
+        if self.latency is None:
+            return 0.0
+        return self.latency + self.error_rate * ERROR_PENALTY
+
+    def is_open(self, now):
+        return now < self.open_until
+
+    def acquire(self, now):
+        """True se o provedor pode receber uma consulta agora"""
+        if self.is_open(now):
+            return False
+        if self.open_until and self.consecutive_failures >= self.threshold:
+            # Half-open: só uma consulta de teste por vez
+            if self.probing:
+                return False
+            self.probing = True
+        return True
+
+    def record(self, elapsed, ok):
+        self.requests += 1
+        self.probing = False
+        self.latency = elapsed if self.latency is None else self.alpha * elapsed + (1 - self.alpha) * self.latency
+        self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+
+        if ok:
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            return
+
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.threshold:
+            self.open_until = time.monotonic() + self.cooldown
+            logger.warning(f"Provedor {self.name} fora da rotação por {self.cooldown}s "
+                           f"após {self.consecutive_failures} falhas seguidas")
+
+    def stats(self):
+        return {
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "circuit": "open" if self.is_open(time.monotonic()) else "closed",
+        }
+
+
+def get_health(name):
+    health = _health.get(name)
+    if health is None:
+        with _health_lock:
+            health = _health.setdefault(name, ProviderHealth(name))
+    return health
+
+
+def health_stats():
+    with _health_lock:
+        return {name: health.stats() for name, health in _health.items()}
+
+
+def reset_health():
+    """Esquece métricas e circuitos (testes e benchmark)"""
+    with _health_lock:
+        _health.clear()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PROVIDER_ROUTER_WORKERS', 16),
+                thread_name_prefix='provider-router'
+            )
+        return _executor
+
+
+class ProviderRouter:
+    """
+    Provedor de blockchain que distribui as consultas de leitura entre vários
+    backends, com a mesma interface usada pelo projeto (blockcount,
+    gettransactions, getrawtransaction).
+
+    Cada consulta vai para o provedor mais saudável (menor latência média
+    ajustada pela taxa de erro). Se ele não responder em PROVIDER_HEDGE_DELAY
+    segundos, o próximo da lista entra na corrida e vale a primeira resposta
+    válida; uma falha passa a consulta adiante na hora. Provedores com
+    circuito aberto ficam de fora enquanto houver outro disponível.
+
+    `backends` é uma lista de (nome, fábrica); a fábrica é chamada uma vez por
+    thread de execução e provedor, já que o Service da bitcoinlib não é
+    thread-safe e consulta o provedor no construtor. Os clientes criados ficam
+    no próprio roteador: dois roteadores com os mesmos nomes (ex: modos
+    'fake' e 'bitcoinlib') nunca usam os clientes um do outro.
+    """
+
+    def __init__(self, backends, hedge_delay=None):
+        if not backends:
+            raise ValueError("O roteador precisa de pelo menos um provedor")
+        self.backends = dict(backends)
+        self.hedge_delay = hedge_delay if hedge_delay is not None else getattr(settings, 'PROVIDER_HEDGE_DELAY', 0.75)
+        self._clients = threading.local()
+
+    ## MARK: Interface de provedor
+
+    def blockcount(self):
+        return self.call('blockcount')
+
+    def gettransactions(self, address, after_txid='', limit=None):
+        if limit is None:
+            return self.call('gettransactions', address, after_txid=after_txid)
+        return self.call('gettransactions', address, after_txid=after_txid, limit=limit)
+
+    def getrawtransaction(self, txid):
+        return self.call('getrawtransaction', txid)
+
+    ## MARK: Roteamento
+
+    def ranked(self):
+        """Nomes dos provedores do mais para o menos saudável, com circuitos abertos no fim"""
+        now = time.monotonic()
+        with _health_lock:
+            health = {name: _health.get(name) or ProviderHealth(name) for name in self.backends}
+            return sorted(self.backends, key=lambda name: (health[name].is_open(now), health[name].score()))
+
+    def call(self, method, *args, **kwargs):
+        """Executa a consulta com failover e hedging. Levanta ProviderUnavailable se todos falharem."""
+        candidates = self.ranked()
+        executor = _get_executor()
+        pending = {}
+        errors = {}
+
+        def launch(hedge=False):
+            now = time.monotonic()
+            while candidates:
+                name = candidates.pop(0)
+                health = get_health(name)
+                with _health_lock:
+                    allowed = health.acquire(now)
+                    if allowed and hedge:
+                        health.hedges += 1
+                # Circuito aberto só é usado quando não sobra mais ninguém
+                if allowed or (not candidates and not pending):
+                    pending[executor.submit(self._execute, name, method, args, kwargs)] = name
+                    return True
+                errors[name] = "circuito aberto"
+            return False
+
+        launch()
+        while pending:
+            timeout = self.hedge_delay if candidates else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Primeiro provedor lento: outro entra na corrida
+                launch(hedge=True)
+                continue
+
+            for future in done:
+                name = pending.pop(future)
+                ok, result = future.result()
+                if ok:
+                    # As consultas perdedoras terminam sozinhas e só alimentam as métricas
+                    return result
+                errors[name] = result
+                # Falha tira o provedor da corrida: o próximo entra na hora
+                launch()
+
+        raise ProviderUnavailable(
+            f"Nenhum provedor respondeu a {method}: " +
+            "; ".join(f"{name}: {error}" for name, error in errors.items())
+        )
+
+    def _execute(self, name, method, args, kwargs):
+        """Roda a consulta num provedor e registra latência e resultado. Retorna (ok, resultado ou erro)."""
+        start = time.perf_counter()
+        try:
+            result = getattr(self._client(name), method)(*args, **kwargs)
+            # O Service da bitcoinlib sinaliza falha com False em alguns métodos
+            ok = result is not False and result is not None
+            outcome = (True, result) if ok else (False, "sem resposta")
+        except Exception as e:
+            ok = False
+            outcome = (False, str(e) or type(e).__name__)
+
+        health = get_health(name)
+        with _health_lock:
+            health.record(time.perf_counter() - start, ok)
+        return outcome
+
+    def _client(self, name):
+        clients = getattr(self._clients, 'by_name', None)
+        if clients is None:
+            clients = self._clients.by_name = {}
+        if name not in clients:
+            clients[name] = self.backends[name]()
+        return clients[name]
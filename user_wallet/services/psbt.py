@@ -0,0 +1,93 @@
+# Serialização de transações não assinadas e PSBTs (BIP174) para as carteiras
+# watch-only: o app monta a transação e quem tem as chaves assina
+import base64
+import struct
+from collections import namedtuple
+
+PSBT_MAGIC = b'psbt\xff'
+
+PSBT_GLOBAL_UNSIGNED_TX = 0x00
+PSBT_IN_NON_WITNESS_UTXO = 0x00
+PSBT_IN_WITNESS_UTXO = 0x01
+PSBT_IN_REDEEM_SCRIPT = 0x04
+PSBT_IN_BIP32_DERIVATION = 0x06
+PSBT_OUT_BIP32_DERIVATION = 0x02
+
+# Sinaliza RBF (BIP125), permitindo aumentar a taxa depois
+RBF_SEQUENCE = 0xfffffffd
+
+# txid em hex; script_pubkey/redeem_script/non_witness_utxo em bytes.
+# Entradas segwit levam witness_utxo (valor + script); legacy precisam da
+# transação anterior inteira em non_witness_utxo. bip32_derivation é
+# (chave pública, fingerprint, caminho) e diz ao signatário externo qual chave
+# assina a entrada ou, numa saída, que o troco volta para a carteira
+PsbtInput = namedtuple(
+    'PsbtInput',
+    ['txid', 'output_n', 'value', 'script_pubkey', 'redeem_script', 'non_witness_utxo', 'segwit', 'bip32_derivation'],
+    defaults=[None]
+)
+PsbtOutput = namedtuple('PsbtOutput', ['value', 'script_pubkey', 'bip32_derivation'], defaults=[None])
+
+
+def varint(number):
+    if number < 0xfd:
+        return bytes([number])
+    if number <= 0xffff:
+        return b'\xfd' + struct.pack('<H', number)
+    if number <= 0xffffffff:
+        return b'\xfe' + struct.pack('<I', number)
+    return b'\xff' + struct.pack('<Q', number)
+
+
+def _serialize_output(value, script_pubkey):
+    return struct.pack('<q', value) + varint(len(script_pubkey)) + script_pubkey
+
+
+def serialize_unsigned_tx(inputs, outputs, version=2, locktime=0):
+    """Transação sem scriptSig nem witness, no formato exigido pela PSBT"""
+    data = struct.pack('<i', version) + varint(len(inputs))
+    for tx_input in inputs:
+        data += bytes.fromhex(tx_input.txid)[::-1] + struct.pack('<I', tx_input.output_n)
+        data += b'\x00' + struct.pack('<I', RBF_SEQUENCE)
+
+    data += varint(len(outputs))
+    for output in outputs:
+        data += _serialize_output(output.value, output.script_pubkey)
+
+    return data + struct.pack('<I', locktime)
+
+
+def _entry(key_type, value, key_data=b''):
+    key = bytes([key_type]) + key_data
+    return varint(len(key)) + key + varint(len(value)) + value
+
+
+def _bip32_derivation(key_type, derivation):
+    # Chave: tipo + chave pública; valor: fingerprint + índices do caminho (uint32 LE)
+    public_key, fingerprint, path = derivation
+    return _entry(key_type, fingerprint + b''.join(struct.pack('<I', step) for step in path), public_key)
+
+
+def build_psbt(inputs, outputs):
+    """Retorna (PSBT em base64, transação não assinada em hex)"""
+    unsigned_tx = serialize_unsigned_tx(inputs, outputs)
+
+    data = PSBT_MAGIC + _entry(PSBT_GLOBAL_UNSIGNED_TX, unsigned_tx) + b'\x00'
+
+    for tx_input in inputs:
+        if tx_input.non_witness_utxo:
+            data += _entry(PSBT_IN_NON_WITNESS_UTXO, tx_input.non_witness_utxo)
+        if tx_input.segwit:
+            data += _entry(PSBT_IN_WITNESS_UTXO, _serialize_output(tx_input.value, tx_input.script_pubkey))
+        if tx_input.redeem_script:
+            data += _entry(PSBT_IN_REDEEM_SCRIPT, tx_input.redeem_script)
+        if tx_input.bip32_derivation:
+            data += _bip32_derivation(PSBT_IN_BIP32_DERIVATION, tx_input.bip32_derivation)
+        data += b'\x00'
+
+    for output in outputs:
+        if output.bip32_derivation:
+            data += _bip32_derivation(PSBT_OUT_BIP32_DERIVATION, output.bip32_derivation)
+        data += b'\x00'
+
+    return base64.b64encode(data).decode(), unsigned_tx.hex()
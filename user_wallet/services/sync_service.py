@@ -0,0 +1,367 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction as db_transaction, IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+from ..models import Wallet, Address, Transaction, WalletSnapshot, Utxo
+from .blockchain_providers import get_blockchain_service
+from .address_index import AddressIndex
+
+logger = logging.getLogger(__name__)
+
+
+class WalletSyncService:
+    """
+    Sincroniza uma carteira com os provedores da blockchain, gravando as
+    transações em Transaction e o resumo no WalletSnapshot, que é o que as
+    views leem
+    """
+
+    def __init__(self, provider=None):
+        self.provider = provider if provider is not None else get_blockchain_service()
+
+    def get_tip_height(self):
+        try:
+            return self.provider.blockcount()
+        except Exception as e:
+            logger.warning(f"Não foi possível obter a altura do bloco: {str(e)}")
+            return None
+
+    def sync_wallet(self, wallet_id, tip_height=None):
+        """
+        Sincronização incremental: para cada endereço busca só as transações
+        posteriores à sua marca d'água (last_txid) e grava as novas ou alteradas
+        em Transaction. Transações sem bloco ficam fora da marca d'água e por
+        isso voltam em toda rodada até confirmarem. O saldo do snapshot sai do
+        conjunto de UTXOs (Utxo.balances) e o nº de transações de Transaction.
+
+        Retorna True se alguma transação foi criada ou alterada.
+        """
+        if tip_height is None:
+            tip_height = self.get_tip_height()
+
+        addresses = list(Address.objects.filter(wallet_id=wallet_id).order_by('is_change', 'index'))
+        owners = AddressIndex.for_addresses((address.address for address in addresses), wallet_id)
+
+        fetched = {}
+        used_addresses = set()
+        watermarks = []
+        for address in addresses:
+            transactions = self._fetch_address_transactions(address)
+            if transactions or address.last_txid:
+                used_addresses.add(address.address)
+
+            for tx in transactions:
+                fetched[tx.txid] = tx
+
+            # Avança a marca d'água até a última transação confirmada
+            confirmed = [tx for tx in transactions if tx.block_height]
+            if confirmed:
+                address.last_txid = confirmed[-1].txid
+                address.synced_height = confirmed[-1].block_height
+                watermarks.append(address)
+
+        # Endereços de recebimento usados fora do generate_receive_address (ex: xpub reaproveitado)
+        # empurram o ponteiro para depois deles
+        used_receive = [
+            address.index for address in addresses if not address.is_change and address.address in used_addresses
+        ]
+        if used_receive:
+            Wallet.objects.filter(id=wallet_id, next_receive_index__lte=max(used_receive)).update(
+                next_receive_index=max(used_receive) + 1
+            )
+
+        user_id = Wallet.objects.values_list('user_id', flat=True).get(id=wallet_id)
+        changed = self._store_transactions(wallet_id, user_id, fetched.values(), owners)
+        self._store_utxos(wallet_id, fetched.values(), {address.address: address for address in addresses})
+        # Marcas d'água só depois de gravar o histórico completo: um erro no
+        # meio do sync faz a próxima rodada buscar tudo de novo
+        if watermarks:
+            Address.objects.bulk_update(watermarks, ['last_txid', 'synced_height'])
+
+        tx_count = Transaction.objects.filter(wallet_id=wallet_id).exclude(status='failed').count()
+        balances = Utxo.balances(wallet_id, tip_height)
+
+        # Endereço principal: primeiro endereço de recebimento ainda não usado
+        receive_addresses = [address.address for address in addresses if not address.is_change]
+        primary_address = next(
+            (address for address in receive_addresses if address not in used_addresses),
+            receive_addresses[0] if receive_addresses else ''
+        )
+
+        values = {
+            "balance": balances['total'],
+            "confirmed_balance": balances['confirmed'],
+            "unconfirmed_balance": balances['unconfirmed'],
+            "immature_balance": balances['immature'],
+            "tx_count": tx_count,
+            "address": primary_address,
+            "tip_height": tip_height,
+            "refreshed_at": timezone.now(),
+        }
+        # UPDATE direto (sem SELECT ... FOR UPDATE) para não travar o SQLite com escritas concorrentes
+        if not WalletSnapshot.objects.filter(wallet_id=wallet_id).update(**values):
+            try:
+                WalletSnapshot.objects.create(wallet_id=wallet_id, **values)
+            except IntegrityError:
+                # Outra sincronização da mesma carteira criou o snapshot primeiro
+                WalletSnapshot.objects.filter(wallet_id=wallet_id).update(**values)
+            changed = True
+
+        return changed
+
+    def _fetch_address_transactions(self, address):
+        """
+        Todas as transações do endereço posteriores à marca d'água. Os
+        provedores devolvem no máximo WALLET_SYNC_PAGE_SIZE por chamada, então
+        as páginas seguem a partir do último txid recebido até vir uma
+        incompleta.
+        """
+        page_size = getattr(settings, 'WALLET_SYNC_PAGE_SIZE', 20)
+        transactions = []
+        after_txid = address.last_txid
+        while True:
+            page = self.provider.gettransactions(address.address, after_txid=after_txid, limit=page_size)
+            transactions.extend(page)
+            if len(page) < page_size:
+                return transactions
+            if page[-1].txid == after_txid:
+                # Provedor ignorou o after_txid: pedir de novo repetiria a mesma página
+                raise RuntimeError(f"Paginação sem avanço nas transações do endereço {address.address}")
+            after_txid = page[-1].txid
+
+    def _store_transactions(self, wallet_id, user_id, transactions, owners):
+        """
+        Cria as transações novas (bulk_create) e atualiza só as que mudaram
+        (ex: pendente que confirmou). Retorna True se algo foi gravado.
+        """
+        rows = {}
+        for tx in transactions:
+            tx_date = getattr(tx, 'date', None)
+            if tx_date and timezone.is_naive(tx_date):
+                tx_date = timezone.make_aware(tx_date, dt_timezone.utc)
+
+            rows[tx.txid] = {
+                "amount": owners.net_amount(tx, wallet_id),
+                "fee": tx.fee or 0,
+                "status": 'confirmed' if tx.block_height else 'pending',
+                "block_height": tx.block_height or None,
+            }
+            # Transações na mempool vêm sem data: fica a de quando foram vistas pela primeira vez
+            if tx_date:
+                rows[tx.txid]["date"] = tx_date
+
+        if not rows:
+            return False
+
+        existing = {
+            tx.txid: tx for tx in Transaction.objects.filter(wallet_id=wallet_id, txid__in=list(rows))
+        }
+
+        new_transactions = []
+        updated_transactions = []
+        for txid, values in rows.items():
+            current = existing.get(txid)
+            if current is None:
+                new_transactions.append(Transaction(wallet_id=wallet_id, user_id=user_id, txid=txid, **values))
+                continue
+
+            if any(getattr(current, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(current, field, value)
+                current.updated_at = timezone.now()
+                updated_transactions.append(current)
+
+        with db_transaction.atomic():
+            Transaction.objects.bulk_create(new_transactions, ignore_conflicts=True)
+            if updated_transactions:
+                Transaction.objects.bulk_update(
+                    updated_transactions, ['amount', 'fee', 'status', 'block_height', 'date', 'updated_at']
+                )
+
+        return bool(new_transactions or updated_transactions)
+
+    def _store_utxos(self, wallet_id, transactions, addresses):
+        """
+        Atualiza o conjunto de UTXOs: saídas para endereços da carteira entram
+        (ou têm a altura do bloco atualizada), saídas gastas por transações
+        confirmadas saem e as gastas por transações na mempool ficam marcadas
+        em spent_txid
+        """
+        outputs = []
+        spends = []
+        for tx in transactions:
+            for position, output in enumerate(tx.outputs):
+                address = addresses.get(output.address)
+                if address is None:
+                    continue
+                output_n = getattr(output, 'output_n', None)
+                outputs.append(Utxo(
+                    wallet_id=wallet_id,
+                    address=address,
+                    txid=tx.txid,
+                    output_n=position if output_n is None else output_n,
+                    value=output.value,
+                    block_height=tx.block_height or None,
+                    is_coinbase=bool(getattr(tx, 'coinbase', False)),
+                ))
+
+            for input_tx in tx.inputs:
+                if input_tx.address in addresses:
+                    spends.append((_outpoint(input_tx), tx.txid, bool(tx.block_height)))
+
+        if not outputs and not spends:
+            return
+
+        with db_transaction.atomic():
+            # Primeiro as saídas, para que gastos no mesmo lote as encontrem
+            Utxo.objects.bulk_create(
+                outputs, batch_size=500, update_conflicts=True,
+                unique_fields=['wallet', 'txid', 'output_n'], update_fields=['block_height', 'is_coinbase']
+            )
+
+            confirmed = Q()
+            for (prev_txid, output_n), spent_txid, is_confirmed in spends:
+                outpoint = Q(txid=prev_txid, output_n=output_n)
+                if is_confirmed:
+                    confirmed |= outpoint
+                else:
+                    Utxo.objects.filter(outpoint, wallet_id=wallet_id).update(spent_txid=spent_txid)
+            if confirmed:
+                Utxo.objects.filter(confirmed, wallet_id=wallet_id).delete()
+
+
+def _outpoint(input_tx):
+    """(txid, índice) da saída gasta por uma entrada (bitcoinlib guarda o txid em bytes)"""
+    prev_txid = input_tx.prev_txid
+    if isinstance(prev_txid, bytes):
+        prev_txid = prev_txid.hex()
+    return prev_txid, getattr(input_tx, 'output_n_int', input_tx.output_n)
+
+
+class WalletSyncScheduler:
+    """
+    Agenda a sincronização periódica de todas as carteiras.
+
+    - Carteiras ainda não sincronizadas pelo processo ou com snapshot
+      invalidado vêm primeiro, depois as de usuários ativos (login nos últimos
+      WALLET_SYNC_ACTIVE_WINDOW segundos), depois as mais atrasadas.
+    - Usuários inativos têm o intervalo base multiplicado por 4.
+    - Cada sincronização sem mudança (ou com erro) dobra o intervalo da
+      carteira até WALLET_SYNC_MAX_INTERVAL; qualquer mudança volta ao intervalo base.
+    """
+
+    IDLE_USER_FACTOR = 4
+
+    def __init__(self, sync_service=None, concurrency=None, interval=None, max_interval=None, active_window=None):
+        self.sync_service = sync_service or WalletSyncService()
+        self.concurrency = concurrency or getattr(settings, 'WALLET_SYNC_CONCURRENCY', 4)
+        self.interval = interval or getattr(settings, 'WALLET_SYNC_INTERVAL', 60)
+        self.max_interval = max_interval or getattr(settings, 'WALLET_SYNC_MAX_INTERVAL', 3600)
+        self.active_window = active_window or getattr(settings, 'WALLET_SYNC_ACTIVE_WINDOW', 86400)
+
+        # Estado em memória por carteira: próxima execução e sequência de syncs sem mudança
+        self._next_due = {}
+        self._idle_streak = {}
+        self._failed = set()
+
+    def _next_interval(self, wallet_id, is_active):
+        interval = self.interval * (1 if is_active else self.IDLE_USER_FACTOR)
+        interval *= 2 ** self._idle_streak.get(wallet_id, 0)
+        return min(interval, self.max_interval)
+
+    def due_wallets(self, now=None):
+        """
+        Carteiras que precisam sincronizar agora, em ordem de prioridade.
+        Retorna uma lista de (wallet_id, is_active).
+        """
+        now = now if now is not None else time.monotonic()
+        active_since = timezone.now() - timedelta(seconds=self.active_window)
+
+        wallets = Wallet.objects.values_list(
+            'id', 'user__last_login', 'snapshot__id', 'snapshot__refreshed_at', named=True
+        )
+        known_ids = set()
+        due = []
+        for wallet in wallets:
+            known_ids.add(wallet.id)
+            next_due = self._next_due.get(wallet.id)
+            # Snapshot invalidado (novo endereço, broadcast) fura a fila, a menos
+            # que o último sync desta carteira tenha falhado
+            invalidated = wallet.snapshot__id is not None and wallet.snapshot__refreshed_at is None
+            urgent = next_due is None or (invalidated and wallet.id not in self._failed)
+            if not urgent and next_due > now:
+                continue
+
+            is_active = wallet.user__last_login is not None and wallet.user__last_login >= active_since
+            # (nunca sincronizada/invalidada, usuário inativo, mais atrasada primeiro)
+            priority = (not urgent, not is_active, next_due or 0)
+            due.append((priority, wallet.id, is_active))
+
+        # Esquece carteiras removidas
+        for wallet_id in set(self._next_due) - known_ids:
+            self._next_due.pop(wallet_id, None)
+            self._idle_streak.pop(wallet_id, None)
+            self._failed.discard(wallet_id)
+
+        due.sort()
+        return [(wallet_id, is_active) for _, wallet_id, is_active in due]
+
+    def _sync(self, wallet_id, is_active, tip_height):
+        try:
+            changed = self.sync_service.sync_wallet(wallet_id, tip_height=tip_height)
+            self._failed.discard(wallet_id)
+            if changed:
+                self._idle_streak[wallet_id] = 0
+            else:
+                self._idle_streak[wallet_id] = min(self._idle_streak.get(wallet_id, 0) + 1, 16)
+            logger.debug(f"Carteira {wallet_id} sincronizada (mudou: {changed})")
+            return True
+        except Exception as e:
+            # Erros também fazem a carteira recuar, para não martelar o provedor
+            logger.error(f"Erro ao sincronizar carteira {wallet_id}: {str(e)}")
+            self._failed.add(wallet_id)
+            self._idle_streak[wallet_id] = min(self._idle_streak.get(wallet_id, 0) + 1, 16)
+            return False
+        finally:
+            self._next_due[wallet_id] = time.monotonic() + self._next_interval(wallet_id, is_active)
+            connection.close()
+
+    def run_once(self):
+        """
+        Sincroniza todas as carteiras devidas com até `concurrency` syncs em
+        paralelo. Retorna (sincronizadas, com erro).
+        """
+        due = self.due_wallets()
+        if not due:
+            return 0, 0
+
+        # A altura do bloco é consultada uma vez por rodada, não por carteira
+        tip_height = self.sync_service.get_tip_height()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='wallet-sync') as executor:
+            results = list(executor.map(lambda item: self._sync(item[0], item[1], tip_height), due))
+
+        synced = sum(1 for ok in results if ok)
+        return synced, len(results) - synced
+
+    def seconds_until_next(self, default=None):
+        if not self._next_due:
+            return default if default is not None else self.interval
+        return max(0, min(self._next_due.values()) - time.monotonic())
+
+    def run_forever(self, stop_event=None, poll_interval=5):
+        """
+        Loop principal do worker. Novas carteiras são percebidas a cada
+        poll_interval segundos no máximo.
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            synced, failed = self.run_once()
+            if synced or failed:
+                logger.info(f"Rodada de sync concluída: {synced} carteiras sincronizadas, {failed} com erro")
+            stop_event.wait(min(poll_interval, self.seconds_until_next(default=poll_interval)))
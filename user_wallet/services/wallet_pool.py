@@ -0,0 +1,222 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from bitcoinlib.wallets import Wallet as BitcoinlibWallet, WalletError
+from django.conf import settings
+from . import bitcoinlib_db
+
+logger = logging.getLogger(__name__)
+
+# Pool do processo, criado na primeira chamada
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class WalletNotFound(Exception):
+    """A carteira não existe no banco da bitcoinlib"""
+
+
+class WalletHandle:
+    """Carteira aberta da bitcoinlib; só uma thread a usa por vez (lock)"""
+
+    def __init__(self, name, wallet):
+        self.name = name
+        self.wallet = wallet
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.closed = False
+
+    def release(self):
+        """Devolve a carteira; chamado com o lock, ao fim de cada uso"""
+        if self.closed:
+            # Descartada enquanto estava em uso: fecha agora
+            self._dispose()
+            return
+        # Encerra a transação de leitura da sessão e expira os objetos carregados:
+        # o próximo uso relê do banco o que outro processo tenha gravado
+        try:
+            self.wallet.session.rollback()
+        except Exception as e:
+            logger.warning(f"Erro ao liberar a carteira {self.name}: {str(e)}")
+        self.last_used = time.monotonic()
+
+    def close(self):
+        """Fecha sessão e engine; se estiver em uso, fecha quando for devolvida"""
+        self.closed = True
+        if self.lock.acquire(blocking=False):
+            try:
+                self._dispose()
+            finally:
+                self.lock.release()
+
+    def _dispose(self):
+        if self.wallet is not None:
+            wallet, self.wallet = self.wallet, None
+            wallet.__exit__(None, None, None)
+
+
+class WalletPool:
+    """
+    Carteiras da bitcoinlib abertas e reaproveitadas entre requisições.
+
+    Abrir uma carteira (BitcoinlibWallet(nome)) cria engine e sessão
+    SQLAlchemy, confere a versão do banco e carrega a chave principal, várias
+    consultas por carteira; aqui as sessões saem do engine compartilhado de
+    bitcoinlib_db. O pool mantém até WALLET_POOL_SIZE carteiras
+    abertas, descartando a menos usada recentemente quando enche e as que
+    ficam WALLET_POOL_IDLE_TIMEOUT segundos sem uso. Cada carteira é usada por
+    uma thread de cada vez; delete_wallet a invalida.
+    """
+
+    def __init__(self, maxsize=None, idle_timeout=None):
+        self.maxsize = maxsize if maxsize is not None else getattr(settings, 'WALLET_POOL_SIZE', 64)
+        self.idle_timeout = idle_timeout if idle_timeout is not None else getattr(settings, 'WALLET_POOL_IDLE_TIMEOUT', 300)
+
+        self._handles = OrderedDict()  # {nome: WalletHandle}, da menos para a mais usada
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def checkout(self, name):
+        """
+        Empresta a carteira aberta `name` com uso exclusivo até o fim do bloco.
+        Levanta WalletNotFound se ela não existir.
+        """
+        while True:
+            handle = self._get(name)
+            handle.lock.acquire()
+            if not handle.closed:
+                break
+            # Descartada entre a busca e o lock: abre de novo
+            handle._dispose()
+            handle.lock.release()
+
+        try:
+            yield handle.wallet
+        finally:
+            handle.release()
+            handle.lock.release()
+            if handle.closed and handle.wallet is not None:
+                # Descartada depois da checagem do release
+                handle.close()
+
+    def exists(self, name):
+        """Como wallet_exists da bitcoinlib, mas a carteira encontrada já fica aberta no pool"""
+        try:
+            self._get(name)
+            return True
+        except WalletNotFound:
+            return False
+
+    def invalidate(self, name):
+        """Fecha e tira do pool a carteira (ex: ao apagar a carteira)"""
+        with self._lock:
+            handle = self._handles.pop(name, None)
+        if handle is not None:
+            handle.close()
+
+    def clear(self):
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        for handle in handles:
+            handle.close()
+
+    def _get(self, name):
+        with self._lock:
+            expired = self._expire_idle()
+            handle = self._handles.get(name)
+            if handle is not None:
+                self._handles.move_to_end(name)
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._close(expired)
+        if handle is not None:
+            return handle
+
+        # Abre fora do lock do pool: as outras carteiras seguem atendendo. A sessão
+        # vem do engine compartilhado do banco (ou shard) da carteira
+        session = bitcoinlib_db.session(name)
+        try:
+            wallet = BitcoinlibWallet(name, db_uri=bitcoinlib_db.database_uri(name), session=session)
+        except WalletError:
+            session.close()
+            raise WalletNotFound(f"Carteira {name} não encontrada")
+        opened = WalletHandle(name, wallet)
+
+        with self._lock:
+            handle = self._handles.get(name)
+            if handle is None:
+                handle = self._handles[name] = opened
+                opened = None
+            self._handles.move_to_end(name)
+            evicted = []
+            while len(self._handles) > self.maxsize:
+                evicted.append(self._handles.popitem(last=False)[1])
+            self.evictions += len(evicted)
+
+        # Outra thread abriu a mesma carteira antes: fica a dela
+        if opened is not None:
+            evicted.append(opened)
+        self._close(evicted)
+        return handle
+
+    def _expire_idle(self):
+        """Retira (sem fechar) as carteiras ociosas há mais de idle_timeout; chamado com o lock"""
+        expired = []
+        limit = time.monotonic() - self.idle_timeout
+        while self._handles:
+            handle = next(iter(self._handles.values()))
+            # A ordem é de uso: a primeira recente encerra a varredura
+            if handle.last_used >= limit or handle.lock.locked():
+                break
+            expired.append(self._handles.popitem(last=False)[1])
+        self.evictions += len(expired)
+        return expired
+
+    def _close(self, handles):
+        for handle in handles:
+            try:
+                handle.close()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar a carteira {handle.name}: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": len(self._handles),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WalletPool()
+    return _pool
+
+
+def checkout(name):
+    return get_pool().checkout(name)
+
+
+def exists(name):
+    return get_pool().exists(name)
+
+
+def invalidate(name):
+    get_pool().invalidate(name)
+
+
+def stats():
+    return get_pool().stats()
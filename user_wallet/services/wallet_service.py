@@ -1,21 +1,56 @@
 import sys
-from bitcoinlib.wallets import Wallet as BitcoinlibWallet, wallet_exists
+import json
+import time
+import asyncio
+import base64
+import random
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from bitcoinlib.wallets import Wallet as BitcoinlibWallet
 from bitcoinlib.keys import HDKey
-from bitcoinlib.services.services import Service
+from bitcoinlib.transactions import Output as BitcoinlibOutput
+from bitcoinlib.encoding import hash160
 from django.http import JsonResponse
 import pkg_resources
-from ..models import Wallet, Address, Transaction
+from ..models import Wallet, Address, Transaction, Utxo
 import logging
 from django.core.exceptions import ObjectDoesNotExist
-import requests
 from datetime import datetime
-from ..models import BitcoinPriceCache
+from ..models import WalletSnapshot
+from ..db_router import primary
+from .blockchain_providers import get_blockchain_service
+from .price_service import PriceService
+from .sync_service import WalletSyncService
+from .broadcast_service import BroadcastService
+from . import hd_derivation, address_index, coin_selection, psbt, wallet_pool, bitcoinlib_db
 from django.utils import timezone
-from django.db import transaction
+from django.db import transaction, connection, IntegrityError
+from django.db.models import F, Q, Max
+from django.conf import settings
 import bitcoinlib
+from asgiref.sync import sync_to_async
 
 logger = logging.getLogger(__name__)
 
+# Campos de Transaction usados para montar as linhas do histórico
+STORED_TRANSACTION_FIELDS = ('amount', 'status', 'block_height', 'date', 'wallet__snapshot__tip_height')
+
+# Atualizações de snapshot em segundo plano (compartilhadas pelo processo)
+_snapshot_executor = None
+_snapshot_lock = threading.Lock()
+_snapshot_refreshing = set()
+
+# Reposições do buffer de endereços em andamento (uma por carteira)
+_topup_lock = threading.Lock()
+_topping_up = set()
+
+class WalletServiceError(Exception):
+    """
+    Erro genérico do WalletService exposto às views
+    """
+    pass
+
 class WalletService:
     """
     Serviço para gerenciar carteiras Bitcoin usando bitcoinlib
@@ -53,16 +88,24 @@ class WalletService:
             }, status=500)
 
     def __init__(self):
-        self.service = Service(network='bitcoin', providers=['blockstream', 'blockcypher'])
+        self._service = None
+
+    @property
+    def service(self):
+        # Criado sob demanda: o Service da bitcoinlib consulta os provedores já no construtor
+        if self._service is None:
+            self._service = get_blockchain_service()
+        return self._service
     ## MARK: Watch only
 
-    def create_watch_only_wallet(self, name, xpub, user):
+    def create_watch_only_wallet(self, name, xpub, user, master_fingerprint=''):
         try:
             # Cria a carteira no banco de dados
             wallet = Wallet.objects.create(
                 name=name,
                 wallet_type='watch-only',
                 xpub=xpub,
+                master_fingerprint=master_fingerprint,
                 user=user
             )
             
@@ -84,6 +127,7 @@ class WalletService:
             # Cria a carteira na bitcoinlib
             bitcoinlib_wallet = BitcoinlibWallet.create(
                 name=f"watch_only_{wallet.id}",
+                db_uri=bitcoinlib_db.database_uri(f"watch_only_{wallet.id}"),
                 keys=xpub,
                 network='bitcoin',
                 purpose=purpose,
@@ -93,8 +137,10 @@ class WalletService:
             
             logger.info(f"Carteira bitcoinlib criada com sucesso: {bitcoinlib_wallet.name}")
 
-            # Gera alguns endereços iniciais
-            self._generate_addresses(wallet, bitcoinlib_wallet, 5)
+            # Pré-deriva o gap limit nas cadeias de recebimento e de troco
+            gap_limit = getattr(settings, 'WALLET_ADDRESS_GAP_LIMIT', 20)
+            self._generate_addresses(wallet, gap_limit)
+            self._generate_addresses(wallet, gap_limit, is_change=True)
             
             return wallet
         except Exception as e:
@@ -103,48 +149,255 @@ class WalletService:
 
     ## MARK: Address
 
-    def _generate_addresses(self, wallet, bitcoinlib_wallet, count=1, is_change=False):
-        addresses = []
-        
+    def _generate_addresses(self, wallet, count=1, is_change=False):
+        """
+        Deriva `count` endereços a partir do próximo índice livre da cadeia
+        (recebimento ou troco) e grava todos com um único bulk_create
+        """
+        if count < 1:
+            raise ValueError("A quantidade de endereços deve ser maior que zero")
+
+        change = int(is_change)
+
         try:
-            # Gera os endereços
-            keys = bitcoinlib_wallet.get_key(
-                account_id=0,  # Usamos a conta 0 por padrão
-                change=int(is_change),
-                number_of_keys=count
+            last_index = (
+                Address.objects.filter(wallet=wallet, is_change=is_change)
+                .aggregate(last_index=Max('index'))['last_index']
             )
-            
-            # Se apenas uma chave for retornada, coloque-a em uma lista
-            if not isinstance(keys, list):
-                keys = [keys]
-            
-            for i, key in enumerate(keys):
-                address_str = key.address
-                path = key.path
-                
-                # Salva o endereço no banco de dados
-                address = Address.objects.create(
+            start = 0 if last_index is None else last_index + 1
+
+            # Deriva fora de transação para não segurar o lock de escrita do SQLite;
+            # o unique (wallet, path) barra duas gerações concorrentes do mesmo índice
+            addresses = [
+                Address(
                     wallet=wallet,
                     address=address_str,
-                    path=path,
+                    path=f"M/{change}/{index}",  # Mesmo formato de caminho da bitcoinlib (M/<cadeia>/<índice>)
                     is_change=is_change,
-                    index=i
+                    index=index
                 )
-                
-                addresses.append(address)
-                logger.info(f"Gerado endereço: {address_str} com caminho: {path}")
+                for index, address_str in hd_derivation.derive_addresses(wallet.xpub, change, start, count)
+            ]
+            with transaction.atomic():
+                Address.objects.bulk_create(addresses, batch_size=500)
         except Exception as e:
             logger.error(f"Erro ao gerar endereços: {str(e)}")
             raise
-        
+
+        logger.info(f"Gerados {len(addresses)} endereços (cadeia {change}, índices {start}-{start + count - 1}) "
+                    f"para a carteira {wallet.id}")
         return addresses
 
+    def generate_receive_address(self, wallet_id):
+        """
+        Entrega o próximo endereço de recebimento não usado. O ponteiro
+        Wallet.next_receive_index avança com um UPDATE atômico e o endereço
+        já está derivado no buffer, então a requisição só faz consultas
+        indexadas, sem derivar nem chamar provedores. Quando sobra menos da
+        metade de WALLET_ADDRESS_GAP_LIMIT endereços à frente do ponteiro, o
+        buffer é reposto em segundo plano.
+        """
+        gap_limit = getattr(settings, 'WALLET_ADDRESS_GAP_LIMIT', 20)
+
+        with transaction.atomic():
+            if not Wallet.objects.filter(id=wallet_id).update(next_receive_index=F('next_receive_index') + 1):
+                raise Wallet.DoesNotExist(f"Carteira {wallet_id} não encontrada")
+            index = Wallet.objects.values_list('next_receive_index', flat=True).get(id=wallet_id) - 1
+
+        address = (
+            Address.objects.filter(wallet_id=wallet_id, path=f"M/0/{index}")
+            .values_list('address', flat=True).first()
+        )
+        if address is None:
+            # Buffer esgotado (ex: carteiras anteriores ao ponteiro): deriva agora
+            try:
+                self._top_up_receive_addresses(wallet_id, index + gap_limit)
+            except IntegrityError:
+                # Uma reposição em segundo plano gravou os mesmos índices primeiro
+                pass
+            address = Address.objects.values_list('address', flat=True).get(wallet_id=wallet_id, path=f"M/0/{index}")
+
+        last_index = (
+            Address.objects.filter(wallet_id=wallet_id, is_change=False)
+            .aggregate(last_index=Max('index'))['last_index']
+        )
+        # Só com o buffer pela metade: o buffer inicial (gap limit) é consumido antes da primeira reposição
+        if last_index - index < max(gap_limit // 2, 1):
+            self._schedule_receive_top_up(wallet_id, index + 2 * gap_limit)
+
+        return address
+
+    def _top_up_receive_addresses(self, wallet_id, last_index):
+        """Deriva em lote os endereços de recebimento que faltam até last_index"""
+        wallet = Wallet.objects.get(id=wallet_id)
+        if not wallet.xpub:
+            raise ValueError("Carteira sem xpub não pode derivar endereços")
+
+        current = (
+            Address.objects.filter(wallet=wallet, is_change=False)
+            .aggregate(last_index=Max('index'))['last_index']
+        )
+        missing = last_index - (-1 if current is None else current)
+        if missing > 0:
+            self._generate_addresses(wallet, missing)
+
+    def _schedule_receive_top_up(self, wallet_id, last_index):
+        """Repõe o buffer numa thread, sem segurar a requisição; ignora se já houver uma em andamento"""
+        with _topup_lock:
+            if wallet_id in _topping_up:
+                return
+            _topping_up.add(wallet_id)
+
+        def run():
+            try:
+                self._top_up_receive_addresses(wallet_id, last_index)
+            except Exception as e:
+                logger.error(f"Erro ao repor endereços da carteira {wallet_id}: {str(e)}")
+            finally:
+                with _topup_lock:
+                    _topping_up.discard(wallet_id)
+                connection.close()
+
+        threading.Thread(target=run, name='address-top-up', daemon=True).start()
+
+    def _next_change_address(self, wallet):
+        """Primeiro endereço de troco sem transações, derivando um novo se todos já foram usados"""
+        address = (
+            Address.objects.filter(wallet=wallet, is_change=True, last_txid='', utxos__isnull=True)
+            .order_by('index').first()
+        )
+        if address is None:
+            address = self._generate_addresses(wallet, 1, is_change=True)[0]
+        return address
+
+    ## MARK: Create transaction
+
+    def create_transaction(self, wallet_id, to_address, amount, fee_rate=None):
+        """
+        Monta uma PSBT não assinada (BIP174) pagando `amount` satoshis para
+        to_address a `fee_rate` sat/vB. As entradas saem das UTXOs confirmadas
+        da carteira (coin_selection) e o troco, se houver, vai para um
+        endereço de troco ainda não usado. Entradas e troco levam a origem
+        BIP32 (fingerprint mestre e caminho) para o signatário externo.
+        """
+        wallet = Wallet.objects.get(id=wallet_id)
+        if not wallet.xpub:
+            raise ValueError("Carteira sem xpub não pode montar transações")
+
+        if fee_rate is None:
+            fee_rate = getattr(settings, 'WALLET_DEFAULT_FEE_RATE', 5)
+        if fee_rate < 1:
+            raise ValueError("fee_rate deve ser de pelo menos 1 sat/vB")
+
+        witness_type = hd_derivation.witness_type(wallet.xpub)
+        recipient_script = self._output_script(to_address)
+
+        # Altura do último sync, para deixar de fora coinbases imaturas sem consultar provedores
+        tip_height = WalletSnapshot.objects.filter(wallet=wallet).values_list('tip_height', flat=True).first()
+        utxos = list(
+            Utxo.spendable(wallet.id, tip_height)
+            .values_list('txid', 'output_n', 'value', 'address__address', 'address__is_change',
+                         'address__index', named=True)
+        )
+        selection = coin_selection.select_coins(
+            [utxo.value for utxo in utxos], amount, fee_rate,
+            coin_selection.tx_sizes(witness_type, len(recipient_script)),
+            max_tries=getattr(settings, 'WALLET_COIN_SELECTION_MAX_TRIES', coin_selection.BNB_MAX_TRIES)
+        )
+        selected = [utxos[index] for index in selection.indices]
+
+        outputs = [psbt.PsbtOutput(amount, recipient_script)]
+        change_address = None
+        if selection.change:
+            change = self._next_change_address(wallet)
+            change_address = change.address
+            # Troco em posição aleatória para não revelar qual saída é o pagamento
+            outputs.insert(
+                random.randrange(len(outputs) + 1),
+                psbt.PsbtOutput(
+                    selection.change, self._output_script(change_address),
+                    self._bip32_derivation(wallet, 1, change.index)
+                )
+            )
+
+        inputs = [self._psbt_input(wallet, witness_type, utxo) for utxo in selected]
+        psbt_base64, tx_hex = psbt.build_psbt(inputs, outputs)
+
+        logger.info(f"Transação montada para a carteira {wallet_id}: {len(inputs)} entradas, "
+                    f"taxa {selection.fee} sat, seleção {selection.algorithm}")
+
+        return {
+            "psbt": psbt_base64,
+            "tx_hex": tx_hex,
+            "fee": selection.fee,
+            "fee_rate": fee_rate,
+            "change": selection.change,
+            "change_address": change_address,
+            "inputs": [
+                {"txid": utxo.txid, "output_n": utxo.output_n, "value": utxo.value} for utxo in selected
+            ],
+        }
+
+    def _output_script(self, address):
+        try:
+            return BitcoinlibOutput(0, address=address, network='bitcoin').lock_script
+        except Exception:
+            raise ValueError(f"Endereço inválido: {address}")
+
+    def _bip32_derivation(self, wallet, change, index):
+        """(chave pública, fingerprint, caminho) do endereço change/index, para a PSBT"""
+        fingerprint, path = hd_derivation.key_origin(wallet.xpub, wallet.master_fingerprint, change, index)
+        return hd_derivation.derive_public_key(wallet.xpub, change, index), fingerprint, path
+
+    def _psbt_input(self, wallet, witness_type, utxo):
+        script_pubkey = self._output_script(utxo.address__address)
+        redeem_script = None
+        non_witness_utxo = None
+        derivation = self._bip32_derivation(wallet, int(utxo.address__is_change), utxo.address__index)
+
+        if witness_type == 'p2sh-segwit':
+            # P2SH-P2WPKH: o signatário precisa do script resgatado (0 <hash160 da chave>)
+            redeem_script = b'\x00\x14' + hash160(derivation[0])
+        elif witness_type == 'legacy':
+            raw_tx = self.service.getrawtransaction(utxo.txid)
+            if not raw_tx:
+                raise WalletServiceError(f"Transação anterior {utxo.txid} indisponível nos provedores")
+            non_witness_utxo = bytes.fromhex(raw_tx)
+
+        return psbt.PsbtInput(
+            txid=utxo.txid,
+            output_n=utxo.output_n,
+            value=utxo.value,
+            script_pubkey=script_pubkey,
+            redeem_script=redeem_script,
+            non_witness_utxo=non_witness_utxo,
+            segwit=witness_type != 'legacy',
+            bip32_derivation=derivation,
+        )
+
+    ## MARK: Broadcast
+
+    def broadcast_transaction(self, tx_hex, user):
+        """
+        Coloca a transação assinada na fila de transmissão e retorna o txid
+        calculado localmente. No modo 'worker' o envio fica com o comando
+        broadcast_transactions; no modo 'request' a primeira tentativa sai num
+        pool de threads de fundo e as novas tentativas ficam com o comando.
+        """
+        broadcast_service = BroadcastService()
+        txid = broadcast_service.enqueue(tx_hex, user)
+        if not self._synced_by_worker():
+            broadcast_service.submit_in_background(txid)
+        return txid
+
     ## MARK: Delete wallet
 
     def delete_wallet(self, wallet_id):
         try:
             wallet = Wallet.objects.get(id=wallet_id)
+            # O snapshot é removido em cascata junto com a carteira
             wallet.delete()
+            wallet_pool.invalidate(f"watch_only_{wallet_id}")
             return {'message': 'Wallet deleted successfully'}
         except ObjectDoesNotExist:
             return {'error': 'Wallet not found'}
@@ -160,23 +413,33 @@ class WalletService:
             wallet_id = data["wallet_id"]
             wallet_name_full = f"watch_only_{wallet_id}"
 
-            if not wallet_exists(wallet_name_full):
-                BitcoinlibWallet.create(
-                    name=wallet_name_full,
-                    keys=pub_key,
-                    network='bitcoin',
-                    witness_type='segwit'
-                )
-
-            wallet = BitcoinlibWallet(wallet_name_full)
-            balance = wallet.balance()
-            transactions = wallet.transactions_full()
-            pub_key = wallet.wif()
-        
+            # Snapshot recente: responde sem abrir a carteira na bitcoinlib
+            snapshot = WalletSnapshot.objects.filter(wallet_id=wallet_id).first()
+            if self._snapshot_is_servable(snapshot):
+                self._schedule_snapshot_refresh_if_stale(snapshot)
+            elif self._synced_by_worker():
+                # O worker ainda não sincronizou esta carteira
+                return {"total": 0, "confirmed": 0, "unconfirmed": 0, "immature": 0,
+                        "transactions": 0, "address": pub_key}
+            else:
+                # Carteiras registradas sincronizam pelo conjunto de UTXOs; só as
+                # que existem apenas na bitcoinlib ainda dependem dela
+                if not Wallet.objects.filter(id=wallet_id).exists() and not wallet_pool.exists(wallet_name_full):
+                    BitcoinlibWallet.create(
+                        name=wallet_name_full,
+                        db_uri=bitcoinlib_db.database_uri(wallet_name_full),
+                        keys=pub_key,
+                        network='bitcoin',
+                        witness_type='segwit'
+                    )
+                snapshot = self._refresh_wallet_snapshot(wallet_id)
 
             return {
-                "total": balance,
-                "transactions": len(transactions),
+                "total": snapshot.balance,
+                "confirmed": snapshot.confirmed_balance,
+                "unconfirmed": snapshot.unconfirmed_balance,
+                "immature": snapshot.immature_balance,
+                "transactions": snapshot.tx_count,
                 "address": pub_key
             }
 
@@ -184,150 +447,282 @@ class WalletService:
             logger.error(f"Erro ao obter saldo: {str(e)}")
             raise
 
+    ## MARK: Snapshot
 
+    def _synced_by_worker(self):
+        """
+        WALLET_SYNC_MODE = 'worker': o comando sync_wallets mantém os snapshots e
+        as views só leem o que já foi calculado, sem sincronizar na requisição
+        """
+        return getattr(settings, 'WALLET_SYNC_MODE', 'request') == 'worker'
+
+    def _snapshot_is_servable(self, snapshot):
+        """Snapshot válido e dentro do limite máximo de idade (WALLET_SNAPSHOT_MAX_STALENESS)"""
+        if snapshot is None:
+            return False
+        if self._synced_by_worker():
+            # Mesmo invalidado, é o dado mais recente; o worker o atualiza com prioridade
+            return True
+        age = snapshot.age()
+        return age is not None and age <= getattr(settings, 'WALLET_SNAPSHOT_MAX_STALENESS', 3600)
+
+    def _schedule_snapshot_refresh_if_stale(self, snapshot):
+        """Agenda atualização em segundo plano quando o snapshot passou do WALLET_SNAPSHOT_TTL"""
+        if self._synced_by_worker():
+            return
+        if snapshot.age() > getattr(settings, 'WALLET_SNAPSHOT_TTL', 60):
+            self._schedule_snapshot_refresh(snapshot.wallet_id)
+
+    def _schedule_snapshot_refresh(self, wallet_id):
+        """
+        Atualiza o snapshot numa thread de fundo. Cada carteira tem no máximo
+        uma atualização em andamento por processo.
+        """
+        global _snapshot_executor
+
+        with _snapshot_lock:
+            if wallet_id in _snapshot_refreshing:
+                return
+            _snapshot_refreshing.add(wallet_id)
+            if _snapshot_executor is None:
+                _snapshot_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'WALLET_SNAPSHOT_REFRESH_WORKERS', 2),
+                    thread_name_prefix='wallet-snapshot'
+                )
 
-    def get_user_transactions(self, user):
-        try:
-            result = []
-            wallets = Wallet.objects.filter(user=user)
+        def run():
+            try:
+                self._refresh_wallet_snapshot(wallet_id)
+            except Exception as e:
+                logger.error(f"Erro ao atualizar snapshot da carteira {wallet_id}: {str(e)}")
+            finally:
+                with _snapshot_lock:
+                    _snapshot_refreshing.discard(wallet_id)
+                connection.close()
 
-            logger.info(f"Número de carteiras encontradas para o usuário {user.id}: {wallets.count()}")
+        _snapshot_executor.submit(run)
 
-            for wallet in wallets:
-                wallet_name = f"watch_only_{wallet.id}"
-                logger.info(f"Inicializando carteira com o nome: {wallet_name}")
-                logger.info(f"Dados da carteira: {wallet.__dict__}")
+    def _refresh_wallet_snapshot(self, wallet_id):
+        """
+        Atualiza o snapshot da carteira. Carteiras registradas passam pelo sync
+        incremental (transações, UTXOs e saldos do Utxo.balances); carteiras que
+        só existem na bitcoinlib são lidas dela. Retorna None se a carteira não
+        existir em nenhum dos dois. Lê do primário mesmo dentro de um endpoint
+        servido pela réplica, já que o sync grava o que acabou de ler.
+        """
+        with primary():
+            if Wallet.objects.filter(id=wallet_id).exists():
+                WalletSyncService(self.service).sync_wallet(wallet_id, self._get_tip_height())
+                return WalletSnapshot.objects.filter(wallet_id=wallet_id).first()
 
-                try:
-                    btc_wallet = BitcoinlibWallet(wallet_name)
-                    logger.info(f"Carteira {wallet_name} inicializada com sucesso")
-                except Exception as e:
-                    logger.error(f"Erro ao inicializar a carteira {wallet_name}: {str(e)}")
-                    continue
+        # Carteira aberta reaproveitada do pool: sem reabrir a bitcoinlib a cada leitura
+        try:
+            with wallet_pool.checkout(f"watch_only_{wallet_id}") as btc_wallet:
+                balance = bitcoinlib_db.balance(btc_wallet)
+                values = {
+                    "balance": balance,
+                    "confirmed_balance": balance,
+                    "tx_count": len(btc_wallet.transactions_full()),
+                    "address": btc_wallet.get_key().address,
+                }
+        except wallet_pool.WalletNotFound:
+            return None
 
-                try:
-                    transactions = btc_wallet.transactions()
-                    logger.info(f"Número de transações encontradas para {wallet_name}: {len(transactions)}")
-                except Exception as e:
-                    logger.error(f"Erro ao obter transações para {wallet_name}: {str(e)}")
-                    continue
-
-                for tx in transactions:
-                    logger.info(f"Processando transação {tx.txid}")
-                    logger.info(f"Transação {tx.txid}, Status: {tx.status}, Confirmations: {tx.confirmations}")
-
-                    # Acessando a data da transação
-                    tx_date = getattr(tx, "date", None)
-                    if tx_date:
-                        tx_date = tx_date.strftime('%Y-%m-%d %H:%M:%S')  # Formato legível
-
-                    # Acessando os inputs e outputs para verificar o valor
-                    total_value = 0
-                    for output in tx.outputs:
-                        total_value += output.value
-
-                    # Verificando se a transação foi enviada ou recebida
-                    user_address = wallet.address  # Usando o endereço da carteira do usuário
-                    is_sent = False
-                    is_received = False
-
-                    for input_tx in tx.inputs:
-                        if input_tx.address == user_address:
-                            is_sent = True
-
-                    for output_tx in tx.outputs:
-                        if output_tx.address == user_address:
-                            is_received = True
-
-                    transaction_type = "sent" if is_sent else "received" if is_received else "unknown"
-
-                    # Adicionando as informações ao resultado
-                    result.append({
-                        "network": str(tx.network) if tx.network else "",
-                        "confirmations": tx.confirmations,
-                        "status": tx.status,
-                        "date": tx_date,
-                        "value": total_value,
-                        "transaction_type": transaction_type,
-                    })
-
-                    logger.info(f"Transação {tx.txid} processada com sucesso")
-
-            logger.info(f"Total de transações processadas para o usuário {user.id}: {len(result)}")
-            return result
+        values["tip_height"] = self._get_tip_height()
+        values["refreshed_at"] = timezone.now()
+
+        # Carteiras só da bitcoinlib (sem registro em Wallet) não são persistidas
+        return WalletSnapshot(wallet_id=wallet_id, **values)
 
+    def _get_tip_height(self):
+        """Altura atual da blockchain pelos provedores (None se indisponível)"""
+        try:
+            return self.service.blockcount()
         except Exception as e:
-            logger.error(f"Erro geral ao obter transações do usuário {user.id}: {str(e)}")
-            raise
+            logger.warning(f"Não foi possível obter a altura do bloco: {str(e)}")
+            return None
+
+    def invalidate_wallet_snapshots(self, **filters):
+        """
+        Invalida snapshots (ex: wallet_id=..., wallet__user=...) para que a
+        próxima leitura recalcule os dados
+        """
+        return WalletSnapshot.invalidate(**filters)
+
+    def _stored_transaction_row(self, row):
+        confirmations = 0
+        if row.block_height is not None and row.wallet__snapshot__tip_height is not None:
+            confirmations = max(row.wallet__snapshot__tip_height - row.block_height + 1, 0)
+
+        return {
+            "network": "bitcoin",
+            "confirmations": confirmations,
+            # Vocabulário de status da bitcoinlib, o das respostas originais do endpoint
+            "status": "unconfirmed" if row.status == 'pending' else row.status,
+            # Mesmo texto de strftime('%Y-%m-%d %H:%M:%S'), com metade do custo por linha
+            "date": row.date.isoformat(' ', 'seconds')[:19] if row.date else None,
+            "value": abs(row.amount),
+            "transaction_type": address_index.transaction_type(row.amount),
+        }
+
+    def iter_stored_transactions(self, user):
+        """
+        Transações do usuário gravadas pelo sync incremental, lidas do banco em
+        blocos. As confirmações são calculadas a partir da altura do bloco do
+        snapshot de cada carteira.
+        """
+        rows = (
+            Transaction.objects.filter(user=user)
+            .order_by('wallet_id', 'date', 'txid')
+            .values_list('txid', *STORED_TRANSACTION_FIELDS, named=True)
+        )
+        for row in rows.iterator(chunk_size=2000):
+            item = self._stored_transaction_row(row)
+            item["txid"] = row.txid
+            yield item
+
+    def get_transactions_page(self, user, cursor=None, limit=50, wallet=None, direction=None,
+                              status=None, date_from=None, date_to=None):
+        """
+        Página de transações do usuário, da mais nova para a mais antiga, com
+        paginação por chave (date, txid, id): cada página é uma busca no índice
+        (user ou wallet, -date, -txid, -id) a partir do cursor, sem OFFSET nem
+        ordenação em memória, então o custo não cresce com o histórico.
+        Na primeira página (sem cursor) as carteiras pendentes são sincronizadas
+        antes (sync_user_wallets, só no modo 'request').
+        """
+        if not cursor:
+            self.sync_user_wallets(user)
+
+        queryset = Transaction.objects.filter(user=user)
+
+        if wallet is not None:
+            queryset = queryset.filter(wallet_id=wallet)
+        if direction == 'sent':
+            queryset = queryset.filter(amount__lt=0)
+        elif direction == 'received':
+            queryset = queryset.filter(amount__gt=0)
+        if status:
+            queryset = queryset.filter(status=status)
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(date__lte=date_to)
+
+        if cursor:
+            date, txid, pk = self._decode_cursor(cursor)
+            # date__lte dá ao índice o ponto de partida; o OR só desempata dentro da mesma data
+            queryset = queryset.filter(date__lte=date).filter(
+                Q(date__lt=date) |
+                Q(date=date, txid__lt=txid) |
+                Q(date=date, txid=txid, id__lt=pk)
+            )
+
+        # Busca um item a mais para saber se existe próxima página
+        rows = list(
+            queryset.order_by('-date', '-txid', '-id')
+            .values_list('id', 'txid', 'wallet_id', *STORED_TRANSACTION_FIELDS, named=True)[:limit + 1]
+        )
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+
+        results = []
+        for row in rows:
+            item = self._stored_transaction_row(row)
+            item.update({"txid": row.txid, "wallet": row.wallet_id, "amount": row.amount})
+            results.append(item)
+
+        last = rows[-1] if rows else None
+        return {
+            "results": results,
+            "next": self._encode_cursor(last.date, last.txid, last.id) if has_next else None,
+        }
+
+    def _encode_cursor(self, date, txid, pk):
+        payload = json.dumps([date.isoformat(), txid, pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def _decode_cursor(self, cursor):
+        try:
+            date, txid, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(date), str(txid), int(pk)
+        except (ValueError, TypeError):
+            raise ValueError("Cursor inválido")
+
+    async def aget_transactions_page(self, user, **params):
+        # No modo 'request' o sync das carteiras pendentes é síncrono: roda fora do event loop
+        return await sync_to_async(self._get_transactions_page_closing, thread_sensitive=False)(user, **params)
+
+    def _get_transactions_page_closing(self, user, **params):
+        try:
+            return self.get_transactions_page(user, **params)
+        finally:
+            connection.close()
+
+    def iter_user_transactions(self, user):
+        """
+        Gera as transações do usuário uma a uma, sem acumular a lista inteira
+        (usado pela exportação em streaming). O
+        histórico sai de Transaction, gravado pelo sync nos dois modos.
+        """
+        self.sync_user_wallets(user)
+        yield from self.iter_stored_transactions(user)
 
-    def get_all_wallets(self, wallets):
+    def sync_user_wallets(self, user):
+        """
+        Modo 'request': sincroniza antes da leitura as carteiras do usuário
+        ainda sem snapshot servível, para que Transaction esteja preenchida; as
+        que só passaram do WALLET_SNAPSHOT_TTL são atualizadas em segundo plano.
+        No modo 'worker' não faz nada.
+        """
+        if self._synced_by_worker():
+            return
+
+        wallet_ids = list(Wallet.objects.filter(user=user).values_list('id', flat=True))
+        snapshots = WalletSnapshot.objects.in_bulk(wallet_ids, field_name='wallet_id')
+        for wallet_id in wallet_ids:
+            snapshot = snapshots.get(wallet_id)
+            if self._snapshot_is_servable(snapshot):
+                self._schedule_snapshot_refresh_if_stale(snapshot)
+                continue
+            try:
+                self._refresh_wallet_snapshot(wallet_id)
+            except Exception as e:
+                # Uma carteira com erro não impede a leitura das demais
+                logger.error(f"Erro ao sincronizar carteira {wallet_id}: {str(e)}")
+
+    def get_all_wallets(self, wallets, currency=None):
         """
         Obtém dados de todas as carteiras com tratamento robusto de erros
         Mantém a mesma interface pública com melhorias internas
+
+        Carteiras com snapshot recente são respondidas direto do banco (e
+        atualizadas em segundo plano quando vencidas). As demais são processadas
+        em paralelo (até WALLET_FANOUT_MAX_WORKERS threads) dentro de um prazo
+        único de WALLET_FANOUT_TIMEOUT segundos; uma carteira lenta ou com erro
+        só afeta a própria entrada.
         """
         result = []
-        btc_to_brl = self._get_btc_price()  # Valor padrão caso a API falhe
+        btc_to_brl = self._get_btc_price(currency)  # None enquanto não houver preço
         try:
-            # 1. Otimiza a obtenção dos dados das carteiras
-            wallets_data = wallets.values_list('id', 'name', named=True)
-            logger.debug(f"Iniciando processamento de {len(wallets_data)} carteiras")
-
-            # 3. Processa cada carteira individualmente
-            for wallet_info in wallets_data:
-                wallet_id, wallet_name = wallet_info.id, wallet_info.name
-                wallet_entry = {
-                    "id": wallet_id,
-                    "name": wallet_name,
-                    "error": None,
-                    "balanceSatoshi": 0,
-                    "btcValue": "0.00000000",
-                    "fiatValue": "0.00",
-                    "address": "N/A",
-                    "transactions": 0,
-                    "color": '#F7931A',
-                    "change": 3.12
-                }
+            # 1 e 2. Dados das carteiras e snapshots válidos
+            result, wallets_data, missing = self._entries_from_snapshots(wallets, btc_to_brl)
+
+            # 3. Sem paralelismo configurado mantém o fluxo sequencial (sem prazo)
+            max_workers = getattr(settings, 'WALLET_FANOUT_MAX_WORKERS', 8)
+            timeout = getattr(settings, 'WALLET_FANOUT_TIMEOUT', 15)
+            missing_data = [wallets_data[position] for position in missing]
+
+            if max_workers <= 1 or not missing_data:
+                entries = [
+                    self._get_wallet_entry(wallet_info.id, wallet_info.name, btc_to_brl)
+                    for wallet_info in missing_data
+                ]
+            else:
+                entries = self._get_wallet_entries_concurrently(missing_data, btc_to_brl, max_workers, timeout)
 
-                try:
-                    watch_wallet_name = f"watch_only_{wallet_id}"
-                    
-                    # 4. Verifica existência da carteira de forma mais eficiente
-                    if not wallet_exists(watch_wallet_name):
-                        logger.warning(f"Carteira {watch_wallet_name} não encontrada")
-                        wallet_entry["error"] = "Carteira não configurada"
-                        result.append(wallet_entry)
-                        continue
-
-                    # 5. Processamento principal com tratamento granular
-                    with BitcoinlibWallet(watch_wallet_name) as btc_wallet:
-                        balance = btc_wallet.balance()
-                        transactions = btc_wallet.transactions_full()
-                        
-                        # 6. Cálculos seguros
-                        try:
-                            btc_value = balance / 100_000_000
-                            fiat_value = btc_value * btc_to_brl
-                        except ZeroDivisionError:
-                            btc_value = 0
-                            fiat_value = 0
-
-                        # 7. Atualiza os dados formatados
-                        wallet_entry.update({
-                            "balanceSatoshi": balance,
-                            "btcValue": f"{btc_value:.8f}",
-                            "fiatValue": f"{fiat_value:.2f}",
-                            "address": btc_wallet.get_key().address,
-                            "transactions": len(transactions)
-                        })
-                        
-                        result.append(wallet_entry)
-                        logger.debug(f"Carteira {wallet_id} processada com sucesso")
-
-                except Exception as inner_e:
-                    logger.error(f"Erro na carteira {wallet_id}: {str(inner_e)}", exc_info=True)
-                    wallet_entry["error"] = "Erro ao processar carteira"
-                    result.append(wallet_entry)
-                    continue
+            for position, entry in zip(missing, entries):
+                result[position] = entry
 
         except Exception as global_error:
             logger.critical(f"Erro crítico no processamento: {str(global_error)}", exc_info=True)
@@ -336,72 +731,223 @@ class WalletService:
         logger.info(f"Processamento concluído. {len(result)} carteiras retornadas")
         return result
 
-    def _get_btc_price(self):
-        """Obtém o preço do BTC com cache de 1 hora ou se o preço atual for zero"""
+    async def aget_all_wallets(self, wallets, currency=None):
+        """
+        Versão async do get_all_wallets para as views ASGI. Os snapshots saem
+        numa única ida ao banco e as carteiras sem snapshot são sincronizadas
+        em tarefas (até WALLET_FANOUT_MAX_WORKERS por vez) com um prazo único de
+        WALLET_FANOUT_TIMEOUT segundos, como no get_all_wallets. O sync em si
+        continua síncrono (bitcoinlib) e roda em threads fora do event loop.
+        """
+        btc_to_brl = await sync_to_async(self._get_btc_price)(currency)
         try:
-            cache = BitcoinPriceCache.get_cached_price()
+            result, wallets_data, missing = await sync_to_async(self._entries_from_snapshots)(wallets, btc_to_brl)
+        except Exception as global_error:
+            logger.critical(f"Erro crítico no processamento: {str(global_error)}", exc_info=True)
+            raise WalletServiceError("Falha ao recuperar dados das carteiras")
+
+        limit = asyncio.Semaphore(max(getattr(settings, 'WALLET_FANOUT_MAX_WORKERS', 8), 1))
+        timeout = getattr(settings, 'WALLET_FANOUT_TIMEOUT', 15)
+        get_entry = sync_to_async(self._get_wallet_entry_closing, thread_sensitive=False)
+
+        async def entry(wallet_info):
+            async with limit:
+                return await get_entry(wallet_info.id, wallet_info.name, btc_to_brl)
+
+        tasks = {asyncio.ensure_future(entry(wallets_data[position])): position for position in missing}
+        if tasks:
+            # Prazo único: conta também para as carteiras ainda esperando o semáforo
+            await asyncio.wait(tasks, timeout=timeout)
+        for task, position in tasks.items():
+            wallet_info = wallets_data[position]
+            if not task.done():
+                task.cancel()
+                logger.warning(f"Tempo esgotado ao processar carteira {wallet_info.id} ({timeout}s)")
+                result[position] = self._empty_wallet_entry(
+                    wallet_info.id, wallet_info.name, "Tempo esgotado ao processar carteira"
+                )
+            elif task.exception() is not None:
+                logger.error(f"Erro na carteira {wallet_info.id}: {str(task.exception())}")
+                result[position] = self._empty_wallet_entry(
+                    wallet_info.id, wallet_info.name, "Erro ao processar carteira"
+                )
+            else:
+                result[position] = task.result()
 
-            # Calcula o tempo desde a última atualização (em segundos)
-            time_since_update = (timezone.now() - cache.last_updated).total_seconds()
+        logger.info(f"Processamento concluído. {len(result)} carteiras retornadas")
+        return result
 
-            # Verifica se precisa atualizar: cache expirado (mais de 1 hora) ou preço zero
-            if time_since_update > 3600 or cache.price == 0.0:
-                try:
-                    # Chama a API para obter o preço atual do BTC apenas quando necessário
-                    print("calling coingecko API", time_since_update > 3600, time_since_update)
-
-                    url = "https://api.coingecko.com/api/v3/coins/markets"
-                    params = {
-                        "vs_currency": "brl",
-                        "ids": "bitcoin"
-                    }
-
-                    result = requests.get(url, params=params)
-                    result.raise_for_status()
-
-                    # O retorno da API é uma lista, então acessamos o primeiro item
-                    bitcoin_data = result.json()
-
-                    # Verifique se a lista está vazia, e se não, pegue o primeiro item
-                    if bitcoin_data:
-                        bitcoin_info = bitcoin_data[0]  # Acessa o primeiro item da lista
-                        new_price = bitcoin_info.get("current_price", 0.0)
-                        change24h = bitcoin_info.get("price_change_percentage_24h", 0.0)
-                        low24h = bitcoin_info.get("low_24h", 0.0)
-                        high24h = bitcoin_info.get("high_24h", 0.0)
-
-                        print("change24h", change24h)
-
-                        # Só atualiza se o novo preço for válido e diferente de zero
-                        if new_price and new_price != 0.0:
-                            with transaction.atomic():
-                                cache.price = new_price
-                                cache.change24h = change24h
-                                cache.low24h = low24h
-                                cache.high24h = high24h
-                                cache.last_updated = timezone.now()
-                                cache.save()
-                                print("salvo 123", cache)
-                                logger.info(f"Preço do BTC atualizado com sucesso: {new_price}")
-                        else:
-                            logger.warning("Preço retornado pela API é zero ou inválido, mantendo o cache atual")
-                            return cache.price
-                    else:
-                        logger.warning("A resposta da API não contém dados válidos para o Bitcoin.")
-                        return cache.price  # Retorna o preço do cache se a resposta estiver vazia
-
-                except requests.RequestException as api_error:
-                    logger.error(f"Erro ao chamar API para obter o preço do BTC: {str(api_error)}")
-                    # Mantém o cache existente em caso de erro de API
-
-            # Retorna o preço atual do cache, a menos que seja zero
-            if cache.price == 0.0:
-                logger.warning("Preço do BTC ainda está zero no cache.")
-                return -100
-
-            logger.info(f"USING CACHED BTC PRICE {cache.price}")
-            return cache.price  # Retorna o preço do cache caso não precise atualizar
+    def _entries_from_snapshots(self, wallets, btc_to_brl):
+        """
+        Monta as entradas das carteiras com snapshot servível numa única
+        consulta. Retorna (entradas, dados das carteiras, posições que ainda
+        precisam de sync).
+        """
+        wallets_data = list(wallets.values_list('id', 'name', named=True))
+        logger.debug(f"Iniciando processamento de {len(wallets_data)} carteiras")
+
+        snapshots = WalletSnapshot.objects.in_bulk(
+            [wallet_info.id for wallet_info in wallets_data], field_name='wallet_id'
+        )
+        result = [None] * len(wallets_data)
+        missing = []
+        for position, wallet_info in enumerate(wallets_data):
+            snapshot = snapshots.get(wallet_info.id)
+            if self._snapshot_is_servable(snapshot):
+                result[position] = self._wallet_entry_from_snapshot(
+                    wallet_info.id, wallet_info.name, snapshot, btc_to_brl
+                )
+                self._schedule_snapshot_refresh_if_stale(snapshot)
+            elif self._synced_by_worker():
+                result[position] = self._empty_wallet_entry(
+                    wallet_info.id, wallet_info.name, "Carteira aguardando sincronização"
+                )
+            else:
+                missing.append(position)
+
+        return result, wallets_data, missing
+
+    def _get_wallet_entry_closing(self, wallet_id, wallet_name, btc_to_brl):
+        # Roda em thread própria: fecha a conexão do Django ao terminar
+        try:
+            return self._get_wallet_entry(wallet_id, wallet_name, btc_to_brl)
+        finally:
+            connection.close()
+
+    def _get_wallet_entries_concurrently(self, wallets_data, btc_to_brl, max_workers, timeout):
+        """
+        Executa _get_wallet_entry para cada carteira num pool limitado de threads.
+        Todas dividem um único prazo de `timeout` segundos: as que não terminarem
+        até lá, rodando ou ainda na fila atrás de threads presas, saem com erro
+        e a resposta segue com as demais.
+        """
+        entries = [None] * len(wallets_data)
+
+        def run(wallet_info):
+            try:
+                return self._get_wallet_entry(wallet_info.id, wallet_info.name, btc_to_brl)
+            finally:
+                # Cada thread abre a própria conexão do Django; fecha para não vazar
+                connection.close()
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(max_workers, len(wallets_data)),
+            thread_name_prefix='wallet-fanout'
+        )
+        try:
+            deadline = time.monotonic() + timeout
+            pending = {
+                # Com o contexto da requisição: um sync lido pela réplica fixa o usuário no primário
+                executor.submit(contextvars.copy_context().run, run, wallet_info): position
+                for position, wallet_info in enumerate(wallets_data)
+            }
+
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    position = pending.pop(future)
+                    try:
+                        entries[position] = future.result()
+                    except Exception as e:
+                        wallet_info = wallets_data[position]
+                        logger.error(f"Erro na carteira {wallet_info.id}: {str(e)}", exc_info=True)
+                        entries[position] = self._empty_wallet_entry(
+                            wallet_info.id, wallet_info.name, "Erro ao processar carteira"
+                        )
+
+            for position in pending.values():
+                wallet_info = wallets_data[position]
+                logger.warning(f"Tempo esgotado ao processar carteira {wallet_info.id} ({timeout}s)")
+                entries[position] = self._empty_wallet_entry(
+                    wallet_info.id, wallet_info.name, "Tempo esgotado ao processar carteira"
+                )
+        finally:
+            # Cancela as que ainda estão na fila e não espera as que estouraram o
+            # prazo; essas terminam em segundo plano
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return entries
+
+    def _empty_wallet_entry(self, wallet_id, wallet_name, error=None):
+        return {
+            "id": wallet_id,
+            "name": wallet_name,
+            "error": error,
+            "balanceSatoshi": 0,
+            "btcValue": "0.00000000",
+            "fiatValue": "0.00",
+            "address": "N/A",
+            "transactions": 0,
+            "color": '#F7931A',
+            "change": 3.12
+        }
+
+    def _wallet_entry_from_snapshot(self, wallet_id, wallet_name, snapshot, btc_to_brl):
+        wallet_entry = self._empty_wallet_entry(wallet_id, wallet_name)
+
+        btc_value = snapshot.balance / 100_000_000
+        # Sem preço o valor em moeda fica indisponível (null)
+        fiat_value = f"{btc_value * btc_to_brl:.2f}" if btc_to_brl is not None else None
+
+        wallet_entry.update({
+            "balanceSatoshi": snapshot.balance,
+            "btcValue": f"{btc_value:.8f}",
+            "fiatValue": fiat_value,
+            "address": snapshot.address or "N/A",
+            "transactions": snapshot.tx_count
+        })
+        return wallet_entry
+
+    def _get_wallet_entry(self, wallet_id, wallet_name, btc_to_brl):
+        """
+        Recalcula o snapshot da carteira e monta a entrada do all-balances.
+        Erros ficam registrados no campo "error" da própria entrada.
+        """
+        try:
+            snapshot = self._refresh_wallet_snapshot(wallet_id)
+
+            if snapshot is None:
+                logger.warning(f"Carteira watch_only_{wallet_id} não encontrada")
+                return self._empty_wallet_entry(wallet_id, wallet_name, "Carteira não configurada")
+
+            logger.debug(f"Carteira {wallet_id} processada com sucesso")
+            return self._wallet_entry_from_snapshot(wallet_id, wallet_name, snapshot, btc_to_brl)
+
+        except Exception as inner_e:
+            logger.error(f"Erro na carteira {wallet_id}: {str(inner_e)}", exc_info=True)
+            return self._empty_wallet_entry(wallet_id, wallet_name, "Erro ao processar carteira")
+
+    def normalize_currency(self, currency=None):
+        """Valida a moeda pedida; levanta ValueError se não for suportada"""
+        return PriceService().normalize_currency(currency)
+
+    def get_btc_quote(self, currency=None):
+        """Cotação completa do BTC (preço, variação, mínima e máxima em 24h)"""
+        return PriceService().get_quote(currency)
+
+    async def aget_btc_quote(self, currency=None):
+        return await PriceService().aget_quote(currency)
+
+    def _get_btc_price(self, currency=None):
+        """
+        Obtém o preço do BTC pelo PriceService: servido do cache e atualizado
+        em segundo plano a cada BTC_PRICE_SOFT_TTL segundos, sem esperar a API.
+        Retorna None enquanto não houver preço (cache frio ou erro): os valores
+        em moeda saem como indisponíveis (null), nunca como um valor inventado.
+        """
+        try:
+            price = PriceService().get_price(currency)
+
+            if not price:
+                logger.warning("Preço do BTC ainda não disponível no cache.")
+                return None
+
+            return price
 
         except Exception as e:
             logger.error(f"Erro ao obter ou atualizar preço do BTC: {str(e)}")
-            return 0  # Retorna 0 em caso de erro geral
+            return None
@@ -0,0 +1,91 @@
+"""
+Base dos testes: usuário com uma carteira segwit de chaves conhecidas (seed do
+vetor de teste 1 do BIP32) e os provedores da blockchain trocados pelo
+StubProvider (BLOCKCHAIN_PROVIDER='stub'), que lê as transações de um arquivo
+JSON temporário. Nada acessa a rede.
+"""
+import os
+import json
+import tempfile
+from bitcoinlib.keys import HDKey
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from ..models import Wallet, Address
+from ..services.wallet_service import WalletService
+
+TIP_HEIGHT = 850_000
+# Endereço de terceiros (destinatário dos pagamentos)
+EXTERNAL_ADDRESS = 'bc1qpy2dg9n27xptd9qyve5h9lac6vtrdsw346mp3f'
+
+_master = HDKey.from_seed('000102030405060708090a0b0c0d0e0f', network='bitcoin', witness_type='segwit')
+# Conta m/84'/0'/0': a chave privada assina as transações dos testes de broadcast
+ACCOUNT_KEY = _master.child_private(84, hardened=True).child_private(0, hardened=True).child_private(0, hardened=True)
+XPUB = ACCOUNT_KEY.public().wif_public()
+MASTER_FINGERPRINT = _master.fingerprint.hex()
+
+
+def signing_key(change, index):
+    """Chave privada do endereço M/<change>/<index> da carteira de teste"""
+    return ACCOUNT_KEY.child_private(change).child_private(index)
+
+
+class WalletFixtures:
+    """Usuário com uma carteira de 5 endereços de recebimento e 5 de troco já derivados"""
+
+    def setUp(self):
+        # Preço, marcações do router e demais entradas de cache não vazam entre testes
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.user = User.objects.create_user(username='alice', password='senha-de-teste')
+        self.wallet = Wallet.objects.create(name='Principal', wallet_type='watch-only', xpub=XPUB, user=self.user)
+        service = WalletService()
+        service._generate_addresses(self.wallet, 5)
+        service._generate_addresses(self.wallet, 5, is_change=True)
+
+        addresses = Address.objects.filter(wallet=self.wallet).order_by('index')
+        self.receive = [address.address for address in addresses if not address.is_change]
+        self.change = [address.address for address in addresses if address.is_change]
+
+    def use_stub(self, transactions, blockcount=TIP_HEIGHT):
+        """Passa a responder com estas transações (formato do StubProvider) até o fim do teste"""
+        fixture = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        with fixture:
+            json.dump({"blockcount": blockcount, "transactions": transactions}, fixture)
+        self.addCleanup(os.remove, fixture.name)
+
+        settings_override = override_settings(BLOCKCHAIN_STUB_FIXTURE=fixture.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def history(self):
+        """
+        Recebe 5.000 sat no primeiro endereço (confirmada) e gasta essa saída
+        pagando 3.000 sat a terceiros com 1.900 sat de troco (ainda na mempool)
+        """
+        return [
+            {
+                "txid": "a1" * 32, "block_height": TIP_HEIGHT - 10, "date": "2024-05-01T12:00:00", "fee": 150,
+                "inputs": [{"address": EXTERNAL_ADDRESS, "value": 10_000}],
+                "outputs": [{"address": self.receive[0], "value": 5_000}, {"address": EXTERNAL_ADDRESS, "value": 4_850}],
+            },
+            {
+                "txid": "b2" * 32, "block_height": None, "fee": 100,
+                "inputs": [{"address": self.receive[0], "value": 5_000, "prev_txid": "a1" * 32, "output_n": 0}],
+                "outputs": [{"address": EXTERNAL_ADDRESS, "value": 3_000}, {"address": self.change[0], "value": 1_900}],
+            },
+        ]
+
+
+STUB_SETTINGS = override_settings(BLOCKCHAIN_PROVIDER='stub', BLOCKCHAIN_STUB_FIXTURE=None, WALLET_SYNC_MODE='request')
+
+
+@STUB_SETTINGS
+class WalletTestCase(WalletFixtures, TestCase):
+    pass
+
+
+@STUB_SETTINGS
+class WalletTransactionTestCase(WalletFixtures, TransactionTestCase):
+    """Para código que grava em outras threads (ex: rodadas do sync_wallets): os dados precisam estar commitados"""
@@ -0,0 +1,124 @@
+from unittest import mock
+from bitcoinlib.transactions import Transaction as BitcoinlibTransaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from ..models import Address, Transaction, Utxo
+from ..services.broadcast_service import BroadcastService
+from .base import WalletTestCase, EXTERNAL_ADDRESS, signing_key
+
+FUNDING_TXID = "a1" * 32
+
+
+class FailingProvider:
+    errors = 'rejeitada'
+
+    def sendrawtransaction(self, rawtx):
+        return False
+
+
+@override_settings(WALLET_SYNC_MODE='worker')
+class BroadcastTests(WalletTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Utxo.objects.create(
+            wallet=self.wallet, address=Address.objects.get(wallet=self.wallet, path='M/0/0'),
+            txid=FUNDING_TXID, output_n=0, value=5_000, block_height=849_000
+        )
+
+    def spend(self, sign=True, value=5_000):
+        """Paga 3.000 sat a terceiros com 1.900 de troco, gastando a UTXO de M/0/0"""
+        key = signing_key(0, 0)
+        tx = BitcoinlibTransaction(network='bitcoin', witness_type='segwit')
+        tx.add_input(FUNDING_TXID, 0, keys=key.public(), value=value, witness_type='segwit')
+        tx.add_output(3_000, EXTERNAL_ADDRESS)
+        tx.add_output(1_900, self.change[0])
+        if sign:
+            tx.sign(key)
+        tx_hex = tx.raw_hex()
+        return tx_hex, BitcoinlibTransaction.parse_hex(tx_hex, network='bitcoin').txid
+
+    def test_enqueue_records_pending_transaction(self):
+        tx_hex, txid = self.spend()
+
+        self.assertEqual(BroadcastService().enqueue(tx_hex, self.user), txid)
+
+        row = Transaction.objects.get(wallet=self.wallet, txid=txid)
+        self.assertEqual((row.amount, row.fee, row.status), (-3_100, 100, 'pending'))
+        self.assertEqual(row.raw_hex, tx_hex)
+        self.assertIsNotNone(row.next_broadcast_at)
+        self.assertEqual(Utxo.objects.get(txid=FUNDING_TXID).spent_txid, txid)
+        self.assertEqual(Utxo.objects.get(txid=txid).value, 1_900)
+
+    def test_unsigned_transaction_is_rejected(self):
+        tx_hex, _ = self.spend(sign=False)
+
+        with self.assertRaisesMessage(ValueError, 'não assinada'):
+            BroadcastService().enqueue(tx_hex, self.user)
+
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(Utxo.objects.get(txid=FUNDING_TXID).spent_txid, '')
+
+    def test_signature_over_wrong_value_is_rejected(self):
+        # Assinada como se a UTXO valesse 6.000: o hash BIP143 não confere
+        tx_hex, _ = self.spend(value=6_000)
+
+        with self.assertRaisesMessage(ValueError, 'Assinatura inválida'):
+            BroadcastService().enqueue(tx_hex, self.user)
+
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_process_due_transmits(self):
+        tx_hex, txid = self.spend()
+        service = BroadcastService()
+        service.enqueue(tx_hex, self.user)
+
+        self.assertEqual(service.process_due(), 1)
+
+        row = Transaction.objects.get(wallet=self.wallet, txid=txid)
+        self.assertIsNotNone(row.broadcast_at)
+        self.assertIsNone(row.next_broadcast_at)
+        self.assertEqual(row.broadcast_attempts, 1)
+
+    @override_settings(BROADCAST_MAX_ATTEMPTS=1)
+    @mock.patch('user_wallet.services.broadcast_service.get_broadcast_services',
+                return_value=[('falha', FailingProvider)])
+    def test_failed_broadcast_releases_utxos(self, _):
+        tx_hex, txid = self.spend()
+        service = BroadcastService()
+        service.enqueue(tx_hex, self.user)
+
+        service.process_due()
+
+        row = Transaction.objects.get(wallet=self.wallet, txid=txid)
+        self.assertEqual(row.status, 'failed')
+        self.assertIn('rejeitada', row.broadcast_error)
+        self.assertEqual(Utxo.objects.get(txid=FUNDING_TXID).spent_txid, '')
+        self.assertFalse(Utxo.objects.filter(txid=txid).exists())
+
+    @override_settings(BROADCAST_RETRY_BASE=15)
+    @mock.patch('user_wallet.services.broadcast_service.get_broadcast_services',
+                return_value=[('falha', FailingProvider)])
+    def test_failed_attempt_is_rescheduled(self, _):
+        tx_hex, txid = self.spend()
+        service = BroadcastService()
+        service.enqueue(tx_hex, self.user)
+
+        service.process_due()
+
+        row = Transaction.objects.get(wallet=self.wallet, txid=txid)
+        self.assertEqual((row.status, row.broadcast_attempts), ('pending', 1))
+        self.assertIsNotNone(row.next_broadcast_at)
+        # Próxima tentativa só depois do backoff
+        self.assertEqual(service.process_due(), 0)
+
+    def test_endpoint_rejects_unsigned_transaction(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        tx_hex, _ = self.spend(sign=False)
+
+        response = client.post(reverse('transaction-broadcast'), {'tx_hex': tx_hex}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
@@ -0,0 +1,46 @@
+from django.test import SimpleTestCase
+from ..services.coin_selection import InsufficientFunds, select_coins, tx_sizes
+
+# Carteira segwit pagando a um endereço P2WPKH (script de 22 bytes)
+SIZES = tx_sizes('segwit', 22)
+
+
+class SelectCoinsTests(SimpleTestCase):
+
+    def test_exact_match_without_change(self):
+        # 5.000 - 68 (entrada) = 4.932 = 4.890 + 11 (base) + 31 (destinatário)
+        selection = select_coins([10_000, 5_000, 3_000], 4_890, 1, SIZES)
+
+        self.assertEqual(selection.indices, [1])
+        self.assertEqual(selection.change, 0)
+        self.assertEqual(selection.fee, 110)
+        self.assertEqual(selection.algorithm, 'bnb')
+
+    def test_change_balances_inputs(self):
+        values = [40_000, 25_000, 12_000]
+
+        selection = select_coins(values, 30_000, 2, SIZES)
+
+        total = sum(values[index] for index in selection.indices)
+        self.assertEqual(total, 30_000 + selection.fee + selection.change)
+        self.assertGreaterEqual(selection.change, 546)
+        vbytes = SIZES.base + SIZES.recipient + SIZES.change + SIZES.input * len(selection.indices)
+        self.assertEqual(selection.fee, 2 * vbytes)
+
+    def test_largest_first_when_no_single_utxo_covers(self):
+        selection = select_coins([20_000, 15_000, 9_000, 1_000], 40_000, 1, SIZES)
+
+        self.assertEqual(selection.algorithm, 'largest-first')
+        self.assertEqual(sorted(selection.indices), [0, 1, 2])
+
+    def test_insufficient_funds(self):
+        with self.assertRaises(InsufficientFunds):
+            select_coins([1_000, 2_000], 5_000, 1, SIZES)
+
+    def test_dust_that_does_not_pay_its_input_is_ignored(self):
+        # A 50 sat/vB cada entrada custa 3.400 sat: a UTXO de 3.000 não ajuda
+        with self.assertRaises(InsufficientFunds):
+            select_coins([10_000, 3_000], 7_000, 50, SIZES)
+
+        selection = select_coins([3_000, 10_000], 1_000, 50, SIZES)
+        self.assertEqual(selection.indices, [1])
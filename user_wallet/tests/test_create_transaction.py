@@ -0,0 +1,136 @@
+import base64
+import struct
+from bitcoinlib.transactions import Transaction as BitcoinlibTransaction
+from ..models import Address, Utxo
+from ..services import psbt
+from ..services.coin_selection import InsufficientFunds
+from ..services.wallet_service import WalletService
+from .base import WalletTestCase, ACCOUNT_KEY, EXTERNAL_ADDRESS, MASTER_FINGERPRINT, signing_key
+
+HARDENED = 0x80000000
+ACCOUNT_PATH = [84 | HARDENED, HARDENED, HARDENED]
+
+
+def read_varint(data, offset):
+    prefix = data[offset]
+    if prefix < 0xfd:
+        return prefix, offset + 1
+    size = {0xfd: 2, 0xfe: 4, 0xff: 8}[prefix]
+    return int.from_bytes(data[offset + 1:offset + 1 + size], 'little'), offset + 1 + size
+
+
+def parse_psbt(psbt_base64, input_count, output_count):
+    """Mapas (global, entradas, saídas) da PSBT como {(tipo, dados da chave): valor}"""
+    data = base64.b64decode(psbt_base64)
+    offset = len(psbt.PSBT_MAGIC)
+    maps = []
+    for _ in range(1 + input_count + output_count):
+        entries = {}
+        while True:
+            key_length, offset = read_varint(data, offset)
+            if key_length == 0:
+                break
+            key = data[offset:offset + key_length]
+            offset += key_length
+            value_length, offset = read_varint(data, offset)
+            entries[(key[0], key[1:])] = data[offset:offset + value_length]
+            offset += value_length
+        maps.append(entries)
+    assert offset == len(data)
+    return maps[0], maps[1:1 + input_count], maps[1 + input_count:]
+
+
+def derivations(entries, key_type):
+    """{chave pública: (fingerprint em hex, caminho)} dos campos BIP32 de um mapa"""
+    result = {}
+    for (entry_type, public_key), value in entries.items():
+        if entry_type == key_type:
+            path = list(struct.unpack(f'<{(len(value) - 4) // 4}I', value[4:]))
+            result[public_key] = (value[:4].hex(), path)
+    return result
+
+
+class CreateTransactionTests(WalletTestCase):
+
+    def add_utxo(self, txid, value, path='M/0/0', block_height=849_000):
+        Utxo.objects.create(
+            wallet=self.wallet, address=Address.objects.get(wallet=self.wallet, path=path),
+            txid=txid, output_n=0, value=value, block_height=block_height
+        )
+
+    def test_builds_psbt_with_change(self):
+        self.add_utxo("e1" * 32, 20_000)
+        self.add_utxo("e2" * 32, 25_000, path='M/0/1')
+
+        result = WalletService().create_transaction(self.wallet.id, EXTERNAL_ADDRESS, 30_000, fee_rate=2)
+
+        self.assertTrue(base64.b64decode(result["psbt"]).startswith(b'psbt\xff'))
+        self.assertIn(result["change_address"], self.change)
+
+        tx = BitcoinlibTransaction.parse_hex(result["tx_hex"], network='bitcoin')
+        self.assertEqual({tx_input.prev_txid.hex() for tx_input in tx.inputs}, {"e1" * 32, "e2" * 32})
+        self.assertEqual(
+            sorted((output.address, output.value) for output in tx.outputs),
+            sorted([(EXTERNAL_ADDRESS, 30_000), (result["change_address"], result["change"])])
+        )
+        self.assertEqual(45_000, 30_000 + result["fee"] + result["change"])
+        # Não assinada: nenhuma entrada tem scriptSig nem witness
+        self.assertTrue(all(not tx_input.unlocking_script for tx_input in tx.inputs))
+
+    def test_psbt_carries_bip32_origins(self):
+        self.wallet.master_fingerprint = MASTER_FINGERPRINT
+        self.wallet.save(update_fields=['master_fingerprint'])
+        self.add_utxo("e1" * 32, 20_000)
+        self.add_utxo("e2" * 32, 25_000, path='M/0/1')
+
+        result = WalletService().create_transaction(self.wallet.id, EXTERNAL_ADDRESS, 30_000, fee_rate=2)
+
+        tx = BitcoinlibTransaction.parse_hex(result["tx_hex"], network='bitcoin')
+        _, inputs, outputs = parse_psbt(result["psbt"], len(tx.inputs), len(tx.outputs))
+
+        expected = {"e1" * 32: 0, "e2" * 32: 1}
+        for tx_input, entries in zip(tx.inputs, inputs):
+            index = expected[tx_input.prev_txid.hex()]
+            self.assertEqual(
+                derivations(entries, psbt.PSBT_IN_BIP32_DERIVATION),
+                {signing_key(0, index).public_byte: (MASTER_FINGERPRINT, ACCOUNT_PATH + [0, index])}
+            )
+
+        change_index = self.change.index(result["change_address"])
+        for output, entries in zip(tx.outputs, outputs):
+            found = derivations(entries, psbt.PSBT_OUT_BIP32_DERIVATION)
+            if output.address == result["change_address"]:
+                # O signatário confere que o troco volta para a própria carteira
+                self.assertEqual(found, {
+                    signing_key(1, change_index).public_byte: (MASTER_FINGERPRINT, ACCOUNT_PATH + [1, change_index])
+                })
+            else:
+                self.assertEqual(found, {})
+
+    def test_unknown_master_fingerprint_uses_xpub_origin(self):
+        self.add_utxo("e1" * 32, 20_000)
+
+        result = WalletService().create_transaction(self.wallet.id, EXTERNAL_ADDRESS, 10_000, fee_rate=1)
+
+        tx = BitcoinlibTransaction.parse_hex(result["tx_hex"], network='bitcoin')
+        _, inputs, _ = parse_psbt(result["psbt"], len(tx.inputs), len(tx.outputs))
+        self.assertEqual(
+            derivations(inputs[0], psbt.PSBT_IN_BIP32_DERIVATION),
+            {signing_key(0, 0).public_byte: (ACCOUNT_KEY.fingerprint.hex(), [0, 0])}
+        )
+
+    def test_unconfirmed_and_spent_utxos_are_not_used(self):
+        self.add_utxo("e1" * 32, 50_000, block_height=None)
+        Utxo.objects.create(
+            wallet=self.wallet, address=Address.objects.get(wallet=self.wallet, path='M/0/1'),
+            txid="e2" * 32, output_n=0, value=50_000, block_height=849_000, spent_txid="f0" * 32
+        )
+
+        with self.assertRaises(InsufficientFunds):
+            WalletService().create_transaction(self.wallet.id, EXTERNAL_ADDRESS, 10_000, fee_rate=1)
+
+    def test_invalid_destination(self):
+        self.add_utxo("e1" * 32, 20_000)
+
+        with self.assertRaises(ValueError):
+            WalletService().create_transaction(self.wallet.id, 'não-é-um-endereço', 10_000, fee_rate=1)
@@ -0,0 +1,93 @@
+from unittest import mock
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from ..db_router import REPLICA, ReadReplicaRouter, pinned_to_primary, primary, read_replica, replica
+from ..middleware import PrimaryAfterWriteMiddleware
+from ..models import Wallet
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Só o alias em DATABASES: o router nunca abre a conexão
+        patcher = mock.patch.dict(connections.databases, {REPLICA: dict(connections.databases['default'])})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ReadReplicaRouter()
+
+    def test_reads_go_to_replica_only_inside_block(self):
+        self.assertEqual(self.router.db_for_read(Wallet), 'default')
+        with replica(user_id=1):
+            self.assertEqual(self.router.db_for_read(Wallet), REPLICA)
+            with primary():
+                self.assertEqual(self.router.db_for_read(Wallet), 'default')
+        self.assertEqual(self.router.db_for_read(Wallet), 'default')
+
+    def test_write_moves_request_and_user_to_primary(self):
+        with replica(user_id=1):
+            self.assertEqual(self.router.db_for_write(Wallet), 'default')
+            # O resto da requisição já não lê da réplica atrasada
+            self.assertEqual(self.router.db_for_read(Wallet), 'default')
+
+        self.assertTrue(pinned_to_primary(1))
+        with replica(user_id=1):
+            self.assertEqual(self.router.db_for_read(Wallet), 'default')
+        with replica(user_id=2):
+            self.assertEqual(self.router.db_for_read(Wallet), REPLICA)
+
+    def test_without_replica_alias_everything_is_primary(self):
+        del connections.databases[REPLICA]
+
+        with replica(user_id=1):
+            self.assertEqual(self.router.db_for_read(Wallet), 'default')
+            self.router.db_for_write(Wallet)
+        self.assertFalse(pinned_to_primary(1))
+
+    def test_read_replica_decorator_uses_request_user(self):
+        factory = RequestFactory()
+
+        @read_replica
+        def view(request):
+            return self.router.db_for_read(Wallet)
+
+        request = factory.get('/')
+        request.user = User(pk=7)
+        self.assertEqual(view(request), REPLICA)
+
+        cache.set('db_router:primary:7', True)
+        self.assertEqual(view(request), 'default')
+
+        request.user = AnonymousUser()
+        self.assertEqual(view(request), REPLICA)
+
+
+class PrimaryAfterWriteMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        patcher = mock.patch.dict(connections.databases, {REPLICA: dict(connections.databases['default'])})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def process(self, request, status):
+        request.user = User(pk=3)
+        middleware = PrimaryAfterWriteMiddleware(lambda request: HttpResponse(status=status))
+        return middleware(request)
+
+    def test_successful_write_pins_user(self):
+        self.process(self.factory.post('/wallets/'), 201)
+
+        self.assertTrue(pinned_to_primary(3))
+
+    def test_reads_and_rejected_writes_do_not_pin(self):
+        self.process(self.factory.get('/wallets/'), 200)
+        self.process(self.factory.post('/wallets/'), 400)
+
+        self.assertFalse(pinned_to_primary(3))
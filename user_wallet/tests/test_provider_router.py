@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import tempfile
+from django.test import SimpleTestCase, override_settings
+from ..services import provider_router
+from ..services.blockchain_providers import get_blockchain_service
+from ..services.provider_router import ProviderRouter, ProviderUnavailable, get_health
+from .base import TIP_HEIGHT
+
+
+@override_settings(BLOCKCHAIN_PROVIDER='fake', PROVIDER_HEDGE_DELAY=0.05,
+                   PROVIDER_BREAKER_THRESHOLD=2, PROVIDER_BREAKER_COOLDOWN=0.2)
+class ProviderRouterTests(SimpleTestCase):
+    """ProviderRouter sobre FakeProviders (BLOCKCHAIN_PROVIDER='fake'), sem rede"""
+
+    def setUp(self):
+        provider_router.reset_health()
+        self.addCleanup(provider_router.reset_health)
+        self.fixture = self.write_fixture(TIP_HEIGHT)
+
+    def write_fixture(self, blockcount):
+        fixture = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        with fixture:
+            json.dump({"blockcount": blockcount, "transactions": []}, fixture)
+        self.addCleanup(os.remove, fixture.name)
+        return fixture.name
+
+    def router(self, providers, fixture=None):
+        with override_settings(BLOCKCHAIN_FAKE_PROVIDERS=providers, BLOCKCHAIN_STUB_FIXTURE=fixture or self.fixture):
+            return get_blockchain_service()
+
+    def wait_for_requests(self, name, count):
+        # Consultas perdedoras terminam em segundo plano e só então entram nas métricas
+        deadline = time.monotonic() + 2
+        while get_health(name).requests < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_hedge_wins_over_slow_provider_and_ranking_follows(self):
+        router = self.router({'lento': {'latency': 0.5}, 'rapido': {'latency': 0.01}})
+        # Sem amostras a ordem é a da configuração: o lento recebe a consulta primeiro
+        self.assertEqual(router.ranked(), ['lento', 'rapido'])
+
+        started = time.monotonic()
+        self.assertEqual(router.blockcount(), TIP_HEIGHT)
+
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(get_health('rapido').hedges, 1)
+
+        self.wait_for_requests('lento', 1)
+        self.assertEqual(router.ranked(), ['rapido', 'lento'])
+        self.assertGreater(get_health('lento').latency, get_health('rapido').latency)
+
+        # Com o rápido na frente não há mais corrida
+        router.blockcount()
+        self.assertEqual(get_health('rapido').hedges, 1)
+        self.assertEqual(get_health('lento').requests, 1)
+
+    def test_failure_fails_over_immediately(self):
+        router = self.router({'falho': {'error_rate': 1.0}, 'estavel': {'latency': 0.01}})
+
+        self.assertEqual(router.blockcount(), TIP_HEIGHT)
+
+        # Sem esperar o hedge: a falha passa a consulta adiante na hora
+        self.assertEqual(get_health('estavel').hedges, 0)
+        self.assertEqual(get_health('falho').failures, 1)
+        self.assertEqual(router.ranked(), ['estavel', 'falho'])
+
+    def test_breaker_opens_and_half_opens(self):
+        failing = self.router({'falho': {'error_rate': 1.0}})
+        for _ in range(2):
+            with self.assertRaises(ProviderUnavailable):
+                failing.blockcount()
+
+        health = get_health('falho')
+        self.assertEqual(health.stats()["circuit"], "open")
+
+        # Circuito aberto fica no fim da fila e não é consultado enquanto outro responde
+        router = self.router({'falho': {'error_rate': 1.0}, 'estavel': {}})
+        self.assertEqual(router.ranked(), ['estavel', 'falho'])
+        self.assertEqual(router.blockcount(), TIP_HEIGHT)
+        self.assertEqual(health.requests, 2)
+
+        # Depois do cooldown, uma única consulta de teste por vez (half-open)
+        time.sleep(0.25)
+        now = time.monotonic()
+        self.assertTrue(health.acquire(now))
+        self.assertFalse(health.acquire(now))
+
+        # O teste falhou: o circuito reabre na hora
+        health.record(0.01, ok=False)
+        self.assertEqual(health.stats()["circuit"], "open")
+
+        time.sleep(0.25)
+        self.assertTrue(health.acquire(time.monotonic()))
+        health.record(0.01, ok=True)
+        self.assertEqual(health.stats()["circuit"], "closed")
+        self.assertTrue(health.acquire(time.monotonic()))
+        self.assertTrue(health.acquire(time.monotonic()))
+
+    def test_routers_do_not_share_clients(self):
+        # Mesmos nomes, dados diferentes: cada roteador usa só os próprios clientes
+        first = self.router({'unico': {}})
+        second = self.router({'unico': {}}, fixture=self.write_fixture(TIP_HEIGHT + 1))
+
+        for _ in range(5):
+            self.assertEqual(first.blockcount(), TIP_HEIGHT)
+            self.assertEqual(second.blockcount(), TIP_HEIGHT + 1)
+
+    def test_all_providers_failing(self):
+        router = ProviderRouter([('a', lambda: None), ('b', lambda: None)])
+
+        with self.assertRaisesMessage(ProviderUnavailable, 'blockcount'):
+            router.blockcount()
@@ -0,0 +1,83 @@
+from unittest import mock
+from ..models import Address, Transaction, Utxo, WalletSnapshot
+from ..services.blockchain_providers import StubProvider, get_blockchain_service
+from ..services.sync_service import WalletSyncService
+from .base import WalletTestCase, EXTERNAL_ADDRESS, TIP_HEIGHT
+
+
+class WalletSyncTests(WalletTestCase):
+
+    def sync(self):
+        return WalletSyncService(get_blockchain_service()).sync_wallet(self.wallet.id)
+
+    def test_sync_stores_transactions_utxos_and_snapshot(self):
+        self.use_stub(self.history())
+
+        self.assertTrue(self.sync())
+
+        amounts = dict(Transaction.objects.filter(wallet=self.wallet).values_list('txid', 'amount'))
+        self.assertEqual(amounts, {"a1" * 32: 5_000, "b2" * 32: -3_100})
+        self.assertEqual(Transaction.objects.get(txid="b2" * 32).status, 'pending')
+
+        # A saída recebida está gasta pela transação na mempool; o troco ainda não confirmou
+        received = Utxo.objects.get(txid="a1" * 32)
+        self.assertEqual(received.spent_txid, "b2" * 32)
+
+        snapshot = WalletSnapshot.objects.get(wallet=self.wallet)
+        self.assertEqual(snapshot.confirmed_balance, 0)
+        self.assertEqual(snapshot.unconfirmed_balance, 1_900)
+        self.assertEqual(snapshot.balance, 1_900)
+        self.assertEqual(snapshot.tx_count, 2)
+        self.assertEqual(snapshot.tip_height, TIP_HEIGHT)
+
+    def test_sync_is_incremental(self):
+        self.use_stub(self.history())
+        self.sync()
+
+        # A marca d'água só avança até a última transação confirmada
+        self.assertEqual(Address.objects.get(wallet=self.wallet, address=self.receive[0]).last_txid, "a1" * 32)
+
+        # Nada novo: a transação pendente volta, mas não muda
+        self.assertFalse(self.sync())
+
+    def test_confirmation_updates_status_and_spends_utxo(self):
+        history = self.history()
+        self.use_stub(history)
+        self.sync()
+
+        history[1]["block_height"] = TIP_HEIGHT
+        self.use_stub(history)
+        self.assertTrue(self.sync())
+
+        self.assertEqual(Transaction.objects.get(txid="b2" * 32).status, 'confirmed')
+        self.assertFalse(Utxo.objects.filter(txid="a1" * 32).exists())
+        snapshot = WalletSnapshot.objects.get(wallet=self.wallet)
+        self.assertEqual(snapshot.confirmed_balance, 1_900)
+        self.assertEqual(snapshot.unconfirmed_balance, 0)
+
+    def test_sync_pages_through_long_histories(self):
+        # 45 recebimentos num endereço: três páginas de 20 (a última incompleta)
+        history = [
+            {
+                "txid": f"{position:064x}", "block_height": TIP_HEIGHT - 100 + position, "fee": 100,
+                "date": "2024-05-01T12:00:00",
+                "inputs": [{"address": EXTERNAL_ADDRESS, "value": 2_000}],
+                "outputs": [{"address": self.receive[1], "value": 1_000}],
+            }
+            for position in range(45)
+        ]
+        self.use_stub(history)
+
+        with mock.patch.object(StubProvider, 'gettransactions', autospec=True,
+                               side_effect=StubProvider.gettransactions) as gettransactions:
+            self.sync()
+
+        pages = [call for call in gettransactions.call_args_list if call.args[1] == self.receive[1]]
+        self.assertEqual([call.kwargs['after_txid'] for call in pages], ['', f"{19:064x}", f"{39:064x}"])
+        self.assertTrue(all(call.kwargs['limit'] == 20 for call in pages))
+
+        self.assertEqual(Transaction.objects.filter(wallet=self.wallet).count(), 45)
+        self.assertEqual(Utxo.objects.filter(wallet=self.wallet).count(), 45)
+        snapshot = WalletSnapshot.objects.get(wallet=self.wallet)
+        self.assertEqual((snapshot.balance, snapshot.tx_count), (45_000, 45))
+        self.assertEqual(Address.objects.get(wallet=self.wallet, address=self.receive[1]).last_txid, f"{44:064x}")
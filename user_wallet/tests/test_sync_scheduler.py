@@ -0,0 +1,96 @@
+import time
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from ..models import Wallet, WalletSnapshot
+from ..services.sync_service import WalletSyncScheduler
+from .base import WalletTestCase, WalletTransactionTestCase, XPUB
+
+
+class SyncWalletsCommandTests(WalletTransactionTestCase):
+
+    def test_once_syncs_every_wallet_offline(self):
+        self.use_stub(self.history())
+        out = StringIO()
+
+        call_command('sync_wallets', '--once', '--provider', 'stub', stdout=out)
+
+        self.assertEqual(out.getvalue().strip(), "1 carteiras sincronizadas, 0 com erro")
+        snapshot = WalletSnapshot.objects.get(wallet=self.wallet)
+        self.assertEqual((snapshot.balance, snapshot.tx_count), (1_900, 2))
+
+
+class WalletSyncSchedulerTests(WalletTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Sync simulado: a ordem e o backoff não dependem do provedor
+        self.sync_service = mock.Mock()
+        self.sync_service.get_tip_height.return_value = 850_000
+        self.sync_service.sync_wallet.return_value = False
+        self.scheduler = WalletSyncScheduler(
+            sync_service=self.sync_service, concurrency=1, interval=60, max_interval=3600
+        )
+
+    def add_wallet(self, username, last_login=None):
+        user = User.objects.create_user(username=username, password='senha-de-teste', last_login=last_login)
+        return Wallet.objects.create(name=username, wallet_type='watch-only', xpub=XPUB, user=user)
+
+    def make_all_due(self):
+        for wallet_id, next_due in self.scheduler._next_due.items():
+            self.scheduler._next_due[wallet_id] = next_due - 10 ** 6
+
+    def test_due_wallets_priority(self):
+        idle = self.wallet  # alice nunca fez login
+        active = self.add_wallet('bob', last_login=timezone.now())
+        invalidated = self.add_wallet('carol')
+        WalletSnapshot.objects.create(wallet=invalidated, refreshed_at=timezone.now())
+
+        self.assertEqual(self.scheduler.run_once(), (3, 0))
+        self.assertEqual(self.scheduler.due_wallets(), [])
+
+        # Tudo vencido: snapshot invalidado e carteira nova furam a fila, depois usuários ativos
+        self.make_all_due()
+        WalletSnapshot.invalidate(wallet=invalidated)
+        new = self.add_wallet('dave')
+
+        due = [wallet_id for wallet_id, _ in self.scheduler.due_wallets()]
+        self.assertEqual(set(due[:2]), {invalidated.id, new.id})
+        self.assertEqual(due[2:], [active.id, idle.id])
+
+    def test_wallets_not_due_are_skipped(self):
+        self.scheduler.run_once()
+        self.sync_service.sync_wallet.reset_mock()
+
+        self.assertEqual(self.scheduler.run_once(), (0, 0))
+        self.sync_service.sync_wallet.assert_not_called()
+
+    def test_failing_wallet_backs_off(self):
+        failing = self.add_wallet('erin')
+
+        def sync_wallet(wallet_id, tip_height=None):
+            if wallet_id == failing.id:
+                raise ConnectionError("provedor fora do ar")
+            return True
+
+        self.sync_service.sync_wallet.side_effect = sync_wallet
+
+        started = time.monotonic()
+        self.assertEqual(self.scheduler.run_once(), (1, 1))
+
+        # Usuário inativo: 60s x 4; a falha dobra o intervalo
+        delay = self.scheduler._next_due[failing.id] - started
+        self.assertAlmostEqual(delay, 60 * 4 * 2, delta=5)
+        healthy_delay = self.scheduler._next_due[self.wallet.id] - started
+        self.assertAlmostEqual(healthy_delay, 60 * 4, delta=5)
+
+        # Snapshot invalidado não fura a fila de uma carteira que acabou de falhar
+        WalletSnapshot.objects.create(wallet=failing, refreshed_at=None)
+        self.assertEqual(self.scheduler.due_wallets(), [])
+
+        self.make_all_due()
+        self.scheduler.run_once()
+        delay = self.scheduler._next_due[failing.id] - time.monotonic()
+        self.assertAlmostEqual(delay, 60 * 4 * 4, delta=5)
@@ -0,0 +1,129 @@
+import json
+from datetime import timedelta
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from ..models import Transaction
+from ..services.wallet_service import WalletService
+from .base import WalletTestCase
+
+
+class AllTransactionsTests(WalletTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, **params):
+        return self.client.get(reverse('wallet-all-transactions'), params)
+
+    def test_request_mode_syncs_and_serves_history(self):
+        # Sem sync prévio: a primeira página sincroniza a carteira e lê de Transaction
+        self.use_stub(self.history())
+
+        response = self.get_page()
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        # Da mais nova (pendente, datada de quando foi vista) para a mais antiga
+        self.assertEqual([item["txid"] for item in results], ["b2" * 32, "a1" * 32])
+        self.assertEqual(results[0]["transaction_type"], "sent")
+        self.assertEqual(results[0]["value"], 3_100)
+        self.assertEqual(results[0]["status"], "unconfirmed")
+        self.assertEqual(results[1]["transaction_type"], "received")
+        self.assertEqual(results[1]["confirmations"], 11)
+        self.assertEqual(results[1]["date"], "2024-05-01 12:00:00")
+        self.assertIsNone(response.json()["next"])
+
+    @override_settings(WALLET_SYNC_MODE='worker')
+    def test_worker_mode_only_reads(self):
+        self.use_stub(self.history())
+
+        response = self.get_page()
+
+        self.assertEqual(response.json(), {"results": [], "next": None})
+
+    def test_export_streams_synced_history(self):
+        self.use_stub(self.history())
+        url = reverse('wallet-export-transactions')
+
+        ndjson = b''.join(self.client.get(url, {'export_format': 'ndjson'}).streaming_content).decode()
+        rows = [json.loads(line) for line in ndjson.splitlines()]
+        self.assertEqual({row["txid"] for row in rows}, {"a1" * 32, "b2" * 32})
+
+        csv_lines = b''.join(self.client.get(url, {'export_format': 'csv'}).streaming_content).decode().splitlines()
+        self.assertTrue(csv_lines[0].startswith('txid,'))
+        self.assertEqual(len(csv_lines), 3)
+
+    @override_settings(WALLET_SYNC_MODE='worker')
+    def test_cursor_pagination_walks_every_transaction_once(self):
+        # Datas repetidas forçam o desempate por txid e id no cursor
+        now = timezone.now()
+        Transaction.objects.bulk_create([
+            Transaction(
+                wallet=self.wallet, user=self.user, txid=f"{position:064x}", amount=1_000 if position % 2 else -500,
+                fee=0, status='confirmed', date=now - timedelta(minutes=position // 3)
+            )
+            for position in range(25)
+        ])
+
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 10}
+            if cursor:
+                params['cursor'] = cursor
+            page = self.get_page(**params).json()
+            seen.extend((item["txid"], item["date"]) for item in page["results"])
+            cursor = page["next"]
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len({txid for txid, _ in seen}), 25)
+        expected = list(
+            Transaction.objects.order_by('-date', '-txid', '-id').values_list('txid', flat=True)
+        )
+        self.assertEqual([txid for txid, _ in seen], expected)
+
+    @override_settings(WALLET_SYNC_MODE='worker')
+    def test_filters_and_validation(self):
+        now = timezone.now()
+        Transaction.objects.bulk_create([
+            Transaction(wallet=self.wallet, user=self.user, txid="c" * 64, amount=700, fee=0, status='confirmed', date=now),
+            Transaction(wallet=self.wallet, user=self.user, txid="d" * 64, amount=-300, fee=0, status='pending', date=now),
+        ])
+
+        sent = self.get_page(direction='sent').json()["results"]
+        self.assertEqual([item["txid"] for item in sent], ["d" * 64])
+
+        self.assertEqual(self.get_page(limit=0).status_code, 400)
+        self.assertEqual(self.get_page(cursor='não-é-um-cursor').status_code, 400)
+
+    def test_only_own_transactions(self):
+        other = APIClient()
+        other_user = type(self.user).objects.create_user(username='bob', password='senha-de-teste')
+        other.force_authenticate(other_user)
+        self.use_stub(self.history())
+
+        response = other.get(reverse('wallet-all-transactions'))
+
+        self.assertEqual(response.json()["results"], [])
+
+    @override_settings(WALLET_SYNC_MODE='worker')
+    def test_page_query_walks_the_user_index(self):
+        # Sem ORDER BY em memória: a página é lida na ordem do índice a partir do cursor
+        service = WalletService()
+        cursor = service._encode_cursor(timezone.now(), "f" * 64, 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            service.get_transactions_page(self.user, cursor=cursor, limit=10)
+
+        plan = connection.cursor().execute(f"EXPLAIN QUERY PLAN {queries[-1]['sql']}").fetchall()
+        details = " ".join(row[-1] for row in plan)
+        self.assertIn('tx_user_date_txid_id_idx', details)
+        self.assertNotIn('TEMP B-TREE', details)
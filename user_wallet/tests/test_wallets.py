@@ -0,0 +1,136 @@
+import time
+import threading
+from collections import namedtuple
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from ..models import Address, Wallet
+from ..serializers import WalletCreateSerializer
+from ..services.blockchain_providers import get_blockchain_service
+from ..services.price_service import PriceService
+from ..services.sync_service import WalletSyncService
+from ..services.wallet_service import WalletService
+from .base import WalletTestCase, XPUB
+
+
+class BalanceTests(WalletTestCase):
+
+    def test_other_users_wallet_is_not_found(self):
+        intruder = User.objects.create_user(username='mallory', password='senha-de-teste')
+        client = APIClient()
+        client.force_authenticate(intruder)
+
+        response = client.post(reverse('wallet-balance', args=[self.wallet.id]), {'pubKey': XPUB})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class AllBalancesPriceTests(WalletTestCase):
+
+    def balances(self):
+        # Snapshot recente: a entrada sai do banco, sem as threads do fan-out
+        self.use_stub(self.history())
+        WalletSyncService(get_blockchain_service()).sync_wallet(self.wallet.id)
+        return WalletService().get_all_wallets(Wallet.objects.filter(user=self.user))
+
+    @mock.patch.object(PriceService, 'get_price', return_value=0)
+    def test_cold_price_cache_leaves_fiat_value_unavailable(self, _):
+        entry, = self.balances()
+
+        self.assertEqual(entry["balanceSatoshi"], 1_900)
+        self.assertEqual(entry["btcValue"], "0.00001900")
+        self.assertIsNone(entry["fiatValue"])
+
+    @mock.patch.object(PriceService, 'get_price', return_value=300_000.0)
+    def test_fiat_value_uses_cached_price(self, _):
+        entry, = self.balances()
+
+        self.assertEqual(entry["fiatValue"], "5.70")
+
+
+class WalletCreateSerializerTests(SimpleTestCase):
+
+    def test_master_fingerprint_is_optional_hex(self):
+        data = {'name': 'Principal', 'wallet_type': 'watch-only', 'xpub': XPUB}
+
+        self.assertTrue(WalletCreateSerializer(data=data).is_valid())
+
+        serializer = WalletCreateSerializer(data={**data, 'master_fingerprint': '3442193E'})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data['master_fingerprint'], '3442193e')
+
+        self.assertFalse(WalletCreateSerializer(data={**data, 'master_fingerprint': 'zz42193e'}).is_valid())
+        self.assertFalse(WalletCreateSerializer(data={**data, 'master_fingerprint': '3442'}).is_valid())
+
+
+@override_settings(WALLET_ADDRESS_GAP_LIMIT=4)
+class ReceiveAddressTests(WalletTestCase):
+
+    @mock.patch.object(WalletService, '_schedule_receive_top_up')
+    def test_buffer_is_spent_down_before_top_up(self, top_up):
+        service = WalletService()
+
+        # 5 endereços derivados, gap limit 4: a reposição só começa com menos de 2 à frente
+        delivered = [service.generate_receive_address(self.wallet.id) for _ in range(3)]
+
+        self.assertEqual(delivered, self.receive[:3])
+        top_up.assert_not_called()
+
+        self.assertEqual(service.generate_receive_address(self.wallet.id), self.receive[3])
+        top_up.assert_called_once_with(self.wallet.id, 3 + 2 * 4)
+
+    def test_exhausted_buffer_derives_inline(self):
+        service = WalletService()
+        with mock.patch.object(WalletService, '_schedule_receive_top_up'):
+            for _ in range(5):
+                service.generate_receive_address(self.wallet.id)
+
+            # Sexto endereço: fora do buffer, derivado na própria requisição
+            address = service.generate_receive_address(self.wallet.id)
+
+        self.assertEqual(Address.objects.get(wallet=self.wallet, path='M/0/5').address, address)
+
+
+WalletInfo = namedtuple('WalletInfo', ['id', 'name'])
+
+
+class WalletFanoutTests(SimpleTestCase):
+
+    def test_deadline_covers_running_and_queued_wallets(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def entry(wallet_id, wallet_name, btc_to_brl):
+            # As duas primeiras travam e ocupam as duas threads; 3 e 4 nunca começam
+            if wallet_id in (1, 2):
+                release.wait(5)
+            return {"id": wallet_id, "error": None}
+
+        wallets = [WalletInfo(wallet_id, f"Carteira {wallet_id}") for wallet_id in (1, 2, 3, 4)]
+        service = WalletService()
+        with mock.patch.object(service, '_get_wallet_entry', side_effect=entry):
+            started = time.monotonic()
+            entries = service._get_wallet_entries_concurrently(wallets, 300_000, max_workers=2, timeout=0.2)
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 1)
+        self.assertEqual([entry["id"] for entry in entries], [1, 2, 3, 4])
+        self.assertTrue(all(entry["error"] == "Tempo esgotado ao processar carteira" for entry in entries))
+
+    def test_slow_wallet_only_degrades_its_own_entry(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def entry(wallet_id, wallet_name, btc_to_brl):
+            if wallet_id == 2:
+                release.wait(5)
+            return {"id": wallet_id, "error": None}
+
+        wallets = [WalletInfo(wallet_id, f"Carteira {wallet_id}") for wallet_id in (1, 2, 3)]
+        service = WalletService()
+        with mock.patch.object(service, '_get_wallet_entry', side_effect=entry):
+            entries = service._get_wallet_entries_concurrently(wallets, 300_000, max_workers=2, timeout=0.2)
+
+        self.assertEqual([entry["error"] for entry in entries], [None, "Tempo esgotado ao processar carteira", None])
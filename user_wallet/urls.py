@@ -1,11 +1,24 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WalletViewSet, TransactionViewSet
+from .views import WalletViewSet, TransactionViewSet, MetricsViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'wallets', WalletViewSet, basename='wallet')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
+router.register(r'metrics', MetricsViewSet, basename='metrics')
 
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+# Endpoints de leitura em versão async (servidor ASGI): registrados antes do
+# router, ocupam as mesmas URLs das actions do WalletViewSet
+if getattr(settings, 'WALLET_ASYNC_VIEWS', False):
+    urlpatterns = [
+        path('wallets/all-balances/', async_views.all_balances, name='wallet-all-balances'),
+        path('wallets/all-transactions/', async_views.all_transactions, name='wallet-all-transactions'),
+        path('wallets/btc-price/', async_views.bitcoin_price, name='wallet-bitcoin-price'),
+        path('wallets/price-history/', async_views.price_history, name='wallet-price-history'),
+    ] + urlpatterns
@@ -1,19 +1,48 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from .models import BitcoinPriceCache, Wallet, Address, Transaction
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import BrowsableAPIRenderer
+from .models import Wallet, Address, Transaction
 from .serializers import (
     WalletSerializer, WalletCreateSerializer, AddressSerializer,
-    TransactionSerializer, TransactionCreateSerializer, BroadcastTransactionSerializer
+    TransactionSerializer, TransactionCreateSerializer, BroadcastTransactionSerializer,
+    TransactionPageSerializer
 )
 from .services.wallet_service import WalletService
+from .services.export_service import EXPORT_FORMATS, export_lines
+from .services.price_history_service import PriceHistoryService
+from .services import http_client, provider_router, wallet_pool
+from .db_router import read_replica
+from .renderers import FastJSONRenderer
+from django.db.models import Count, OuterRef, Subquery
+from django.http import StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+import os
 import logging
-import requests
-import datetime
 
 logger = logging.getLogger(__name__)
 
+# Endpoints com respostas grandes: JSON pelo orjson (a API navegável continua disponível)
+FAST_RENDERER_CLASSES = [FastJSONRenderer, BrowsableAPIRenderer]
+
+def not_modified(request, etag, updated_at):
+    """Pedido condicional (If-None-Match / If-Modified-Since) já atendido pela versão atual"""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    return if_modified_since is not None and int(updated_at.timestamp()) <= if_modified_since
+
+class AddressPagination(PageNumberPagination):
+    """Páginas do sub-recurso /wallets/{id}/addresses/ (?page=&page_size=)"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
 class WalletViewSet(viewsets.ModelViewSet):
     """
     API endpoint para gerenciar carteiras Bitcoin
@@ -25,7 +54,19 @@ class WalletViewSet(viewsets.ModelViewSet):
         """
         Retorna apenas as carteiras do usuário autenticado
         """
-        return Wallet.objects.filter(user=self.request.user)
+        queryset = Wallet.objects.filter(user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            # Contagem e endereço de recebimento atual na mesma consulta: o número
+            # de consultas não cresce com carteiras nem com endereços
+            queryset = queryset.annotate(
+                address_count=Count('addresses'),
+                receive_address=Subquery(
+                    Address.objects.filter(
+                        wallet=OuterRef('pk'), is_change=False, index=OuterRef('next_receive_index')
+                    ).values('address')[:1]
+                ),
+            ).order_by('id')
+        return queryset
     
     def get_serializer_class(self):
         """
@@ -34,6 +75,10 @@ class WalletViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return WalletCreateSerializer
         return WalletSerializer
+
+    @read_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         """
@@ -53,7 +98,10 @@ class WalletViewSet(viewsets.ModelViewSet):
                 )
             
             try:
-                wallet = wallet_service.create_watch_only_wallet(name, xpub, self.request.user)
+                wallet = wallet_service.create_watch_only_wallet(
+                    name, xpub, self.request.user,
+                    master_fingerprint=serializer.validated_data.get('master_fingerprint', '')
+                )
                 return Response(WalletSerializer(wallet).data, status=status.HTTP_201_CREATED)
             except Exception as e:
                 logger.error(f"Erro ao criar carteira watch-only: {str(e)}")
@@ -68,25 +116,67 @@ class WalletViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    @action(detail=False, methods=['get'], url_path='all-balances')
+    @action(detail=False, methods=['get'], url_path='all-balances', renderer_classes=FAST_RENDERER_CLASSES)
+    @read_replica
     def all_balances(self, request):
         wallet_service = WalletService()
+
+        try:
+            currency = wallet_service.normalize_currency(request.query_params.get('currency'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         wallets = Wallet.objects.filter(user=request.user)
-        result = wallet_service.get_all_wallets(wallets=wallets)
+        result = wallet_service.get_all_wallets(wallets=wallets, currency=currency)
         return Response(result)
     
-    @action(detail=False, methods=['get'], url_path='all-transactions')
+    @action(detail=False, methods=['get'], url_path='all-transactions', renderer_classes=FAST_RENDERER_CLASSES)
+    @read_replica
     def all_transactions(self, request):
         wallet_service = WalletService()
-        transactions = wallet_service.get_user_transactions(user=request.user)
-        return Response(transactions)
+
+        # Histórico gravado pelo sync em Transaction, paginado por cursor nos dois modos
+        serializer = TransactionPageSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = wallet_service.get_transactions_page(request.user, **serializer.validated_data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(page)
+
+    @action(detail=False, methods=['get'], url_path='export-transactions')
+    def export_transactions(self, request):
+        """
+        Exporta todo o histórico de transações do usuário em CSV ou NDJSON,
+        gerado linha a linha (?export_format=csv|ndjson)
+        """
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": "Formato inválido. Use: csv ou ndjson"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        wallet_service = WalletService()
+        rows = wallet_service.iter_user_transactions(user=request.user)
+
+        response = StreamingHttpResponse(
+            export_lines(rows, export_format),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+        return response
 
     @action(detail=True, methods=['post']) 
     def balance(self, request, pk=None):
+        # Só carteiras do próprio usuário (404 para as demais)
+        wallet = self.get_object()
         wallet_service = WalletService()
 
         pub_key = request.data.get("pubKey")
-        wallet_id = pk  
+        wallet_id = wallet.id
         wallet_name = request.data.get("wallet_name", f"watch_only_{wallet_id}")
 
         if not pub_key:
@@ -94,8 +184,15 @@ class WalletViewSet(viewsets.ModelViewSet):
                 {"error": "Campo 'pubKey' é obrigatório"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        btc_to_brl = wallet_service._get_btc_price()
+
+        try:
+            currency = wallet_service.normalize_currency(
+                request.data.get("currency") or request.query_params.get("currency")
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        btc_price = wallet_service._get_btc_price(currency)
 
         try:
             balance = wallet_service.get_wallet_balance({
@@ -105,9 +202,13 @@ class WalletViewSet(viewsets.ModelViewSet):
             })
 
             total_btc = balance.get("total", 0) / 100_000_000
-            fiat_value = round(total_btc * btc_to_brl, 2)
+            # Sem preço no cache o valor em moeda vai como null (indisponível)
+            fiat_value = round(total_btc * btc_price, 2) if btc_price is not None else None
 
-            balance["btcPriceBrl"] = btc_to_brl
+            # btcPriceBrl é mantido para clientes antigos
+            balance["btcPriceBrl"] = btc_price if currency == 'brl' else wallet_service._get_btc_price('brl')
+            balance["btcPrice"] = btc_price
+            balance["currency"] = currency
             balance["fiatValue"] = fiat_value
             balance["id"] = wallet_id
             balance["btcValue"] = total_btc
@@ -125,6 +226,24 @@ class WalletViewSet(viewsets.ModelViewSet):
             )
 
         
+    @action(detail=True, methods=['get'])
+    @read_replica
+    def addresses(self, request, pk=None):
+        """
+        Endereços derivados da carteira, paginados em ordem de cadeia e índice
+        (?page=&page_size=; ?is_change=true|false filtra a cadeia)
+        """
+        wallet = self.get_object()
+        queryset = Address.objects.filter(wallet=wallet).order_by('is_change', 'index')
+
+        is_change = request.query_params.get('is_change')
+        if is_change is not None:
+            queryset = queryset.filter(is_change=is_change.lower() in ('1', 'true'))
+
+        paginator = AddressPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(AddressSerializer(page, many=True).data)
+
     @action(detail=True, methods=['post'])
     def delete(self, request, pk=None): 
         wallet = self.get_object()
@@ -154,14 +273,15 @@ class WalletViewSet(viewsets.ModelViewSet):
         wallet_service = WalletService()
         
         try:
-            tx_hex = wallet_service.create_transaction(
+            # PSBT em base64 para assinar, a transação em hex, taxa, troco e entradas usadas
+            result = wallet_service.create_transaction(
                 wallet.id,
                 serializer.validated_data['to_address'],
                 serializer.validated_data['amount'],
                 serializer.validated_data.get('fee_rate')
             )
             
-            return Response({"tx_hex": tx_hex})
+            return Response(result)
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -181,6 +301,7 @@ class WalletViewSet(viewsets.ModelViewSet):
         
         try:
             address = wallet_service.generate_receive_address(wallet.id)
+            wallet_service.invalidate_wallet_snapshots(wallet_id=wallet.id)
             return Response({"address": address})
         except Exception as e:
             logger.error(f"Erro ao gerar endereço: {str(e)}")
@@ -192,84 +313,57 @@ class WalletViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='btc-price')
     def bitcoin_price(self, request):
         wallet_service = WalletService()
-        wallet_service._get_btc_price()
-        cache = BitcoinPriceCache.get_cached_price()
+
+        try:
+            quote = wallet_service.get_btc_quote(request.query_params.get('currency'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         result = {
-                "currentPrice": cache.price,
-                "change24h": cache.change24h,
-                "low24h": cache.low24h,
-                "high24h": cache.high24h
+                "currentPrice": quote["price"],
+                "change24h": quote["change24h"],
+                "low24h": quote["low24h"],
+                "high24h": quote["high24h"]
             }
         
         return Response(result, status=status.HTTP_200_OK)
     
-    @action(detail=False, methods=['post'], url_path='price-history')
+    @action(detail=False, methods=['get', 'post'], url_path='price-history', renderer_classes=FAST_RENDERER_CLASSES)
     def price_history(self, request):
-        period = request.data.get('period', '1m')  # '24h', '7d', '1m', '6m', '1y'
-
-        period_map = {
-            '24h': (1, 'hourly'),
-            '7d': (7, 'daily'),
-            '1m': (30, 'daily'),
-            '6m': (180, 'daily'),
-            '1a': (365, 'daily')
-        }
-
-        if period not in period_map:
-            return Response(
-                {"error": "Período inválido. Use: 24h, 7d, 1m, 6m ou 1y"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        """
+        Gráfico de preços do BTC servido do histórico local. Em GET responde
+        com ETag/Last-Modified e 304 quando o cliente já tem a versão atual.
+        """
+        params = request.data if request.method == 'POST' else request.query_params
+        period = params.get('period', '1m')  # '24h', '7d', '1m', '6m', '1y'
 
-        days, interval = period_map[period]
+        history_service = PriceHistoryService()
+        wallet_service = WalletService()
 
         try:
-            url = "https://api.coingecko.com/api/v3/coins/bitcoin/market_chart"
-            params = {
-                "vs_currency": "brl",
-                "days": days,
-                "interval": interval
-            }
-
-            response = requests.get(url, params=params)
-            data = response.json()
-
-            prices = data.get("prices", [])
-
-            labels = []
-            values = []
-
-            for timestamp, price in prices:
-                dt = datetime.datetime.fromtimestamp(timestamp / 1000)
-                if period == '24h':
-                    labels.append(dt.strftime('%H:%M'))  # Hora
-                elif period in ['7d', '1m']:
-                    labels.append(dt.strftime('%d/%m'))  # Dia/Mês
-                else:
-                    labels.append(dt.strftime('%b/%Y'))  # Mês/Ano
-
-                values.append(round(price, 2))
-
-            chart_data = {
-                "labels": labels,
-                "datasets": [
-                    {
-                        "label": "Preço BTC (R$)",
-                        "data": values,
-                        "borderColor": "#F7931A",
-                        "backgroundColor": "rgba(247, 147, 26, 0.1)",
-                        "tension": 0.4,
-                        "fill": True
-                    }
-                ]
-            }
-
-            return Response(chart_data)
+            period = history_service.normalize_period(period)
+            currency = wallet_service.normalize_currency(params.get('currency'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            ohlc = str(params.get('ohlc', '')).lower() in ('1', 'true')
+            chart_data, updated_at, etag = history_service.get_chart(period, currency, ohlc=ohlc)
         except Exception as e:
             logger.error(f"Erro ao buscar histórico de preço: {str(e)}")
             return Response({"error": "Falha ao obter dados de preço do Bitcoin"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
+
+        headers = {
+            "ETag": etag,
+            "Last-Modified": http_date(updated_at.timestamp()),
+            "Cache-Control": "private, no-cache",
+        }
+
+        if request.method == 'GET' and not_modified(request, etag, updated_at):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(chart_data, headers=headers)
+
 
 class TransactionViewSet(viewsets.GenericViewSet):
     """
@@ -290,11 +384,47 @@ class TransactionViewSet(viewsets.GenericViewSet):
         wallet_service = WalletService()
         
         try:
-            txid = wallet_service.broadcast_transaction(serializer.validated_data['tx_hex'])
-            return Response({"txid": txid})
+            # Só grava na fila de transmissão; o envio aos provedores acontece em segundo plano
+            txid = wallet_service.broadcast_transaction(serializer.validated_data['tx_hex'], request.user)
+            # Saldos das carteiras do usuário mudam após a transmissão
+            wallet_service.invalidate_wallet_snapshots(wallet__user=request.user)
+            return Response({"txid": txid, "status": "pending"}, status=status.HTTP_202_ACCEPTED)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Erro ao transmitir transação: {str(e)}")
             return Response(
                 {"error": f"Falha ao transmitir transação: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class MetricsViewSet(viewsets.ViewSet):
+    """
+    Métricas internas do processo (somente administradores)
+    """
+    permission_classes = [IsAdminUser]
+
+    @action(detail=False, methods=['get'])
+    def http(self, request):
+        """
+        Pools HTTP por host: requisições, erros, timeouts, concorrência máxima,
+        latência e conexões abertas/ociosas, para dimensionar HTTP_POOL_MAXSIZE
+        """
+        return Response({"pid": os.getpid(), "hosts": http_client.stats()})
+
+    @action(detail=False, methods=['get'])
+    def providers(self, request):
+        """
+        Saúde dos provedores da blockchain no roteador: latência e taxa de erro
+        médias, requisições, falhas, corridas (hedges) e estado do circuito
+        """
+        return Response({"pid": os.getpid(), "providers": provider_router.health_stats()})
+
+    @action(detail=False, methods=['get'])
+    def wallets(self, request):
+        """
+        Pool de carteiras abertas da bitcoinlib: carteiras abertas, acertos,
+        aberturas e descartes, para dimensionar WALLET_POOL_SIZE
+        """
+        return Response({"pid": os.getpid(), "pool": wallet_pool.stats()})